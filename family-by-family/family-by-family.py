@@ -3,6 +3,8 @@ import sys
 import time
 from collections import deque
 import math
+import heapq
+import itertools
 
 import networkx as nx
 
@@ -31,6 +33,14 @@ class TimeQueue (deque):
       """ Get the next family to be activated. """
       return self.popleft()
 
+  def as_ordered_list(self):
+      """ The queued nodes as a list of (steps_until_activation, output_activation_strength, node_name). NOTE that this walks the entire queue. """
+      return [(i + 1, strength, name) for (i, family) in enumerate(self) for (strength, name) in family]
+
+  def size(self):
+      """ The number of queued nodes (not families). NOTE that this walks every family. """
+      return sum(len(family) for family in self)
+
 
 
 def get_valid_types_following(node_type, schema):
@@ -70,53 +80,179 @@ def get_link_transfer_time(weight):
 
 
 def queue_node_activation(tq, steps_until_activation, input_activation_strength, node):
-  """ See if the node will activate and if so put it into the queue. """
+  """ See if the node will activate and if so put it into the queue. Returns whether it will activate. """
   will_activate = input_activation_strength > THRESHOLD
   if not will_activate:
-    return
+    return False
   # Activate the node (deferred).
   # -- assign the node it's own activation strength
   output_activation_strength = input_activation_strength * get_node_strength(node['weight'])
   # -- add the node to the queue
   # print(f'adding node {node["name"]} with activation strength {output_activation_strength}')
   tq.add_node(i=(steps_until_activation - 1), output_activation_strength=output_activation_strength, node_name=node['name'])
+  return True
 
 # Input parameters are the graph (nodes, edges, node weights, edge weights, node types, and schema)
-def algo(graph, start_state, schema):
+def algo(graph, start_state, schema, tracer=None, **stop_conditions):
     """ The STEPWISE FAMILY spreading activation algorithm.
     This algorithm calculates one family of nodes at a time, and is potentially faster because we can parallelize the nodes that get activated at the same time.
+    Pass a tracer (see spreading_activation/tracing.py) to collect counters about the run. With tracer=None nothing extra is done.
+    Takes the same stop conditions as iter_families.
+    """
+    activation_history = list(iter_families(graph, start_state, schema, tracer=tracer, **stop_conditions)) # for output purposes, so we can see how the algorithm went down.
+    return activation_history
+
+def iter_families(graph, start_state, schema, tracer=None, max_time=None, max_events=None, max_nodes=None, time_budget=None):
+    """ The STEPWISE FAMILY algorithm as a generator. Yields each (time, family) as soon as it is popped, so only the queue is held in memory and the caller can stop at any point.
+    Stop conditions (None means no limit):
+      max_time: stop before the first family activating after this simulated time.
+      max_events: stop once this many activations have been yielded (the last family is cut short if needed).
+      max_nodes: stop once this many distinct nodes have been activated (the last family is cut short if needed). This keeps a set of the activated nodes.
+      time_budget: stop before the next family once this many seconds of wall-clock time have passed.
     """
-    activation_history = [] # for output purposes, so we can see how the algorithm went down.
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+    events = 0
+    activated_nodes = None if max_nodes is None else set()
     tq = TimeQueue()
     # Put the starting nodes in the time queue. They will be the first to activate.
     for (start_node, start_input_activation_strength) in start_state:
-      queue_node_activation(tq, steps_until_activation=1, input_activation_strength=start_input_activation_strength, node=start_node)
+      if not queue_node_activation(tq, steps_until_activation=1, input_activation_strength=start_input_activation_strength, node=start_node) and tracer is not None:
+        tracer.prune()
+    if tracer is not None:
+      tracer.queue_size(tq.size())
     # Current time is 0. This does not track real-life time but rather the time that our algorithm simulates as activation spreads.
     current_time = 0
-    # Iteratively apply this algo until you've exhausted all reachable nodes.
+    try:
+      # Iteratively apply this algo until you've exhausted all reachable nodes.
+      while tq:
+        if tracer is not None:
+          tracer.phase('pop')
+        # take the first node out of the time queue (hence, the first activation event since nodes are ordered by time)
+        family = tq.pop_family()
+        if tracer is not None:
+          tracer.pop_family(current_time, len(family), tq)
+        # check the stop conditions before handing out the family
+        if max_time is not None and current_time > max_time:
+          return
+        if deadline is not None and time.perf_counter() >= deadline:
+          return
+        if max_events is not None and events >= max_events:
+          return
+        last_family = False
+        if max_events is not None and events + len(family) >= max_events:
+          family = family[:max_events - events]
+          last_family = True
+        if activated_nodes is not None:
+          for (i, (_, node_name)) in enumerate(family):
+            activated_nodes.add(node_name)
+            if len(activated_nodes) >= max_nodes:
+              family = family[:i + 1]
+              last_family = True
+              break
+        events += len(family)
+        yield (current_time, family)
+        if last_family:
+          return
+        if tracer is not None:
+          tracer.phase('expand')
+        # update the current time
+        current_time += 1
+        for (current_node_activation_strength, current_node_name) in family:
+          current_node = graph.nodes[current_node_name]
+          # intersect its children with valid types to spread to. (note that this could be a preprocessing step if we don't want to dynamically change strategies)
+          valid_types = get_valid_types_following(current_node['type'], schema)
+          children = [graph.nodes[x] for x in graph.successors(current_node_name)]
+          valid_children = [x for x in children if x['type'] in valid_types]
+          if tracer is not None:
+            tracer.scan(len(children), len(children) - len(valid_children))
+          # for each valid child, calculate whether it will activate
+          for child in valid_children:
+            # Conditionally activate the node. (queue_node_activation will only activate the node if strength above threshold)
+            link = graph.edges[current_node_name, child['name']]
+            time_until_activation = get_link_transfer_time(link['weight'])
+            # calculate activation strength reaching the child node through the link
+            input_activation_strength = current_node_activation_strength * get_link_strength(link['weight']) * ACTIVATION_DECAY
+            # place the child into the time queue according to the computed time (for optimization we could have a sequence or custom struct where all children of the same act time are grouped together (but that would limit us to a stepwise situation), it could even just be a set where the inputs are numbers. or a deck so we can pop efficiently)
+            if not queue_node_activation(tq, time_until_activation, input_activation_strength, child) and tracer is not None:
+              tracer.prune()
+        if tracer is not None:
+          tracer.queue_size(tq.size())
+    finally:
+      if tracer is not None:
+        tracer.finish()
+
+
+# The TOP-K mode. Strength only goes down along a path (node and link strengths are at most 1 and ACTIVATION_DECAY is
+# below 1), so an activation that is not stronger than the current k-th best can never lead to one that is. Those are
+# not queued, and a node whose strength times ACTIVATION_DECAY can't beat the k-th best is not expanded. The run
+# then ends as soon as nothing left can reach the top k, instead of running all the way down to THRESHOLD.
+class TopK:
+
+  def __init__(self, k):
+    self.k = k
+    # node_name -> strength of the nodes currently in the top k
+    self.top = {}
+    # min-heap of (strength, insertion_number, node_name). entries whose strength is no longer the node's are skipped.
+    self._heap = []
+    self._counter = itertools.count()
+
+  def bound(self):
+      """ The strength an activation has to beat to change the top k. """
+      if self.k <= 0:
+        return float('inf')
+      if len(self.top) < self.k:
+        return float('-inf')
+      while self.top.get(self._heap[0][2]) != self._heap[0][0]:
+        heapq.heappop(self._heap)
+      return self._heap[0][0]
+
+  def add(self, strength, node_name):
+      """ Record an activation, keeping each node's strongest. """
+      if node_name in self.top:
+        if strength <= self.top[node_name]:
+          return
+      elif len(self.top) >= self.k:
+        if strength <= self.bound():
+          return
+        # make room by dropping the current k-th best
+        (_, _, weakest) = heapq.heappop(self._heap)
+        del self.top[weakest]
+      self.top[node_name] = strength
+      heapq.heappush(self._heap, (strength, next(self._counter), node_name))
+
+  def as_list(self):
+      return sorted(((strength, node_name) for (node_name, strength) in self.top.items()), key=lambda pair: -pair[0])
+
+
+def top_k(graph, start_state, schema, k):
+    """ The k most strongly activated nodes, as a list of (output_activation_strength, node_name), strongest first. A node's strength is its strongest activation. Ties for the k-th place are broken arbitrarily. """
+    best = TopK(k)
+    tq = TimeQueue()
+    for (start_node, start_input_activation_strength) in start_state:
+      output_activation_strength = start_input_activation_strength * get_node_strength(start_node['weight'])
+      if start_input_activation_strength > THRESHOLD and output_activation_strength > best.bound():
+        best.add(output_activation_strength, start_node['name'])
+        tq.add_node(i=0, output_activation_strength=output_activation_strength, node_name=start_node['name'])
     while tq:
-      print(f'tq: {tq}')
-      # take the first node out of the time queue (hence, the first activation event since nodes are ordered by time)
-      family = tq.pop_family()
-      activation_history.append((current_time, family)) # for logging purposes
-      # update the current time
-      current_time += 1
-      for (current_node_activation_strength, current_node_name) in family:
-        current_node = graph.nodes[current_node_name]
-        # intersect its children with valid types to spread to. (note that this could be a preprocessing step if we don't want to dynamically change strategies)
-        valid_types = get_valid_types_following(current_node['type'], schema)
-        children = [graph.nodes[x] for x in graph.successors(current_node_name)]
-        valid_children = [x for x in children if x['type'] in valid_types]
-        # for each valid child, calculate whether it will activate
-        for child in valid_children:
-          # Conditionally activate the node. (queue_node_activation will only activate the node if strength above threshold)
-          link = graph.edges[current_node_name, child['name']]
+      for (current_node_activation_strength, current_node_name) in tq.pop_family():
+        # nothing this node reaches can beat the k-th best
+        if current_node_activation_strength * ACTIVATION_DECAY <= best.bound():
+          continue
+        valid_types = get_valid_types_following(graph.nodes[current_node_name]['type'], schema)
+        for child_name in graph.successors(current_node_name):
+          child = graph.nodes[child_name]
+          if child['type'] not in valid_types:
+            continue
+          link = graph.edges[current_node_name, child_name]
           time_until_activation = get_link_transfer_time(link['weight'])
-          # calculate activation strength reaching the child node through the link
           input_activation_strength = current_node_activation_strength * get_link_strength(link['weight']) * ACTIVATION_DECAY
-          # place the child into the time queue according to the computed time (for optimization we could have a sequence or custom struct where all children of the same act time are grouped together (but that would limit us to a stepwise situation), it could even just be a set where the inputs are numbers. or a deck so we can pop efficiently)
-          queue_node_activation(tq, time_until_activation, input_activation_strength, child)
-    return activation_history
+          if not input_activation_strength > THRESHOLD:
+            continue
+          output_activation_strength = input_activation_strength * get_node_strength(child['weight'])
+          if output_activation_strength > best.bound():
+            best.add(output_activation_strength, child_name)
+            tq.add_node(i=(time_until_activation - 1), output_activation_strength=output_activation_strength, node_name=child_name)
+    return best.as_list()
 
 
 def test_singleton():
@@ -187,6 +323,15 @@ def test_outward():
   # kick off the algo
   out = algo(g, start_state, schema)
   print(out)
+  # stop conditions
+  assert algo(g, start_state, schema, max_time=1) == out[:2]
+  assert algo(g, start_state, schema, max_events=2) == [(0, [(1.0, 'c')]), (1, [(0.4, 'b')])]
+  assert algo(g, start_state, schema, max_nodes=4) == out[:3]
+  assert next(iter_families(g, start_state, schema)) == out[0]
+  # top-k
+  assert top_k(g, start_state, schema, 2) == [(1.0, 'c'), (0.4, 'b')]
+  assert top_k(g, start_state, schema, 10) == sorted([x for (_, family) in out for x in family], key=lambda pair: -pair[0])
+  assert top_k(g, start_state, schema, 0) == []
 test_outward()
 
 
@@ -1,91 +1,152 @@
-# Here we house the main Spreading Activation algorithm.
+# Here we house the main Spreading Activation algorithm, LOCKSTEP version.
+#
+# Like the family-by-family algo it moves forward one step at a time and activates a whole family of nodes at
+# each step. The difference is that a node activated several times in the same step is merged into ONE activation
+# (the strongest one wins), so every node appears at most once per family and is only expanded once per step.
+#
+# The time queue is a fixed-size circular buffer with one family per step, sized to the longest link transfer
+# time. A family is a dict of node name -> output activation strength, so merging is a dictionary lookup.
 
 # imports
+import math
+
 import networkx as nx
-from . import graph as g
 
 # define constants
-starting_activation_strength = 1.0
-activation_decay = 0.8
-schema = ['a', 'b', 'c']
+ACTIVATION_DECAY = 0.8
+THRESHOLD = 0.05
+
+
+class TimeQueue:
+    def __init__(self, size):
+        # one family per step, reused as the buffer goes round
+        self.families = [{} for _ in range(size)]
+        # the family to be activated next
+        self.position = 0
+        # the number of families with nodes in them
+        self.pending = 0
 
+    def __bool__(self):
+        return self.pending > 0
 
-class TimeQueue (deque):
-    def add_node(new_node):
-        """ Add a new node to the queue (in time order). """
-        # get the index for the new node
-        index = new_node.steps_until_activation
+    def add_node(self, steps_until_activation, output_activation_strength, node_name):
+        """ Add a node to the family activating steps_until_activation steps from now (1 is the next family). If the node is already in that family, keep the stronger activation. """
         # get the family of nodes to be activated along with the new node
-        node_family = self[index]
+        family = self.families[(self.position + steps_until_activation - 1) % len(self.families)]
+        if not family:
+            self.pending += 1
         # insert the new node with its family
-        node_family.add(new_node)
+        if node_name not in family or output_activation_strength > family[node_name]:
+            family[node_name] = output_activation_strength
 
-    def pop_node(self):
-        """ Get the next node to be activated. """
-        next_family = self[0]
-        # if the family is empty, discard it entirely
-        while not next_family:
-            self.popleft()
-            next_family = self[0]
-        # take any node from the family (they all activate at the same time so it doesn't matter which you take)
-        next_node = next_family.pop()
-        return next_node
+    def pop_family(self):
+        """ Get the next family to be activated, as a list of (output_activation_strength, node_name). """
+        family = self.families[self.position]
+        if family:
+            self.pending -= 1
+            self.families[self.position] = {}
+        self.position = (self.position + 1) % len(self.families)
+        return [(strength, name) for (name, strength) in family.items()]
 
 
-def get_valid_types_following(node_type):
+def get_valid_types_following(node_type, schema):
     """ Find the valid types immediately following a specific type in the schema """
     valid_types = set()
-    type_index = schema.indexof(node_type)
+    type_index = schema.index(node_type)
     left_index = type_index - 1
     right_index = type_index + 1
     if left_index >= 0:
-        valid_types.add(left_index)
+        valid_types.add(schema[left_index])
     if right_index < len(schema):
-        valid_types.add(right_index)
+        valid_types.add(schema[right_index])
     return valid_types
-    
-
-def algo(graph, start_node, threshold):
-    """ The spreading activation algorithm """
-    tq = TimeQueue()
-    # start at the start node
-    # put the start node in the time queue
-    tq.add_node(start_node)
+
+
+# These are the same as in the family-by-family algo: s = 1/2^w, and the transfer time is ceil(w) steps.
+def get_node_strength(weight):
+    return 1 / 2 ** weight
+
+def get_link_strength(weight):
+    return 1 / 2 ** weight
+
+def get_link_transfer_time(weight):
+    transfer_time = math.ceil(weight)
+    if transfer_time <= 0:
+        raise ValueError('Link weight must be positive in stepwise algo (use a positive weight).')
+    return transfer_time
+
+
+def algo(graph, start_state, schema):
+    """ The LOCKSTEP spreading activation algorithm. Returns the activation history as a list of (time, [(output_activation_strength, node_name), ...]). """
+    # the queue only needs to look as far ahead as the slowest link
+    size = max([math.ceil(weight) for (_, _, weight) in graph.edges.data('weight')] + [1])
+    tq = TimeQueue(size)
+    # put the start nodes in the time queue, they activate at time 0
+    for (start_node, start_input_activation_strength) in start_state:
+        if start_input_activation_strength > THRESHOLD:
+            tq.add_node(1, start_input_activation_strength * get_node_strength(start_node['weight']), start_node['name'])
+    activation_history = []
     # time is 0 (0 seconds or 0 steps)
+    current_time = 0
     # iteratively apply this algo...
-    while True:
-        # take the first node out of the time queue (hence, the first event since nodes are ordered)
-        current_node = tq.pop_node()
-        # intersect its children with valid types to spread to. (note that this could be a preprocessing step if we don't want to dynamically change strategies)
-        children = set(current_node.children)
-        valid_types = get_valid_types_following(current_node.type)
-        # obtain the valid children
-        valid_children = children.intersect(valid_types)
-        # for each valid child, calculate whether it will activate
-        for child in children:
-            # see if it will activate
-            input_activation_strength = current_node.activation_strength * 0.8
-            will_activate = child.get_activation_strength(input_activation_strength) > threshold 
-            # if it will activate then calculate the seconds/steps until activation (a whole number 1 or higher)
-            if not will_activate:
-                continue
-            steps_until_activation = child.get_steps_until_activation()
-            # activation time of the node is equal to current seconds plus the seconds until activation
-            # place the child into the time queue according to the computed time (for optimization we could have a sequence or custom struct where all children of the same act time are grouped together, it could even just be a set where the inputs are numbers. or a deck so we can pop efficiently)
-            child.steps_until_activation = steps_until_activation # or just pass it in
-            tq.add_node(child)
-            # add 1 second/step to current time
-            current_time += 1
-
-    
+    while tq:
+        # take the next family out of the time queue (all its nodes activate at the current time)
+        family = tq.pop_family()
+        activation_history.append((current_time, family))
+        for (current_node_activation_strength, current_node_name) in family:
+            current_node = graph.nodes[current_node_name]
+            # intersect its children with valid types to spread to.
+            valid_types = get_valid_types_following(current_node['type'], schema)
+            for child_name in graph.successors(current_node_name):
+                child = graph.nodes[child_name]
+                if child['type'] not in valid_types:
+                    continue
+                # see if it will activate
+                link = graph.edges[current_node_name, child_name]
+                steps_until_activation = get_link_transfer_time(link['weight'])
+                input_activation_strength = current_node_activation_strength * get_link_strength(link['weight']) * ACTIVATION_DECAY
+                if not input_activation_strength > THRESHOLD:
+                    continue
+                # place the child into the family activating steps_until_activation steps from now
+                tq.add_node(steps_until_activation, input_activation_strength * get_node_strength(child['weight']), child_name)
+        # add 1 step to current time
+        current_time += 1
+    return activation_history
+
+
+def make_graph(schema, edges):
+    """ One node of weight 0 for each type in the schema, plus the given edges. """
+    g = nx.DiGraph()
+    for node_type in schema:
+        g.add_node(node_type, **{'name': node_type, 'weight': 0, 'type': node_type})
+    g.add_edges_from(edges)
+    return g
+
+
+def test_outward():
+    # a <-- b <-- c --> d --> e
+    schema = ['a', 'b', 'c', 'd', 'e']
+    g = make_graph(schema, [('b', 'a', {'weight': 1}), ('c', 'b', {'weight': 1}), ('c', 'd', {'weight': 1}), ('d', 'e', {'weight': 2})])
+    print(f'\n{g}')
+    out = algo(g, [(g.nodes['c'], 1)], schema)
+    print(out)
+    assert out == [(0, [(1.0, 'c')]), (1, [(0.4, 'b'), (0.4, 'd')]), (2, [(0.16000000000000003, 'a')]), (3, [(0.08000000000000002, 'e')])]
 
-def main():
-    # setup the graph and whatnot
 
-    # kick off the algo
-    algo(graph, types,)
+def test_merge():
+    # b is reached from a and from c in the same step, but activates once (with the stronger activation)
+    schema = ['a', 'b', 'c']
+    g = make_graph(schema, [('a', 'b', {'weight': 1}), ('c', 'b', {'weight': 2})])
+    print(f'\n{g}')
+    out = algo(g, [(g.nodes['a'], 1), (g.nodes['c'], 2)], schema)
+    print(out)
+    assert out == [(0, [(1.0, 'a'), (2.0, 'c')]), (1, [(0.4, 'b')]), (2, [(0.4, 'b')])]
+
+
+def main():
+    # kick off the algo on the example graphs
+    test_outward()
+    test_merge()
 
 if __name__ == '__main__':
     main()
-
-    
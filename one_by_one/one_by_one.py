@@ -1,7 +1,6 @@
 # imports
 import sys
 import time
-import asyncio
 
 import networkx as nx
 
@@ -33,11 +32,22 @@ def test_add_attr_to_node():
 test_add_attr_to_node()
 
 # NOTE: This class is NOT thread safe.
-# PriorityQueue uses an internal heap to optimize placing and retrieving items.
-from asyncio import PriorityQueue
+# The queue is an indexed heap. Each pending activation is keyed by (activation_time, node_name), so a node that is
+# activated again at a time it is already queued for is merged into the pending entry instead of being pushed twice,
+# and the queue never holds more entries than there are distinct pending (node, time) pairs. When merging, the
+# stronger activation wins (summing them could make the strength grow without bound on dense cyclic graphs).
+import heapq
+from itertools import count
 
 
-class TimeQueue (PriorityQueue):
+class TimeQueue:
+
+  def __init__(self):
+    # heap of (activation_time, insertion_number, node_name). the insertion number breaks ties so that node names are never compared.
+    self._heap = []
+    # (activation_time, node_name) -> output_activation_strength
+    self._pending = {}
+    self._counter = count()
 
   def __str__(self) -> str:
     """ Returns a string representation of the queue. NOTE that you should not use this in production as iterating through the entire queue and sorting it is an expensive operation. """
@@ -46,47 +56,222 @@ class TimeQueue (PriorityQueue):
     return string
 
   def as_ordered_list(self):
-    return sorted(self._queue)
+    return [(activation_time, self._pending[(activation_time, node_name)], node_name) for (activation_time, _, node_name) in sorted(self._heap)]
 
-  def __bool__(self):
-    return not self.empty()
+  def __len__(self):
+    return len(self._heap)
 
-  async def add_node(self, activation_time, output_activation_strength, node_name):
-      """ Add a new node to the queue (in time order). It is assumed that the input is a tuple where the first value is the time. """
-      await self.put((activation_time, output_activation_strength, node_name))
+  def __bool__(self):
+    return bool(self._heap)
+
+  def add_node(self, activation_time, output_activation_strength, node_name):
+      """ Add a new node to the queue (in time order), or merge it into the entry already pending for that node at that time. """
+      key = (activation_time, node_name)
+      if key in self._pending:
+        if output_activation_strength > self._pending[key]:
+          self._pending[key] = output_activation_strength
+        return
+      self._pending[key] = output_activation_strength
+      heapq.heappush(self._heap, (activation_time, next(self._counter), node_name))
 
   def pop_node(self):
       """ Get the next node to be activated. """
-      return self.get_nowait()
+      (activation_time, _, node_name) = heapq.heappop(self._heap)
+      output_activation_strength = self._pending.pop((activation_time, node_name))
+      return (activation_time, output_activation_strength, node_name)
 
-async def test_as_ordered_list():
+def test_as_ordered_list():
   # two items
   tq = TimeQueue()
-  await tq.add_node(2, None, 'a')
-  await tq.add_node(1, None, 'b')
+  tq.add_node(2, None, 'a')
+  tq.add_node(1, None, 'b')
   ol = tq.as_ordered_list()
   assert ol == [(1, None, 'b'), (2, None, 'a')]
   # many items
   tq = TimeQueue()
-  await tq.add_node(3, None, 'a')
-  await tq.add_node(1, None, 'b')
-  await tq.add_node(2, None, 'c')
-  await tq.add_node(4, None, 'd')
-  await tq.add_node(0, None, 'e')
+  tq.add_node(3, None, 'a')
+  tq.add_node(1, None, 'b')
+  tq.add_node(2, None, 'c')
+  tq.add_node(4, None, 'd')
+  tq.add_node(0, None, 'e')
   ol = tq.as_ordered_list()
   assert ol == [(0, None, 'e'), (1, None, 'b'), (2, None, 'c'), (3, None, 'a'), (4, None, 'd')]
-await test_as_ordered_list()
+test_as_ordered_list()
 
-async def test_tq():
+def test_tq():
   tq = TimeQueue()
   # test that queue as a boolean is False
   assert bool(tq) == False
-  await tq.add_node(2., 1, 'a')
+  tq.add_node(2., 1, 'a')
   (time, strength, node) = tq.pop_node()
   assert time == 2.
   assert strength == 1
   assert node == 'a'
-await test_tq()
+test_tq()
+
+def test_tq_merges_duplicates():
+  tq = TimeQueue()
+  tq.add_node(1., 0.2, 'a')
+  tq.add_node(1., 0.5, 'a')
+  tq.add_node(1., 0.3, 'a')
+  tq.add_node(2., 0.1, 'a')
+  assert len(tq) == 2
+  assert tq.pop_node() == (1., 0.5, 'a')
+  assert tq.pop_node() == (2., 0.1, 'a')
+  assert not tq
+test_tq_merges_duplicates()
+
+
+# A calendar queue (a bucketed time wheel) with the same interface as TimeQueue.
+# Time is cut into buckets of equal width, and bucket i of the wheel holds every pending event whose "virtual bucket"
+# floor(time / width) is congruent to i. Popping walks the wheel from the current virtual bucket, so when the width
+# suits the spread of event times, add_node and pop_node are amortized O(1) instead of the heap's O(log n). The number
+# of buckets doubles or halves with the queue size, and at each resize the width is re-estimated from the gaps
+# between the earliest pending events. Events still pop in exact (time, insertion) order.
+import bisect
+
+
+class CalendarTimeQueue:
+
+  # number of earliest events used to estimate the bucket width when resizing
+  WIDTH_SAMPLE_SIZE = 25
+
+  def __init__(self, bucket_count=2, bucket_width=1.0):
+    # (activation_time, node_name) -> output_activation_strength, exactly as in TimeQueue
+    self._pending = {}
+    self._counter = count()
+    self._size = 0
+    self._build(bucket_count, bucket_width, current_time=0, entries=[])
+
+  def _build(self, bucket_count, bucket_width, current_time, entries):
+    self._buckets = [[] for _ in range(bucket_count)]
+    self._bucket_width = bucket_width
+    # the virtual bucket currently being popped from. every pending event is in this virtual bucket or a later one.
+    self._current_virtual_bucket = self._virtual_bucket(current_time)
+    for entry in entries:
+      self._insert(entry)
+
+  def _virtual_bucket(self, activation_time):
+    return int(activation_time // self._bucket_width)
+
+  def _insert(self, entry):
+    bucket = self._buckets[self._virtual_bucket(entry[0]) % len(self._buckets)]
+    bisect.insort(bucket, entry)
+
+  def _resize(self, bucket_count):
+    """ Rebuild the wheel with a new number of buckets and a bucket width estimated from the earliest pending events. """
+    entries = [entry for bucket in self._buckets for entry in bucket]
+    sample = heapq.nsmallest(self.WIDTH_SAMPLE_SIZE, entries)
+    gaps = [b[0] - a[0] for (a, b) in zip(sample, sample[1:])]
+    bucket_width = self._bucket_width
+    if gaps:
+      # ignore unusually large gaps, then make a bucket hold about three events (as in Brown's calendar queue)
+      average_gap = sum(gaps) / len(gaps)
+      typical_gaps = [gap for gap in gaps if gap <= 2 * average_gap]
+      if typical_gaps and sum(typical_gaps) > 0:
+        bucket_width = 3 * sum(typical_gaps) / len(typical_gaps)
+    current_time = sample[0][0] if sample else 0
+    self._build(bucket_count, bucket_width, current_time, entries)
+
+  def __str__(self) -> str:
+    """ Returns a string representation of the queue. NOTE that you should not use this in production as iterating through the entire queue and sorting it is an expensive operation. """
+    ordered_list = self.as_ordered_list()
+    string = 'CalendarTimeQueue' + str(ordered_list)
+    return string
+
+  def as_ordered_list(self):
+    entries = sorted(entry for bucket in self._buckets for entry in bucket)
+    return [(activation_time, self._pending[(activation_time, node_name)], node_name) for (activation_time, _, node_name) in entries]
+
+  def __len__(self):
+    return self._size
+
+  def __bool__(self):
+    return self._size > 0
+
+  def add_node(self, activation_time, output_activation_strength, node_name):
+      """ Add a new node to the queue (in time order), or merge it into the entry already pending for that node at that time. """
+      key = (activation_time, node_name)
+      if key in self._pending:
+        if output_activation_strength > self._pending[key]:
+          self._pending[key] = output_activation_strength
+        return
+      self._pending[key] = output_activation_strength
+      virtual_bucket = int(activation_time // self._bucket_width)
+      # an event earlier than the current position (only possible before popping has caught up) moves the position back
+      if virtual_bucket < self._current_virtual_bucket:
+        self._current_virtual_bucket = virtual_bucket
+      bisect.insort(self._buckets[virtual_bucket % len(self._buckets)], (activation_time, next(self._counter), node_name))
+      self._size += 1
+      if self._size > 2 * len(self._buckets):
+        self._resize(2 * len(self._buckets))
+
+  def pop_node(self):
+      """ Get the next node to be activated. """
+      if not self._size:
+        raise IndexError('pop from an empty queue')
+      buckets = self._buckets
+      bucket_count = len(buckets)
+      bucket_width = self._bucket_width
+      entry = None
+      # walk one lap of the wheel looking for an event in the current virtual bucket
+      for virtual_bucket in range(self._current_virtual_bucket, self._current_virtual_bucket + bucket_count):
+        bucket = buckets[virtual_bucket % bucket_count]
+        if bucket and bucket[0][0] // bucket_width <= virtual_bucket:
+          entry = bucket.pop(0)
+          self._current_virtual_bucket = virtual_bucket
+          break
+      if entry is None:
+        # every pending event is more than a lap ahead, so jump straight to the earliest one
+        bucket = min((bucket for bucket in self._buckets if bucket), key=lambda bucket: bucket[0])
+        entry = bucket.pop(0)
+        self._current_virtual_bucket = self._virtual_bucket(entry[0])
+      self._size -= 1
+      if bucket_count > 2 and self._size < bucket_count // 2:
+        self._resize(bucket_count // 2)
+      (activation_time, _, node_name) = entry
+      output_activation_strength = self._pending.pop((activation_time, node_name))
+      return (activation_time, output_activation_strength, node_name)
+
+def test_calendar_tq():
+  # the same checks as for TimeQueue
+  tq = CalendarTimeQueue()
+  assert bool(tq) == False
+  for (t, name) in [(3, 'a'), (1, 'b'), (2, 'c'), (4, 'd'), (0, 'e')]:
+    tq.add_node(t, None, name)
+  assert tq.as_ordered_list() == [(0, None, 'e'), (1, None, 'b'), (2, None, 'c'), (3, None, 'a'), (4, None, 'd')]
+  tq = CalendarTimeQueue()
+  tq.add_node(1., 0.2, 'a')
+  tq.add_node(1., 0.5, 'a')
+  tq.add_node(2., 0.1, 'a')
+  assert len(tq) == 2
+  assert tq.pop_node() == (1., 0.5, 'a')
+  assert tq.pop_node() == (2., 0.1, 'a')
+  assert not tq
+test_calendar_tq()
+
+def test_calendar_tq_matches_heap():
+  # interleave pushes and pops of real-valued times (including same-time and far-future events) and compare with the heap
+  import random
+  rng = random.Random(0)
+  heap_tq = TimeQueue()
+  calendar_tq = CalendarTimeQueue()
+  current_time = 0
+  for i in range(3000):
+    for _ in range(rng.randint(0, 3)):
+      activation_time = current_time + rng.choice([0, rng.random(), rng.expovariate(0.1), 1000 * rng.random()])
+      node_name = f'n{rng.randint(0, 50)}'
+      heap_tq.add_node(activation_time, i, node_name)
+      calendar_tq.add_node(activation_time, i, node_name)
+    assert len(heap_tq) == len(calendar_tq)
+    if heap_tq and rng.random() < 0.6:
+      event = heap_tq.pop_node()
+      assert calendar_tq.pop_node() == event
+      current_time = event[0]
+  while heap_tq:
+    assert calendar_tq.pop_node() == heap_tq.pop_node()
+  assert not calendar_tq
+test_calendar_tq_matches_heap()
 
 
 
@@ -123,62 +308,182 @@ def get_link_transfer_time(weight):
   return weight
 
 
-async def queue_node_activation(tq, activation_time, input_activation_strength, node):
+def queue_node_activation(tq, activation_time, input_activation_strength, node):
+  """ See if the node will activate and if so put it into the queue. Returns whether it will activate. """
   will_activate = input_activation_strength > threshold 
   # if it will activate then calculate the seconds/steps until activation (a whole number 1 or higher)
   if not will_activate:
-    return
+    return False
   # Activate the node (deferred).
   # -- assign the node it's own activation strength
   output_activation_strength = input_activation_strength * get_node_strength(node['weight'])
   # add the node to the queue
-  await tq.add_node(activation_time, output_activation_strength, node['name'])
+  tq.add_node(activation_time, output_activation_strength, node['name'])
+  return True
 
 
 # Input parameters are the graph (nodes, edges, node weights, edge weights, node types, and schema)
-async def algo(graph, start_state, schema):
+def algo(graph, start_state, schema, queue_class=TimeQueue, tracer=None, **stop_conditions):
     """ The ONE-BY-ONE spreading activation algorithm.
     This algorithm is simpler, slower, and more general.  It does not require a stepwise system, and hence could model a real time scenario.
+    queue_class can be TimeQueue (a heap) or CalendarTimeQueue (amortized O(1) per event); both give the same result.
+    Pass a tracer (see spreading_activation/tracing.py) to collect counters about the run. With tracer=None nothing extra is done.
+    Takes the same stop conditions as iter_activations.
+    """
+    # start timer
+    start_time = time.time()
+    activation_history = list(iter_activations(graph, start_state, schema, queue_class=queue_class, tracer=tracer, **stop_conditions))
+    end_time = time.time()
+    elapsed_time = end_time - start_time
+    return {'elapsed_time': elapsed_time, 'activation_history': activation_history}
+
+
+def iter_activations(graph, start_state, schema, queue_class=TimeQueue, tracer=None, max_time=None, max_events=None, max_nodes=None, time_budget=None):
+    """ The ONE-BY-ONE algorithm as a generator. Yields each (activation_time, output_activation_strength, node_name) as soon as it is popped, so only the queue is held in memory and the caller can stop at any point.
+    Stop conditions (None means no limit):
+      max_time: stop before the first activation after this simulated time.
+      max_events: stop once this many activations have been yielded.
+      max_nodes: stop once this many distinct nodes have been activated. This keeps a set of the activated nodes.
+      time_budget: stop before the next activation once this many seconds of wall-clock time have passed.
     """
-    activation_history = []
-    tq = TimeQueue()
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+    events = 0
+    activated_nodes = None if max_nodes is None else set()
+    tq = queue_class()
     # Put the starting nodes in the time queue. It will be the first to activate.
     for (start_node, start_input_activation_strength) in start_state:
-      await queue_node_activation(tq, activation_time=0, input_activation_strength=start_input_activation_strength, node=start_node)
+      if not queue_node_activation(tq, activation_time=0, input_activation_strength=start_input_activation_strength, node=start_node) and tracer is not None:
+        tracer.prune()
+    if tracer is not None:
+      tracer.queue_size(len(tq))
     # current time is 0 (0 seconds)
     current_time = 0
-    # start timer
-    start_time = time.time()
-    # Iteratively apply this algo until you've exhausted all reachable nodes.
+    try:
+      # Iteratively apply this algo until you've exhausted all reachable nodes.
+      while tq:
+        # check the stop conditions before popping the next event
+        if max_events is not None and events >= max_events:
+          return
+        if activated_nodes is not None and len(activated_nodes) >= max_nodes:
+          return
+        if deadline is not None and time.perf_counter() >= deadline:
+          return
+        if tracer is not None:
+          tracer.phase('pop')
+        # take the first node out of the time queue (hence, the first event since nodes are ordered)
+        (current_node_activation_time, current_node_activation_strength, current_node_name) = tq.pop_node()
+        if max_time is not None and current_node_activation_time > max_time:
+          return
+        current_node = graph.nodes[current_node_name]
+        if tracer is not None:
+          tracer.pop_event(current_node_activation_time, tq)
+        events += 1
+        if activated_nodes is not None:
+          activated_nodes.add(current_node['name'])
+        yield (current_node_activation_time, current_node_activation_strength, current_node['name'])
+        if tracer is not None:
+          tracer.phase('expand')
+        # update the current time
+        current_time = current_node_activation_time
+        # intersect its children with valid types to spread to. (note that this could be a preprocessing step if we don't want to dynamically change strategies)
+        valid_types = get_valid_types_following(current_node['type'], schema)
+        children = [graph.nodes[x] for x in graph.successors(current_node['name'])]
+        valid_children = [x for x in children if x['type'] in valid_types]
+        if tracer is not None:
+          tracer.scan(len(children), len(children) - len(valid_children))
+        # for each valid child, calculate whether it will activate
+        for child in valid_children:
+          # Conditionally activate the node. (queue_node_activation will only activate the node if strength above threshold)
+          link = graph.edges[current_node['name'], child['name']]
+          time_until_activation = get_link_transfer_time(link['weight'])
+          # activation time of the node is equal to current seconds plus the seconds until activation
+          activation_time = current_time + time_until_activation
+          # TODO: add edge weight to calculation
+          input_activation_strength = current_node_activation_strength * get_link_strength(link['weight']) * activation_decay
+          # place the child into the time queue according to the computed time (for optimization we could have a sequence or custom struct where all children of the same act time are grouped together, it could even just be a set where the inputs are numbers. or a deck so we can pop efficiently)
+          if not queue_node_activation(tq, activation_time, input_activation_strength, child) and tracer is not None:
+            tracer.prune()
+        if tracer is not None:
+          tracer.queue_size(len(tq))
+    finally:
+      if tracer is not None:
+        tracer.finish()
+
+
+
+# The TOP-K mode. Strength only goes down along a path (node and link strengths are at most 1 and activation_decay is
+# below 1), so an activation that is not stronger than the current k-th best can never lead to one that is. Those are
+# not queued, and a node whose strength times activation_decay can't beat the k-th best is not expanded. The run
+# then ends as soon as nothing left can reach the top k, instead of running all the way down to the threshold.
+class TopK:
+
+  def __init__(self, k):
+    self.k = k
+    # node_name -> strength of the nodes currently in the top k
+    self.top = {}
+    # min-heap of (strength, insertion_number, node_name). entries whose strength is no longer the node's are skipped.
+    self._heap = []
+    self._counter = count()
+
+  def bound(self):
+      """ The strength an activation has to beat to change the top k. """
+      if self.k <= 0:
+        return float('inf')
+      if len(self.top) < self.k:
+        return float('-inf')
+      while self.top.get(self._heap[0][2]) != self._heap[0][0]:
+        heapq.heappop(self._heap)
+      return self._heap[0][0]
+
+  def add(self, strength, node_name):
+      """ Record an activation, keeping each node's strongest. """
+      if node_name in self.top:
+        if strength <= self.top[node_name]:
+          return
+      elif len(self.top) >= self.k:
+        if strength <= self.bound():
+          return
+        # make room by dropping the current k-th best
+        (_, _, weakest) = heapq.heappop(self._heap)
+        del self.top[weakest]
+      self.top[node_name] = strength
+      heapq.heappush(self._heap, (strength, next(self._counter), node_name))
+
+  def as_list(self):
+      return sorted(((strength, node_name) for (node_name, strength) in self.top.items()), key=lambda pair: -pair[0])
+
+
+def top_k(graph, start_state, schema, k, queue_class=TimeQueue):
+    """ The k most strongly activated nodes, as a list of (output_activation_strength, node_name), strongest first. A node's strength is its strongest activation. Ties for the k-th place are broken arbitrarily. """
+    best = TopK(k)
+    tq = queue_class()
+    for (start_node, start_input_activation_strength) in start_state:
+      output_activation_strength = start_input_activation_strength * get_node_strength(start_node['weight'])
+      if start_input_activation_strength > threshold and output_activation_strength > best.bound():
+        best.add(output_activation_strength, start_node['name'])
+        tq.add_node(0, output_activation_strength, start_node['name'])
     while tq:
-      print(f'tq: {tq}')
-      # take the first node out of the time queue (hence, the first event since nodes are ordered)
-      (current_node_activation_time, current_node_activation_strength, current_node_name) = tq.pop_node()
-      current_node = graph.nodes[current_node_name]
-      activation_history.append((current_node_activation_time, current_node_activation_strength, current_node['name']))
-      # update the current time
-      current_time = current_node_activation_time
-      # intersect its children with valid types to spread to. (note that this could be a preprocessing step if we don't want to dynamically change strategies)
-      valid_types = get_valid_types_following(current_node['type'], schema)
-      children = [graph.nodes[x] for x in graph.successors(current_node['name'])]
-      valid_children = [x for x in children if x['type'] in valid_types]
-      # for each valid child, calculate whether it will activate
-      for child in valid_children:
-        # Conditionally activate the node. (queue_node_activation will only activate the node if strength above threshold)
-        link = graph.edges[current_node['name'], child['name']]
-        time_until_activation = get_link_transfer_time(link['weight'])
-        # activation time of the node is equal to current seconds plus the seconds until activation
-        activation_time = current_time + time_until_activation
-        # TODO: add edge weight to calculation
+      (current_time, current_node_activation_strength, current_node_name) = tq.pop_node()
+      # nothing this node reaches can beat the k-th best
+      if current_node_activation_strength * activation_decay <= best.bound():
+        continue
+      valid_types = get_valid_types_following(graph.nodes[current_node_name]['type'], schema)
+      for child_name in graph.successors(current_node_name):
+        child = graph.nodes[child_name]
+        if child['type'] not in valid_types:
+          continue
+        link = graph.edges[current_node_name, child_name]
         input_activation_strength = current_node_activation_strength * get_link_strength(link['weight']) * activation_decay
-        # place the child into the time queue according to the computed time (for optimization we could have a sequence or custom struct where all children of the same act time are grouped together, it could even just be a set where the inputs are numbers. or a deck so we can pop efficiently)
-        await queue_node_activation(tq, activation_time, input_activation_strength, child)
-    end_time = time.time()
-    elapsed_time = end_time - start_time
-    return {'elapsed_time': elapsed_time, 'activation_history': activation_history}
+        if not input_activation_strength > threshold:
+          continue
+        output_activation_strength = input_activation_strength * get_node_strength(child['weight'])
+        if output_activation_strength > best.bound():
+          best.add(output_activation_strength, child_name)
+          tq.add_node(current_time + get_link_transfer_time(link['weight']), output_activation_strength, child_name)
+    return best.as_list()
 
 
-async def test_basic():
+def test_basic():
   # setup the graph and whatnot
   g = nx.DiGraph()
   # setup a schema
@@ -191,11 +496,11 @@ async def test_basic():
   # set the starting state, that is, specify the starting nodes and their starting activation inputs
   start_state = [(g.nodes['value_prop'], 1)]
   # kick off the algo
-  out = await algo(g, start_state, schema)
+  out = algo(g, start_state, schema)
   print(out)
-# await test_basic()
+# test_basic()
 
-async def test_two():
+def test_two():
   # setup
   g = nx.DiGraph()
   schema = ['b', 'c']
@@ -208,11 +513,11 @@ async def test_two():
   print(f'\n{g}')
   start_state = [(g.nodes['b'], 1)]
   # kick off the algo
-  out = await algo(g, start_state, schema)
+  out = algo(g, start_state, schema)
   print(out)
-# await test_two()
+# test_two()
 
-async def test_three():
+def test_three():
   # setup
   g = nx.DiGraph()
   schema = ['a', 'b', 'c']
@@ -225,11 +530,11 @@ async def test_three():
   print(f'\n{g}')
   start_state = [(g.nodes['b'], 1)]
   # kick off the algo
-  out = await algo(g, start_state, schema)
+  out = algo(g, start_state, schema)
   print(out)
-# await test_three()
+# test_three()
 
-async def test_outward():
+def test_outward():
   # setup
   g = nx.DiGraph()
   schema = ['a', 'b', 'c', 'd', 'e']
@@ -242,9 +547,22 @@ async def test_outward():
   print(f'\n{g}')
   start_state = [(g.nodes['c'], 1)]
   # kick off the algo
-  out = await algo(g, start_state, schema)
+  out = algo(g, start_state, schema)
   print(out)
-await test_outward()
+  # the calendar queue gives the same result
+  assert algo(g, start_state, schema, queue_class=CalendarTimeQueue)['activation_history'] == out['activation_history']
+  # stop conditions
+  history = out['activation_history']
+  assert algo(g, start_state, schema, max_time=1)['activation_history'] == history[:3]
+  assert algo(g, start_state, schema, max_events=2)['activation_history'] == history[:2]
+  assert algo(g, start_state, schema, max_nodes=4)['activation_history'] == history[:4]
+  assert algo(g, start_state, schema, time_budget=0)['activation_history'] == []
+  assert next(iter_activations(g, start_state, schema)) == history[0]
+  # top-k
+  assert top_k(g, start_state, schema, 2) == [(1.0, 'c'), (0.4, 'b')]
+  assert top_k(g, start_state, schema, 10) == sorted([(strength, name) for (_, strength, name) in history], key=lambda pair: -pair[0])
+  assert top_k(g, start_state, schema, 0) == []
+test_outward()
 
 
 
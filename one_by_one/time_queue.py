@@ -1,17 +1,36 @@
 # NOTE: This class is NOT thread safe.
-# PriorityQueue uses an internal heap to optimize placing and retrieving items.
-from asyncio import PriorityQueue
+# The queue is an indexed heap keyed by (activation_time, node), so a node that is added again for a time it is
+# already queued for is merged into the pending entry rather than pushed twice.
+import heapq
+from itertools import count
 
 
-class TimeQueue (PriorityQueue):
+class TimeQueue:
+    def __init__(self):
+        # heap of (activation_time, insertion_number, node). the insertion number breaks ties so that nodes are never compared.
+        self._heap = []
+        self._pending = set()
+        self._counter = count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __bool__(self):
+        return bool(self._heap)
+
     def add_node(self, new_node, activation_time):
         """ Add a new node to the queue (in time order).
             new_node: the node to be added
             activation_time: the time that the node will get activated
         """
-        self.put((activation_time, new_node))
+        key = (activation_time, new_node)
+        if key in self._pending:
+            return
+        self._pending.add(key)
+        heapq.heappush(self._heap, (activation_time, next(self._counter), new_node))
 
     def pop_node(self):
         """ Get the next node to be activated. """
-        (activation_time, node) = self.get_nowait()
+        (activation_time, _, node) = heapq.heappop(self._heap)
+        self._pending.discard((activation_time, node))
         return (activation_time, node)
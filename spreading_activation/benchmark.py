@@ -0,0 +1,211 @@
+# Here we benchmark the engines against each other on the synthetic graphs of generators.py.
+#
+# For every graph and engine we record the wall-clock time, the activations per second ("events"), the links
+# scanned per second ("edges"), the time per step and the peak resident memory, as one JSON object per line:
+#
+#   python -m spreading_activation.benchmark --graphs scale_free grid --links 1000 100000 --output results.jsonl
+#
+# Each engine runs in a forked child process by default, so its peak RSS is its own (plus the graph it shares
+# with the parent) rather than the highest of every run so far.
+#
+# The differential check runs every engine on the same query and compares their activations. The engines don't
+# all keep repeated activations of a node the same way (family-by-family keeps every one, one-by-one and lockstep
+# merge them into the strongest), so the check compares the strongest activation of each (time, node). One-by-one
+# activation times are the raw link weights, so it takes part only when every weight is a whole number.
+
+
+# imports
+import argparse
+import json
+import multiprocessing
+import resource
+import sys
+import time
+
+import numpy as np
+
+from . import family_by_family, lockstep, one_by_one
+from .family_by_family import ACTIVATION_DECAY, THRESHOLD
+from .generators import GRAPHS, LINK_WEIGHTS
+
+
+def run_one_by_one(cgraph, start_state, activation_decay, threshold):
+    return one_by_one.columnar_algo(cgraph, start_state, activation_decay, threshold)
+
+
+def run_family_by_family(cgraph, start_state, activation_decay, threshold):
+    return family_by_family.algo(cgraph, start_state, activation_decay, threshold)
+
+
+def run_batched(cgraph, start_state, activation_decay, threshold):
+    return family_by_family.columnar_algo(cgraph, start_state, activation_decay, threshold)
+
+
+def run_lockstep(cgraph, start_state, activation_decay, threshold):
+    return lockstep.algo(cgraph, start_state, activation_decay, threshold)
+
+
+def run_lockstep_batched(cgraph, start_state, activation_decay, threshold):
+    return lockstep.batched_algo(cgraph, start_state, activation_decay, threshold)
+
+
+# engine name -> (function of (cgraph, start_state, activation_decay, threshold), whether its times are stepwise)
+ENGINES = {
+    'one_by_one': (run_one_by_one, False),
+    'family_by_family': (run_family_by_family, True),
+    'batched': (run_batched, True),
+    'lockstep': (run_lockstep, True),
+    'lockstep_batched': (run_lockstep_batched, True),
+}
+
+
+def as_activations(cgraph, history):
+    """ Turn the output of any engine into a list of (time, output_activation_strength, node_id). """
+    if hasattr(history, 'node_ids'):
+        return list(zip(history.times.tolist(), history.strengths.tolist(), history.node_ids.tolist()))
+    return [(current_time, strength, cgraph.node_id(name)) for (current_time, family) in history for (strength, name) in family]
+
+
+def strongest_activations(activations):
+    """ {(time, node_id): strongest output_activation_strength} of a list of activations. """
+    strongest = {}
+    for (current_time, strength, node_id) in activations:
+        key = (current_time, node_id)
+        if strength > strongest.get(key, 0):
+            strongest[key] = strength
+    return strongest
+
+
+def check(cgraph, start_state, engines=None, activation_decay=ACTIVATION_DECAY, threshold=THRESHOLD):
+    """ Run the engines on one query and compare the strongest activation of every (time, node). Returns the names of the engines that took part. Raises AssertionError naming the first engine that disagrees. """
+    engines = list(ENGINES) if engines is None else engines
+    whole_weights = bool(np.array_equal(cgraph.transfer_time, cgraph.transfer_steps))
+    compared = []
+    expected = None
+    for name in engines:
+        (run, stepwise) = ENGINES[name]
+        if not stepwise and not whole_weights:
+            continue
+        strongest = strongest_activations(as_activations(cgraph, run(cgraph, start_state, activation_decay, threshold)))
+        if expected is None:
+            expected = strongest
+        elif strongest != expected:
+            differences = sorted(set(strongest.items()) ^ set(expected.items()))
+            raise AssertionError(f'{name} disagrees with {compared[0]} at {differences[:5]}')
+        compared.append(name)
+    return compared
+
+
+def measure(cgraph, start_state, engine, activation_decay=ACTIVATION_DECAY, threshold=THRESHOLD):
+    """ Run an engine once and measure it. Returns a dict of measurements. """
+    (run, _) = ENGINES[engine]
+    start_time = time.perf_counter()
+    history = run(cgraph, start_state, activation_decay, threshold)
+    seconds = time.perf_counter() - start_time
+    activations = as_activations(cgraph, history)
+    node_ids = np.array([node_id for (_, _, node_id) in activations], dtype=np.int64)
+    # every activation scans all the outgoing links of its node
+    edges = int((cgraph.indptr[node_ids + 1] - cgraph.indptr[node_ids]).sum())
+    steps = len(set(current_time for (current_time, _, _) in activations))
+    return {
+        'engine': engine,
+        'seconds': seconds,
+        'events': len(activations),
+        'edges': edges,
+        'steps': steps,
+        'events_per_sec': len(activations) / seconds if seconds else None,
+        'edges_per_sec': edges / seconds if seconds else None,
+        'seconds_per_step': seconds / steps if steps else None,
+        # kilobytes on Linux
+        'peak_rss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def measure_in_child(connection, cgraph, start_state, engine, activation_decay, threshold):
+    try:
+        connection.send(measure(cgraph, start_state, engine, activation_decay, threshold))
+    except Exception as error:
+        connection.send(error)
+    finally:
+        connection.close()
+
+
+def measure_isolated(cgraph, start_state, engine, activation_decay=ACTIVATION_DECAY, threshold=THRESHOLD):
+    """ measure() in a forked child process, which inherits the graph instead of pickling it. """
+    context = multiprocessing.get_context('fork')
+    (receiver, sender) = context.Pipe(duplex=False)
+    child = context.Process(target=measure_in_child, args=(sender, cgraph, start_state, engine, activation_decay, threshold))
+    child.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        # the child died without answering, e.g. killed for running out of memory
+        child.join()
+        raise RuntimeError(f'{engine} exited with code {child.exitcode}') from None
+    child.join()
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+def pick_start_state(cgraph, num_starts, strength, seed):
+    """ num_starts random nodes that have outgoing links, each with the given input activation strength. """
+    rng = np.random.default_rng(seed)
+    candidates = np.flatnonzero(np.diff(cgraph.indptr) > 0)
+    if not len(candidates):
+        candidates = np.arange(cgraph.num_nodes)
+    start_ids = rng.choice(candidates, min(num_starts, len(candidates)), replace=False)
+    return [(cgraph.names[node_id], strength) for node_id in start_ids.tolist()]
+
+
+def run_benchmark(graphs, links, engines=None, link_weights=LINK_WEIGHTS, num_starts=10, strength=1.0, activation_decay=ACTIVATION_DECAY, threshold=THRESHOLD, repeat=1, differential=True, isolate=True, seed=0):
+    """ Benchmark the engines on every graph kind at every size. Yields one dict of results per graph, engine and repetition. """
+    engines = list(ENGINES) if engines is None else engines
+    for kind in graphs:
+        for num_links in links:
+            start_time = time.perf_counter()
+            cgraph = GRAPHS[kind](num_links, link_weights, seed)
+            build_seconds = time.perf_counter() - start_time
+            start_state = pick_start_state(cgraph, num_starts, strength, seed)
+            graph_info = {'graph': kind, 'nodes': cgraph.num_nodes, 'links': cgraph.num_links, 'link_weights': link_weights, 'build_seconds': build_seconds}
+            if differential:
+                graph_info['checked'] = check(cgraph, start_state, engines, activation_decay, threshold)
+            for engine in engines:
+                for repetition in range(repeat):
+                    if isolate:
+                        result = measure_isolated(cgraph, start_state, engine, activation_decay, threshold)
+                    else:
+                        result = measure(cgraph, start_state, engine, activation_decay, threshold)
+                    yield dict(graph_info, repetition=repetition, **result)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the spreading activation engines on synthetic graphs.')
+    parser.add_argument('--graphs', nargs='+', default=list(GRAPHS), choices=list(GRAPHS))
+    parser.add_argument('--links', nargs='+', type=int, default=[1000, 10000, 100000], help='approximate number of links of each graph')
+    parser.add_argument('--engines', nargs='+', default=list(ENGINES), choices=list(ENGINES))
+    parser.add_argument('--link-weights', default=LINK_WEIGHTS, help="weight distribution, e.g. 'integer:1:3' or 'uniform:0.5:2' (see generators.py)")
+    parser.add_argument('--starts', type=int, default=10, help='number of start nodes')
+    parser.add_argument('--strength', type=float, default=1.0, help='input activation strength of the start nodes')
+    parser.add_argument('--decay', type=float, default=ACTIVATION_DECAY)
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-check', action='store_true', help='skip the differential check')
+    parser.add_argument('--in-process', action='store_true', help="don't fork a process per run (peak RSS is then cumulative)")
+    parser.add_argument('--output', help='append the JSON lines to this file instead of printing them')
+    args = parser.parse_args(argv)
+    output = sys.stdout if args.output is None else open(args.output, 'a')
+    try:
+        results = run_benchmark(args.graphs, args.links, args.engines, args.link_weights, args.starts, args.strength, args.decay, args.threshold, args.repeat, not args.no_check, not args.in_process, args.seed)
+        for result in results:
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
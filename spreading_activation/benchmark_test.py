@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from spreading_activation import benchmark
+from spreading_activation.generators import GRAPHS, compile_edges, grid_graph, make_weights
+
+
+def test_compile_edges():
+    # a <-> b <-> c, plus a link a -> c that the schema doesn't allow
+    cg = compile_edges(['a', 'b', 'c'], [0, 1, 2], [0, 0, 0], [1, 0, 0, 1], [0, 1, 2, 2], [1, 2, 1, 3])
+    assert cg.rejected_links == 1
+    assert cg.indptr.tolist() == [0, 1, 3, 3]
+    assert cg.indices.tolist() == [1, 0, 2]
+    assert cg.link_weight.tolist() == [2, 1, 3]
+
+
+def test_generators():
+    for (kind, make_graph) in GRAPHS.items():
+        cg = make_graph(2000, 'uniform:0.5:2', 1)
+        assert cg.rejected_links == 0, kind
+        assert 0 < cg.num_links <= 2000
+        assert ((cg.link_weight >= 0.5) & (cg.link_weight <= 2)).all()
+    assert grid_graph(3, 4).num_links == 2 * (3 * 3 + 2 * 4)
+    with pytest.raises(ValueError):
+        make_weights('normal:1', np.random.default_rng(), 3)
+
+
+def test_differential_check():
+    for make_graph in GRAPHS.values():
+        cg = make_graph(3000, 'integer:1:3', 2)
+        start_state = benchmark.pick_start_state(cg, 5, 3.0, 2)
+        assert benchmark.check(cg, start_state) == list(benchmark.ENGINES)
+    # one-by-one activation times differ from the stepwise ones when weights are not whole numbers
+    cg = GRAPHS['layered'](3000, 'uniform:0.5:2', 2)
+    assert benchmark.check(cg, benchmark.pick_start_state(cg, 5, 3.0, 2)) == ['family_by_family', 'batched', 'lockstep', 'lockstep_batched']
+
+
+def test_run_benchmark():
+    results = list(benchmark.run_benchmark(['grid'], [500], ['one_by_one', 'batched'], isolate=False))
+    assert [result['engine'] for result in results] == ['one_by_one', 'batched']
+    for result in results:
+        assert result['graph'] == 'grid'
+        assert result['events'] > 0
+        assert result['edges'] >= result['events']
+        assert result['peak_rss_kib'] > 0
+    # forked, too
+    (result,) = benchmark.run_benchmark(['grid'], [500], ['batched'], differential=False)
+    assert result['events'] == results[1]['events']
@@ -0,0 +1,166 @@
+# Here we run a single STEPWISE FAMILY query on several worker processes, bulk-synchronously.
+#
+# The nodes are split into K partitions of contiguous node ids with about the same number of links each, and each
+# worker process expands the nodes of one partition. The graph itself lives in shared memory (see executor.py).
+# Every step goes like this:
+#   1. the coordinator (the calling process) pops the next family from its ring buffer and sends each worker the
+#      part of the family that falls in its partition, along with each node's position in the family;
+#   2. each worker gathers the links of its nodes, applies THRESHOLD and sends back the surviving child activations;
+#   3. once every worker has answered (the one barrier of the step) the coordinator puts the children into the ring
+#      buffer, which is how activations cross from one partition to another.
+# The children are put back in the order of their parent's position in the family, so the activation history is
+# exactly the one the sequential algo produces. Small families are not worth a round trip to the workers, so
+# families with fewer than parallel_threshold nodes are expanded by the coordinator itself.
+
+
+# imports
+import multiprocessing
+
+import numpy as np
+
+from .executor import attach, publish
+from .family_by_family import ACTIVATION_DECAY, THRESHOLD
+
+
+def expand(cgraph, family_ids, family_strengths, positions, activation_decay, threshold):
+    """ Expand (part of) a family. Returns (child_ids, output_activation_strengths, parent_positions, steps_until_activation) for the activations above THRESHOLD, in link order. """
+    (link_ids, owners) = cgraph.links_of(family_ids)
+    steps_until_activation = cgraph.transfer_steps[link_ids]
+    if (steps_until_activation <= 0).any():
+        raise ValueError('Link weight must be positive in stepwise algo (use a positive weight).')
+    input_activation_strengths = family_strengths[owners] * cgraph.link_strength[link_ids] * activation_decay
+    will_activate = input_activation_strengths > threshold
+    link_ids = link_ids[will_activate]
+    child_ids = cgraph.indices[link_ids].astype(np.int64)
+    output_activation_strengths = input_activation_strengths[will_activate] * cgraph.node_strength[child_ids]
+    return (child_ids, output_activation_strengths, positions[owners[will_activate]], steps_until_activation[will_activate])
+
+
+def partition(cgraph, partition_count):
+    """ Split the node ids into partition_count contiguous ranges with about the same number of links. Returns the first node id of each partition. """
+    link_targets = np.linspace(0, cgraph.num_links, partition_count + 1)[:-1]
+    starts = np.searchsorted(cgraph.indptr, link_targets, side='right') - 1
+    # the first partition always starts at node 0, even if the first nodes have no links
+    starts[0] = 0
+    return starts
+
+
+def worker_main(conn, shm_name, layout, num_nodes, schema, activation_decay, threshold):
+    (shm, cgraph) = attach(shm_name, layout, num_nodes, schema)
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        (family_ids, family_strengths, positions) = message
+        try:
+            conn.send(expand(cgraph, family_ids, family_strengths, positions, activation_decay, threshold))
+        except ValueError as error:
+            conn.send(error)
+    del cgraph
+    shm.close()
+
+
+class BSPEngine:
+    """ A set of worker processes that run family-by-family queries on one CompiledGraph together.
+    processes defaults to the number of CPUs. Use it as a context manager (or call close()) so the workers stop and the shared memory is freed.
+    """
+
+    def __init__(self, cgraph, processes=None, activation_decay=ACTIVATION_DECAY, threshold=THRESHOLD, parallel_threshold=1024):
+        self.cgraph = cgraph
+        self.activation_decay = activation_decay
+        self.threshold = threshold
+        self.parallel_threshold = parallel_threshold
+        processes = processes or multiprocessing.cpu_count()
+        self.partition_starts = partition(cgraph, processes)
+        (self._shm, layout) = publish(cgraph)
+        self._workers = []
+        for _ in range(processes):
+            (conn, worker_conn) = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=worker_main, args=(worker_conn, self._shm.name, layout, cgraph.num_nodes, cgraph.schema, activation_decay, threshold), daemon=True)
+            process.start()
+            self._workers.append((process, conn))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """ Stop the workers and free the shared memory. """
+        if self._workers is None:
+            return
+        for (process, conn) in self._workers:
+            conn.send(None)
+        for (process, conn) in self._workers:
+            process.join()
+            conn.close()
+        self._workers = None
+        self._shm.close()
+        self._shm.unlink()
+
+    def expand_family(self, family_ids, family_strengths):
+        """ Expand a whole family, on the workers if it is big enough. Same result as expand() on the whole family. """
+        positions = np.arange(len(family_ids))
+        if len(family_ids) < self.parallel_threshold:
+            return expand(self.cgraph, family_ids, family_strengths, positions, self.activation_decay, self.threshold)
+        owners = np.searchsorted(self.partition_starts, family_ids, side='right') - 1
+        busy = []
+        for (partition_index, (_, conn)) in enumerate(self._workers):
+            in_partition = owners == partition_index
+            if in_partition.any():
+                conn.send((family_ids[in_partition], family_strengths[in_partition], positions[in_partition]))
+                busy.append(conn)
+        # the barrier: wait for every worker that got part of the family
+        results = [conn.recv() for conn in busy]
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        (child_ids, strengths, parent_positions, steps) = (np.concatenate(arrays) for arrays in zip(*results))
+        # back into the order the sequential algo produces: by parent position, and by link within a parent
+        order = np.argsort(parent_positions, kind='stable')
+        return (child_ids[order], strengths[order], parent_positions[order], steps[order])
+
+    def algo(self, start_state):
+        """ The STEPWISE FAMILY spreading activation algorithm. Same inputs (without the graph) and output as family_by_family.algo(). """
+        cgraph = self.cgraph
+        names = cgraph.names
+        activation_history = []
+        ring_size = max(int(cgraph.transfer_steps.max(initial=1)), 1)
+        ring = [[] for _ in range(ring_size)]
+        pending_slots = 0
+        start_ids = np.array([cgraph.node_id(node) for (node, _) in start_state], dtype=np.int64)
+        start_strengths = np.array([strength for (_, strength) in start_state], dtype=np.float64)
+        will_activate = start_strengths > self.threshold
+        if will_activate.any():
+            start_ids = start_ids[will_activate]
+            ring[0].append((start_ids, start_strengths[will_activate] * cgraph.node_strength[start_ids]))
+            pending_slots += 1
+        current_time = 0
+        while pending_slots:
+            slot = current_time % ring_size
+            chunks = ring[slot]
+            ring[slot] = []
+            if chunks:
+                pending_slots -= 1
+                family_ids = np.concatenate([ids for (ids, _) in chunks])
+                family_strengths = np.concatenate([strengths for (_, strengths) in chunks])
+            else:
+                family_ids = np.empty(0, dtype=np.int64)
+                family_strengths = np.empty(0, dtype=np.float64)
+            activation_history.append((current_time, list(zip(family_strengths.tolist(), [names[node_id] for node_id in family_ids.tolist()]))))
+            (child_ids, output_activation_strengths, _, steps_until_activation) = self.expand_family(family_ids, family_strengths)
+            for steps in np.unique(steps_until_activation).tolist():
+                arriving = steps_until_activation == steps
+                target = ring[(current_time + steps) % ring_size]
+                if not target:
+                    pending_slots += 1
+                target.append((child_ids[arriving], output_activation_strengths[arriving]))
+            current_time += 1
+        return activation_history
+
+
+def algo(cgraph, start_state, processes=None, activation_decay=ACTIVATION_DECAY, threshold=THRESHOLD):
+    """ Run one query on a temporary BSPEngine. For many queries, keep a BSPEngine around instead (starting the workers is not free). """
+    with BSPEngine(cgraph, processes, activation_decay, threshold) as engine:
+        return engine.algo(start_state)
@@ -0,0 +1,30 @@
+import pytest
+
+from spreading_activation.bsp import BSPEngine, partition
+from spreading_activation.compiled_graph import compile_graph
+from spreading_activation.compiled_graph_test import make_graph
+from spreading_activation.multi_query_test import make_random_graph
+from spreading_activation import family_by_family
+
+
+def test_partition():
+    (g, schema) = make_random_graph(60, 600, seed=1)
+    cg = compile_graph(g, schema)
+    starts = partition(cg, 3)
+    assert starts[0] == 0
+    link_counts = [cg.indptr[end] - cg.indptr[start] for (start, end) in zip(starts, list(starts[1:]) + [cg.num_nodes])]
+    assert max(link_counts) - min(link_counts) < 40
+
+
+def test_bsp_matches_sequential():
+    (g, schema) = make_random_graph(60, 600, seed=1)
+    cg = compile_graph(g, schema)
+    # parallel_threshold=0 sends every family to the workers
+    with BSPEngine(cg, processes=3, parallel_threshold=0) as engine:
+        for i in range(0, 10, 2):
+            start_state = [(i, 3.0), (i + 1, 0.5)]
+            assert engine.algo(start_state) == family_by_family.algo(cg, start_state)
+    g = make_graph(['b', 'c'], [('b', 'c', {'weight': 0})])
+    with BSPEngine(compile_graph(g, ['b', 'c']), processes=2, parallel_threshold=0) as engine:
+        with pytest.raises(ValueError):
+            engine.algo([('b', 1)])
@@ -0,0 +1,135 @@
+# Here we cache the results of single-source propagations, and answer queries from them.
+#
+# Activation is multiplicative along paths, so the run from one start node with input strength a is the run with
+# strength a0 with every strength scaled by a / a0. Only the THRESHOLD cut-off doesn't scale, but input strength only
+# goes down along a path (all the strengths and ACTIVATION_DECAY are at most 1), so an activation is in the run iff
+# its own input strength is above THRESHOLD. A cached run made at strength a0 with threshold t0 therefore contains
+# the run at strength a with threshold t whenever t * a0 / a >= t0, and that run is the cached one scaled and filtered.
+# Anything else is a miss: the run is made at the requested strength and threshold, and it replaces the cached one.
+#
+# A start state with several start nodes is the combination of their single-source runs:
+#   lockstep and one_by_one merge a node's activations at the same time into the strongest one, and so does the
+#       combination (the lockstep result is the same as lockstep.batched_algo, ordered by node id in each family,
+#       and the one-by-one result is ordered by node id at each time);
+#   family_by_family keeps every activation, so the combination keeps every activation of every start node (within
+#       a family they are grouped by start node rather than interleaved as the algo has them).
+# Scaled strengths can differ from a fresh run in the last bits, and so can an activation right at THRESHOLD.
+# Refractory mode and stop conditions don't combine like this, so the cache doesn't take them.
+#
+# Entries are kept in least-recently-used order, within a budget of max_bytes of arrays.
+
+
+# imports
+from collections import OrderedDict
+
+import numpy as np
+
+from . import family_by_family, lockstep, one_by_one
+from .family_by_family import ACTIVATION_DECAY, THRESHOLD
+from .history import ActivationHistory, collect_activations, collect_families
+
+
+def run_lockstep(cgraph, node_id, strength, activation_decay, threshold):
+    return collect_families(lockstep.batched_families(cgraph, [node_id], [strength], activation_decay, threshold))
+
+
+def run_family_by_family(cgraph, node_id, strength, activation_decay, threshold):
+    return collect_families(family_by_family.batched_families(cgraph, [node_id], [strength], activation_decay, threshold))
+
+
+def run_one_by_one(cgraph, node_id, strength, activation_decay, threshold):
+    return collect_activations(one_by_one.iter_activation_ids(cgraph, [(cgraph.names[node_id], strength)], activation_decay, threshold))
+
+
+# engine name -> (function making the (times, strengths, node_ids) of a single-source run, whether the engine merges repeated activations)
+ENGINES = {
+    'lockstep': (run_lockstep, True),
+    'family_by_family': (run_family_by_family, False),
+    'one_by_one': (run_one_by_one, True),
+}
+
+
+class ResultCache:
+    """ A memory-bounded LRU cache of single-source runs of one engine, keyed by (graph version, schema, start node, engine, activation_decay). """
+
+    def __init__(self, engine='lockstep', max_bytes=64 * 2 ** 20, activation_decay=ACTIVATION_DECAY):
+        (self.run, self.merges) = ENGINES[engine]
+        self.engine = engine
+        self.max_bytes = max_bytes
+        self.activation_decay = activation_decay
+        # key -> (strength, threshold, times, strengths, node_ids), least recently used first
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __repr__(self):
+        return f'ResultCache({self.engine}, {len(self.entries)} entries, {self.bytes} bytes)'
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'entries': len(self.entries), 'bytes': self.bytes}
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def algo(self, cgraph, start_state, threshold=THRESHOLD):
+        """ The run of the engine for start_state, as an ActivationHistory, answered from the cache where possible. """
+        sources = {}
+        for (start_node, start_input_activation_strength) in start_state:
+            if start_input_activation_strength > threshold:
+                sources.setdefault(cgraph.node_id(start_node), []).append(start_input_activation_strength)
+        runs = []
+        for (node_id, strengths) in sources.items():
+            # the strongest start of a node outdoes the others when activations are merged
+            for strength in ([max(strengths)] if self.merges else strengths):
+                runs.append(self.source(cgraph, node_id, strength, threshold))
+        if not runs:
+            return ActivationHistory(np.empty(0, dtype=np.int32), np.empty(0), np.empty(0, dtype=np.int32), cgraph.names)
+        times = np.concatenate([times for (times, _, _) in runs])
+        strengths = np.concatenate([strengths for (_, strengths, _) in runs])
+        node_ids = np.concatenate([node_ids for (_, _, node_ids) in runs])
+        if self.merges:
+            # keep the strongest activation of each (time, node), ordered by time and then node id
+            order = np.lexsort((-strengths, node_ids, times))
+            (times, strengths, node_ids) = (times[order], strengths[order], node_ids[order])
+            first = np.r_[True, (times[1:] != times[:-1]) | (node_ids[1:] != node_ids[:-1])]
+            (times, strengths, node_ids) = (times[first], strengths[first], node_ids[first])
+        elif len(runs) > 1:
+            order = np.argsort(times, kind='stable')
+            (times, strengths, node_ids) = (times[order], strengths[order], node_ids[order])
+        return ActivationHistory(times, strengths, node_ids, cgraph.names)
+
+    def source(self, cgraph, node_id, strength, threshold=THRESHOLD):
+        """ The (times, strengths, node_ids) of the run from one start node, answered from the cache where possible. """
+        key = (cgraph.version, tuple(cgraph.schema), node_id, self.engine, self.activation_decay)
+        entry = self.entries.get(key)
+        if entry is not None:
+            (cached_strength, cached_threshold, times, strengths, node_ids) = entry
+            scale = strength / cached_strength
+            if threshold / scale >= cached_threshold:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                if scale != 1:
+                    strengths = strengths * scale
+                if threshold / scale > cached_threshold:
+                    # drop what the higher threshold cuts off (an activation is kept iff its input strength is above it)
+                    kept = strengths / cgraph.node_strength[node_ids] > threshold
+                    (times, strengths, node_ids) = (times[kept], strengths[kept], node_ids[kept])
+                return (times, strengths, node_ids)
+            self.forget(key)
+        self.misses += 1
+        (times, strengths, node_ids) = self.run(cgraph, node_id, strength, self.activation_decay, threshold)
+        size = times.nbytes + strengths.nbytes + node_ids.nbytes
+        if size <= self.max_bytes:
+            self.entries[key] = (strength, threshold, times, strengths, node_ids)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self.forget(next(iter(self.entries)))
+                self.evictions += 1
+        return (times, strengths, node_ids)
+
+    def forget(self, key):
+        (_, _, times, strengths, node_ids) = self.entries.pop(key)
+        self.bytes -= times.nbytes + strengths.nbytes + node_ids.nbytes
@@ -0,0 +1,67 @@
+import numpy as np
+
+from spreading_activation.benchmark import as_activations, strongest_activations
+from spreading_activation.cache import ResultCache
+from spreading_activation.generators import GRAPHS
+from spreading_activation import family_by_family, lockstep, one_by_one
+
+
+def make_query():
+    cg = GRAPHS['layered'](5000, 'integer:1:3', 5)
+    start_state = [(3, 2.0), (40, 1.0), (3, 0.5), (77, 4.0)]
+    return (cg, start_state)
+
+
+def test_combines_single_source_runs():
+    (cg, start_state) = make_query()
+    cache = ResultCache('lockstep')
+    assert cache.algo(cg, start_state).as_families() == lockstep.batched_algo(cg, start_state)
+    # every start node is now cached, so asking again doesn't run anything
+    assert cache.algo(cg, start_state).as_families() == lockstep.batched_algo(cg, start_state)
+    assert cache.stats()['misses'] == 3
+    assert cache.stats()['hits'] == 3
+    # family-by-family keeps every activation, grouped by start node within a family
+    history = ResultCache('family_by_family').algo(cg, start_state).as_families()
+    expected = family_by_family.algo(cg, start_state)
+    assert [(t, sorted(family)) for (t, family) in history] == [(t, sorted(family)) for (t, family) in expected]
+    history = ResultCache('one_by_one').algo(cg, start_state)
+    assert strongest_activations(as_activations(cg, history)) == strongest_activations(as_activations(cg, one_by_one.columnar_algo(cg, start_state)))
+
+
+def test_scaled_reuse():
+    (cg, start_state) = make_query()
+    cache = ResultCache('lockstep')
+    cache.algo(cg, [(40, 4.0)], threshold=0.01)
+    for (strength, threshold) in [(4.0, 0.02), (1.0, 0.01), (2.0, 0.05)]:
+        history = cache.algo(cg, [(40, strength)], threshold=threshold)
+        expected = lockstep.batched_algo(cg, [(40, strength)], threshold=threshold)
+        assert [(t, [name for (_, name) in family]) for (t, family) in history.as_families()] == [(t, [name for (_, name) in family]) for (t, family) in expected]
+        assert np.allclose([s for (_, family) in history.as_families() for (s, _) in family], [s for (_, family) in expected for (s, _) in family], rtol=1e-12)
+    assert cache.stats()['hits'] == 3
+    # a stronger start or a lower threshold reaches further than the cached run: a miss, which replaces the entry
+    cache.algo(cg, [(40, 8.0)], threshold=0.01)
+    assert cache.stats()['misses'] == 2
+    assert cache.stats()['entries'] == 1
+    cache.algo(cg, [(40, 4.0)], threshold=0.01)
+    assert cache.stats()['hits'] == 4
+
+
+def test_eviction_and_graph_version():
+    (cg, _) = make_query()
+    cache = ResultCache('lockstep')
+    for node_id in (3, 40, 3, 77):
+        cache.source(cg, node_id, 1.0)
+    # least recently used first
+    assert [key[2] for key in cache.entries] == [40, 3, 77]
+    assert cache.stats() == {'hits': 1, 'misses': 3, 'evictions': 0, 'entries': 3, 'bytes': cache.bytes}
+    # room for the largest entry only
+    cache = ResultCache('lockstep', max_bytes=max(sum(array.nbytes for array in cache.source(cg, node_id, 1.0)) for node_id in (3, 40, 77)))
+    for node_id in (3, 40, 77):
+        cache.source(cg, node_id, 1.0)
+    assert cache.stats()['evictions'] == 2
+    assert [key[2] for key in cache.entries] == [77]
+    assert cache.bytes <= cache.max_bytes
+    # a changed graph has a new version, so nothing cached for it before is used
+    cg.changed()
+    cache.source(cg, 77, 1.0)
+    assert cache.stats()['misses'] == 4
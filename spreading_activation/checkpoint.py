@@ -0,0 +1,139 @@
+# Here we run LOCKSTEP propagations in slices that can be paused, saved and resumed, possibly in another process.
+#
+# Between two steps, everything a lockstep run still needs is its queue (the merged activations waiting to
+# activate, each with its activation time), the step it is at, and the refractory state if there is one. A
+# PropagationState holds exactly that as flat arrays, plus how many activations the run has handed out so far (the
+# offset of the next slice in the history) and the parameters of the run. It pickles, and saves to an uncompressed
+# .npz file like an ActivationHistory.
+#
+#   state = start(cgraph, start_state)
+#   while not state.done:
+#       (families, state) = resume(cgraph, state, max_events=100000)
+#
+# Each slice hands out the families of batched_families, ending at a step boundary: at max_time, once max_events
+# activations have been handed out (the family that reaches the budget is finished), or once time_budget seconds
+# have passed. The slices of a run together are exactly lockstep.batched_families, so they can be interleaved with
+# other queries or moved between workers without changing the result.
+
+
+# imports
+import time
+
+import numpy as np
+
+from .family_by_family import ACTIVATION_DECAY, THRESHOLD
+from .lockstep import expand_family
+from .multi_query import merge_rows
+from .refractory import Refractory
+
+
+class PropagationState:
+    """ A lockstep run paused between two steps.
+    current_time is the next step to activate, (times, node_ids, strengths) are the queued activations (output activation strengths, merged per time and node), and events is the number of activations handed out so far.
+    refractory is None or the refractory period, and refractory_state the array of the Refractory (see refractory.py).
+    """
+
+    def __init__(self, current_time, times, node_ids, strengths, events=0, activation_decay=ACTIVATION_DECAY, threshold=THRESHOLD, refractory=None, refractory_state=None):
+        self.current_time = current_time
+        self.times = np.asarray(times, dtype=np.int64)
+        self.node_ids = np.asarray(node_ids, dtype=np.int64)
+        self.strengths = np.asarray(strengths, dtype=np.float64)
+        self.events = events
+        self.activation_decay = activation_decay
+        self.threshold = threshold
+        self.refractory = refractory
+        self.refractory_state = refractory_state
+
+    def __repr__(self):
+        return f'PropagationState at step {self.current_time} with {len(self.times)} queued activations and {self.events} handed out'
+
+    @property
+    def done(self):
+        """ Whether the run has nothing left to activate. """
+        return not len(self.times)
+
+    def save(self, path):
+        """ Save the state to an uncompressed .npz file. """
+        refractory = np.inf if self.refractory is None else self.refractory
+        refractory_state = np.empty(0) if self.refractory_state is None else self.refractory_state
+        with open(path, 'wb') as f:
+            np.savez(f, current_time=self.current_time, times=self.times, node_ids=self.node_ids, strengths=self.strengths, events=self.events, activation_decay=self.activation_decay, threshold=self.threshold, has_refractory=self.refractory is not None, refractory=refractory, refractory_state=refractory_state)
+
+    @classmethod
+    def load(cls, path):
+        """ Load a state saved by save(). """
+        with np.load(path, allow_pickle=False) as arrays:
+            has_refractory = bool(arrays['has_refractory'])
+            return cls(int(arrays['current_time']), arrays['times'], arrays['node_ids'], arrays['strengths'], int(arrays['events']), float(arrays['activation_decay']), float(arrays['threshold']),
+                       float(arrays['refractory']) if has_refractory else None, arrays['refractory_state'] if has_refractory else None)
+
+
+def start(cgraph, start_state, activation_decay=ACTIVATION_DECAY, threshold=THRESHOLD, refractory=None):
+    """ The state of a lockstep run before its first step. start_state and refractory are as for lockstep.algo. """
+    start_ids = np.array([cgraph.node_id(node) for (node, _) in start_state], dtype=np.int64)
+    start_strengths = np.array([strength for (_, strength) in start_state], dtype=np.float64)
+    will_activate = start_strengths > threshold
+    start_ids = start_ids[will_activate]
+    (node_ids, strengths) = merge_rows(start_ids, start_strengths[will_activate] * cgraph.node_strength[start_ids])
+    refractory_state = None
+    if refractory is not None:
+        resting = Refractory(cgraph.num_nodes, refractory)
+        refractory_state = resting.fired if resting.once else resting.last_fired
+    return PropagationState(0, np.zeros(len(node_ids), dtype=np.int64), node_ids, strengths, 0, activation_decay, threshold, refractory, refractory_state)
+
+
+def resume(cgraph, state, max_time=None, max_events=None, time_budget=None):
+    """ Run a slice of a lockstep run from state. Stops before the first step after max_time, after the step that brings the number of activations handed out in this slice to max_events, or after the step during which time_budget seconds run out.
+    Returns (families, state) where families is a list of (time, node_ids, output_activation_strengths) as batched_families yields them and state is where the run stopped (the given state is left as it was).
+    """
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+    resting = None
+    if state.refractory is not None:
+        resting = Refractory(cgraph.num_nodes, state.refractory)
+        if resting.once:
+            resting.fired = state.refractory_state.copy()
+        else:
+            resting.last_fired = state.refractory_state.copy()
+    # activation time -> merged (node_ids, output_activation_strengths)
+    queue = {}
+    order = np.argsort(state.times, kind='stable')
+    (times, node_ids, strengths) = (state.times[order], state.node_ids[order], state.strengths[order])
+    queued_times = np.unique(times)
+    bounds = np.r_[np.searchsorted(times, queued_times), len(times)]
+    for (t, first, last) in zip(queued_times.tolist(), bounds[:-1].tolist(), bounds[1:].tolist()):
+        queue[t] = (node_ids[first:last], strengths[first:last])
+    families = []
+    events = 0
+    current_time = state.current_time
+    while queue:
+        if max_time is not None and current_time > max_time:
+            break
+        if max_events is not None and events >= max_events:
+            break
+        if deadline is not None and time.perf_counter() >= deadline:
+            break
+        (family_ids, family_strengths) = queue.pop(current_time, (np.empty(0, dtype=np.int64), np.empty(0)))
+        if resting is not None:
+            # the nodes may have fired since these activations were queued
+            awake = ~resting.resting_all(family_ids, current_time)
+            family_ids = family_ids[awake]
+            family_strengths = family_strengths[awake]
+            resting.fire_all(family_ids, current_time)
+        families.append((current_time, family_ids, family_strengths))
+        events += len(family_ids)
+        (steps_until_activation, child_ids, output_activation_strengths) = expand_family(cgraph, current_time, family_ids, family_strengths, state.activation_decay, state.threshold, resting=resting)
+        for steps in np.unique(steps_until_activation).tolist():
+            arriving = steps_until_activation == steps
+            (node_ids, strengths) = (child_ids[arriving], output_activation_strengths[arriving])
+            if current_time + steps in queue:
+                (queued_ids, queued_strengths) = queue[current_time + steps]
+                (node_ids, strengths) = (np.concatenate([queued_ids, node_ids]), np.concatenate([queued_strengths, strengths]))
+            queue[current_time + steps] = merge_rows(node_ids, strengths)
+        current_time += 1
+    queued_times = sorted(queue)
+    # (the empty arrays keep the concatenations well defined when the run is over)
+    times = np.concatenate([np.full(len(queue[t][0]), t, dtype=np.int64) for t in queued_times] + [np.empty(0, dtype=np.int64)])
+    node_ids = np.concatenate([queue[t][0] for t in queued_times] + [np.empty(0, dtype=np.int64)])
+    strengths = np.concatenate([queue[t][1] for t in queued_times] + [np.empty(0)])
+    refractory_state = None if resting is None else (resting.fired if resting.once else resting.last_fired)
+    return (families, PropagationState(current_time, times, node_ids, strengths, state.events + events, state.activation_decay, state.threshold, state.refractory, refractory_state))
@@ -0,0 +1,55 @@
+import math
+import pickle
+
+import numpy as np
+
+from spreading_activation.checkpoint import PropagationState, resume, start
+from spreading_activation.generators import GRAPHS
+from spreading_activation import lockstep
+
+
+def run_in_slices(cg, state, tmp_path, **limits):
+    families = []
+    while not state.done:
+        (slice_families, state) = resume(cg, state, **limits)
+        families.extend(slice_families)
+        # hand the state over as another process would
+        state.save(tmp_path / 'state')
+        state = pickle.loads(pickle.dumps(PropagationState.load(tmp_path / 'state')))
+    return (families, state)
+
+
+def as_lists(families):
+    return [(t, ids.tolist(), strengths.tolist()) for (t, ids, strengths) in families]
+
+
+def test_slices_match_a_whole_run(tmp_path):
+    cg = GRAPHS['scale_free'](20000, 'integer:1:3', 3)
+    start_state = [(node_id, 50.0) for node_id in range(0, 60, 7)]
+    start_ids = [node_id for (node_id, _) in start_state]
+    start_strengths = [strength for (_, strength) in start_state]
+    for refractory in (None, 2, math.inf):
+        expected = as_lists(lockstep.batched_families(cg, start_ids, start_strengths, refractory=refractory))
+        for limits in ({'max_events': 500}, {'max_time': 3}, {'time_budget': 0}):
+            state = start(cg, start_state, refractory=refractory)
+            if 'max_time' in limits:
+                # a horizon that moves on with every slice
+                families = []
+                while not state.done:
+                    (slice_families, state) = resume(cg, state, max_time=state.current_time + limits['max_time'])
+                    families.extend(slice_families)
+            else:
+                (families, state) = run_in_slices(cg, state, tmp_path, **limits)
+            assert as_lists(families) == expected
+            assert state.events == sum(len(ids) for (_, ids, _) in expected)
+
+
+def test_slice_limits():
+    cg = GRAPHS['layered'](5000, 'integer:1:2', 1)
+    state = start(cg, [(0, 50.0), (1, 0.01)])
+    (families, paused) = resume(cg, state, max_time=2)
+    assert [t for (t, _, _) in families] == [0, 1, 2] and paused.current_time == 3
+    assert state.current_time == 0 and len(state.times) == 1
+    (families, paused) = resume(cg, paused, max_events=1)
+    assert len(families) == 1 and paused.events == sum(len(ids) for (_, ids, _) in resume(cg, state, max_time=3)[0])
+    assert np.all(paused.times > 3)
@@ -0,0 +1,273 @@
+# Here we compile a NetworkX graph into a compact CSR (compressed sparse row) structure, so that the
+# algorithms can run on integer node ids and flat arrays instead of NetworkX attribute dicts.
+#
+# The outgoing links of node i are the link ids indptr[i] .. indptr[i + 1] - 1, and the child at the end of
+# link e is indices[e].  Links that the schema doesn't allow are dropped at compile time (this is the
+# "preprocessing step" mentioned in the algos), so every stored link is one that activation may spread along.
+# Link strengths, transfer times and node strengths are computed once here rather than on every hop.
+#
+# A compiled graph saves to a versioned, uncompressed .npz file holding every array, the schema and the node
+# names. load() memory-maps the arrays straight out of the file, so a process can start querying without building
+# a NetworkX graph or recompiling, processes opening the same file share its pages in the OS page cache, and a
+# graph larger than RAM is paged in as the batched engines touch it. (The scalar engines copy the arrays into
+# lists with as_lists(), so they need the graph in memory.)
+
+
+# imports
+from itertools import count
+
+import numpy as np
+
+from .history import load_npz_mmap
+
+
+# version numbers of compiled graphs (see CompiledGraph.version)
+versions = count()
+
+# the version of the file format written by CompiledGraph.save. Bump it whenever the contents of the file change.
+FORMAT_VERSION = 1
+
+
+def get_valid_types_following(node_type, schema):
+    """ Find the valid types immediately following a specific type in the schema. Just a helper function. """
+    valid_types = set()
+    type_index = schema.index(node_type)
+    left_index = type_index - 1
+    right_index = type_index + 1
+    if left_index >= 0:
+        valid_types.add(schema[left_index])
+    if right_index < len(schema):
+        valid_types.add(schema[right_index])
+    return valid_types
+
+
+def as_table(values, what):
+    """ Make an array of the node names or the schema to save. They come back as Python objects, so they have to be all strings or all integers. """
+    values = list(values)
+    table = np.asarray(values)
+    if table.tolist() != values:
+        raise ValueError(f'Can only save a graph whose {what} are all strings or all integers.')
+    return table
+
+
+class NameTable:
+    """ A read-only sequence of node names backed by an array (for instance memory-mapped from a file), handing out Python strings or integers. """
+
+    def __init__(self, array):
+        self.array = array
+
+    def __len__(self):
+        return len(self.array)
+
+    def __getitem__(self, i):
+        return self.array[i].tolist()
+
+    def __iter__(self):
+        chunk_size = 2 ** 16
+        for start in range(0, len(self.array), chunk_size):
+            yield from self.array[start:start + chunk_size].tolist()
+
+
+class CompiledGraph:
+    """ A graph compiled against a schema. Per-node values are arrays indexed by node id and per-link values are arrays indexed by link id. """
+
+    # every array attribute, so that the arrays can be moved around (shared memory, files) as a group
+    ARRAY_NAMES = ('type_ids', 'node_weight', 'node_strength', 'indptr', 'indices', 'link_weight', 'link_strength', 'transfer_time', 'transfer_steps')
+
+    def __init__(self, names, schema, type_ids, node_weight, indptr, indices, link_weight, rejected_links=0):
+        self.names = list(names)
+        self.schema = list(schema)
+        self._index = None
+        # per node
+        self.type_ids = np.asarray(type_ids, dtype=np.int32)
+        self.node_weight = np.asarray(node_weight, dtype=np.float64)
+        # per link
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.link_weight = np.asarray(link_weight, dtype=np.float64)
+        # number of links in the source graph that the schema does not allow
+        self.rejected_links = rejected_links
+        # Precompute the strengths and times. These match get_node_strength, get_link_strength and
+        # get_link_transfer_time in the algos (s = 1/2^w, the one-by-one time is w and the stepwise time is ceil(w)).
+        self.node_strength = 1 / np.power(2.0, self.node_weight)
+        self.link_strength = 1 / np.power(2.0, self.link_weight)
+        self.transfer_time = self.link_weight.copy()
+        self.transfer_steps = np.ceil(self.link_weight).astype(np.int64)
+        self._lists = None
+        # a number unique to this graph and its current contents, so results can be cached against it
+        self.version = next(versions)
+
+    @classmethod
+    def from_arrays(cls, names, schema, arrays, rejected_links=0):
+        """ Make a CompiledGraph around existing arrays (for instance views into shared memory) without copying or recomputing them. arrays maps every name in ARRAY_NAMES to its array. names can be any sequence, e.g. range(num_nodes) when only node ids are needed. """
+        cgraph = cls.__new__(cls)
+        cgraph.names = names
+        cgraph.schema = list(schema)
+        cgraph._index = None
+        for name in cls.ARRAY_NAMES:
+            setattr(cgraph, name, arrays[name])
+        cgraph.rejected_links = rejected_links
+        cgraph._lists = None
+        cgraph.version = next(versions)
+        return cgraph
+
+    def save(self, path):
+        """ Save the graph to an uncompressed .npz file, which load() can memory-map. Node names and schema types must be all strings or all integers. """
+        # np.savez would add .npz to a path without it, so hand it an open file
+        with open(path, 'wb') as f:
+            np.savez(f, format_version=np.int64(FORMAT_VERSION), schema=as_table(self.schema, 'schema types'), names=as_table(self.names, 'node names'), rejected_links=np.int64(self.rejected_links), **self.arrays())
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """ Load a graph saved by save(). With mmap_mode (as for numpy.load) the arrays and node names are memory-mapped from the file instead of read into memory. """
+        if mmap_mode is None:
+            with np.load(path, allow_pickle=False) as arrays:
+                arrays = {name: arrays[name] for name in arrays.files}
+        else:
+            arrays = load_npz_mmap(path, mmap_mode)
+        if 'format_version' not in arrays or int(arrays['format_version']) != FORMAT_VERSION:
+            raise ValueError(f'{path} is not a compiled graph file of format version {FORMAT_VERSION}.')
+        return cls.from_arrays(NameTable(arrays['names']), arrays['schema'].tolist(), arrays, rejected_links=int(arrays['rejected_links']))
+
+    def __repr__(self):
+        return f'CompiledGraph with {self.num_nodes} nodes and {self.num_links} links'
+
+    def changed(self):
+        """ Call this after changing the graph in place. It drops what was derived from the old contents and gives the graph a new version. """
+        self._index = None
+        self._lists = None
+        self.version = next(versions)
+
+    def set_link_weights(self, sources, targets, weights):
+        """ Give every link from sources[i] to targets[i] (node ids) the weight weights[i], updating the strengths and transfer times in place. The cost is in the degree of the sources, not the size of the graph.
+        Returns the node ids of the sources, for MaintainedQuery.update (see incremental.py).
+        """
+        lists = self._lists
+        for (source, target, weight) in zip(sources, targets, weights):
+            start = self.indptr[source]
+            link_ids = start + np.flatnonzero(self.indices[start:self.indptr[source + 1]] == target)
+            self.link_weight[link_ids] = weight
+            self.link_strength[link_ids] = 1 / np.power(2.0, weight)
+            self.transfer_time[link_ids] = weight
+            self.transfer_steps[link_ids] = np.ceil(weight)
+            if lists is not None:
+                # the structure is the same, so the lists are patched rather than rebuilt
+                for link_id in link_ids.tolist():
+                    for name in ('link_strength', 'transfer_time', 'transfer_steps'):
+                        lists[name][link_id] = getattr(self, name)[link_id].item()
+        self.version = next(versions)
+        return np.unique(np.asarray(sources, dtype=np.int64))
+
+    def add_links(self, sources, targets, weights):
+        """ Add links from sources[i] to targets[i] (node ids) with weights weights[i], after the existing links of each source. Links that the schema doesn't allow are counted in rejected_links and dropped, as in compile_graph.
+        The arrays are laid out again, which copies them but does nothing per link in Python. Returns the node ids of the sources of the links added, for MaintainedQuery.update (see incremental.py).
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.float64)
+        source_types = self.type_ids[sources]
+        valid = (source_types >= 0) & (np.abs(self.type_ids[targets] - source_types) == 1)
+        self.rejected_links += int(len(valid) - valid.sum())
+        order = np.argsort(sources[valid], kind='stable')
+        (sources, targets, weights) = (sources[valid][order], targets[valid][order], weights[valid][order])
+        num_nodes = len(self.indptr) - 1
+        old_counts = np.diff(self.indptr)
+        added_counts = np.bincount(sources, minlength=num_nodes)
+        indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(old_counts + added_counts, out=indptr[1:])
+        # the old links of each node keep their order at the start of its run, and the new ones follow them
+        old_positions = np.arange(self.indptr[-1]) + np.repeat(indptr[:-1] - self.indptr[:-1], old_counts)
+        starts = np.flatnonzero(np.r_[True, sources[1:] != sources[:-1]]) if len(sources) else np.empty(0, dtype=np.int64)
+        run_offsets = np.arange(len(sources)) - np.repeat(starts, np.diff(np.r_[starts, len(sources)]))
+        new_positions = indptr[sources] + old_counts[sources] + run_offsets
+        added = {'indices': targets, 'link_weight': weights, 'link_strength': 1 / np.power(2.0, weights), 'transfer_time': weights, 'transfer_steps': np.ceil(weights)}
+        for (name, values) in added.items():
+            old = getattr(self, name)
+            array = np.empty(indptr[-1], dtype=old.dtype)
+            array[old_positions] = old
+            array[new_positions] = values
+            setattr(self, name, array)
+        self.indptr = indptr
+        self.changed()
+        return np.unique(sources)
+
+    @property
+    def index(self):
+        """ node name -> node id. Built on first use. """
+        if self._index is None:
+            self._index = {name: i for (i, name) in enumerate(self.names)}
+        return self._index
+
+    def arrays(self):
+        """ The arrays of the graph as a dict (see ARRAY_NAMES). """
+        return {name: getattr(self, name) for name in self.ARRAY_NAMES}
+
+    @property
+    def num_nodes(self):
+        return len(self.names)
+
+    @property
+    def num_links(self):
+        return len(self.indices)
+
+    def node_id(self, node):
+        """ Get the id of a node given its name or its NetworkX attribute dict (as used in a start_state). """
+        if isinstance(node, dict):
+            node = node['name']
+        return self.index[node]
+
+    def links_of(self, node_ids):
+        """ Gather the outgoing links of many nodes at once. Returns (link_ids, owners) where owners[k] is the position in node_ids of the node that link link_ids[k] leaves. """
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        starts = self.indptr[node_ids]
+        counts = self.indptr[node_ids + 1] - starts
+        owners = np.repeat(np.arange(len(node_ids)), counts)
+        # each node's links are a contiguous run starting at starts[i], so add the position within the run
+        run_offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        link_ids = starts[owners] + run_offsets
+        return (link_ids, owners)
+
+    def as_lists(self):
+        """ The arrays as plain Python lists. Indexing a list is much cheaper than indexing a NumPy array one element at a time, so the scalar engines use these. Built once and cached. """
+        if self._lists is None:
+            self._lists = {
+                'indptr': self.indptr.tolist(),
+                'indices': self.indices.tolist(),
+                'node_strength': self.node_strength.tolist(),
+                'link_strength': self.link_strength.tolist(),
+                'transfer_time': self.transfer_time.tolist(),
+                'transfer_steps': self.transfer_steps.tolist(),
+            }
+        return self._lists
+
+
+def compile_graph(graph, schema):
+    """ Compile a NetworkX DiGraph (nodes with 'weight' and 'type' attributes, links with a 'weight' attribute) into a CompiledGraph for the given schema. Node ids follow the order of graph.nodes and each node's links follow the order of graph.successors, so the compiled algos visit nodes in the same order as the NetworkX ones. """
+    names = list(graph.nodes)
+    index = {name: i for (i, name) in enumerate(names)}
+    type_ids = []
+    node_weight = []
+    for name in names:
+        node = graph.nodes[name]
+        # a node whose type is not in the schema gets type id -1 and no outgoing links
+        node_type = node['type']
+        type_ids.append(schema.index(node_type) if node_type in schema else -1)
+        node_weight.append(node['weight'])
+    indptr = [0]
+    indices = []
+    link_weight = []
+    rejected_links = 0
+    valid_types_cache = {}
+    for name in names:
+        node_type = graph.nodes[name]['type']
+        if node_type not in valid_types_cache:
+            valid_types_cache[node_type] = get_valid_types_following(node_type, schema) if node_type in schema else set()
+        valid_types = valid_types_cache[node_type]
+        for (child_name, link) in graph.succ[name].items():
+            if graph.nodes[child_name]['type'] in valid_types:
+                indices.append(index[child_name])
+                link_weight.append(link['weight'])
+            else:
+                rejected_links += 1
+        indptr.append(len(indices))
+    return CompiledGraph(names, schema, type_ids, node_weight, indptr, indices, link_weight, rejected_links=rejected_links)
@@ -0,0 +1,157 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from spreading_activation.compiled_graph import CompiledGraph, compile_graph
+from spreading_activation import family_by_family, one_by_one
+
+
+def make_graph(schema, edges):
+    """ Make a graph with one node of weight 0 for each type in the schema, like the end-to-end tests do. """
+    g = nx.DiGraph()
+    for node_type in schema:
+        g.add_node(node_type, **{'name': node_type, 'weight': 0, 'type': node_type})
+    g.add_edges_from(edges)
+    return g
+
+
+def make_outward_graph():
+    # a <-- b <-- c --> d --> e
+    schema = ['a', 'b', 'c', 'd', 'e']
+    edges = [('b', 'a', {'weight': 1}), ('c', 'b', {'weight': 1}), ('c', 'd', {'weight': 1}), ('d', 'e', {'weight': 2})]
+    return (make_graph(schema, edges), schema)
+
+
+def test_compile_graph():
+    (g, schema) = make_outward_graph()
+    # this link skips a type in the schema, so it should be dropped
+    g.add_edge('a', 'c', weight=1)
+    cg = compile_graph(g, schema)
+    assert cg.num_nodes == 5
+    assert cg.num_links == 4
+    assert cg.rejected_links == 1
+    assert cg.type_ids.tolist() == [0, 1, 2, 3, 4]
+    assert cg.indptr.tolist() == [0, 0, 1, 3, 4, 4]
+    assert [cg.names[i] for i in cg.indices] == ['a', 'b', 'd', 'e']
+    assert cg.link_strength.tolist() == [0.5, 0.5, 0.5, 0.25]
+    assert cg.transfer_steps.tolist() == [1, 1, 1, 2]
+    assert cg.node_strength.tolist() == [1.0] * 5
+    assert cg.node_id(g.nodes['c']) == cg.node_id('c') == 2
+
+
+def test_family_by_family_outward():
+    (g, schema) = make_outward_graph()
+    cg = compile_graph(g, schema)
+    out = family_by_family.algo(cg, [(g.nodes['c'], 1)])
+    assert out == [(0, [(1.0, 'c')]), (1, [(0.4, 'b'), (0.4, 'd')]), (2, [(0.16000000000000003, 'a')]), (3, [(0.08000000000000002, 'e')])]
+
+
+def test_family_by_family_fractional_weight():
+    g = make_graph(['b', 'c'], [('b', 'c', {'weight': 0.2})])
+    cg = compile_graph(g, ['b', 'c'])
+    out = family_by_family.algo(cg, [('b', 1)])
+    assert out == [(0, [(1.0, 'b')]), (1, [(0.6964404506368993, 'c')])]
+
+
+def test_family_by_family_rejects_zero_weight():
+    g = make_graph(['b', 'c'], [('b', 'c', {'weight': 0})])
+    cg = compile_graph(g, ['b', 'c'])
+    with pytest.raises(ValueError):
+        family_by_family.algo(cg, [('b', 1)])
+
+
+def test_one_by_one_outward():
+    (g, schema) = make_outward_graph()
+    cg = compile_graph(g, schema)
+    out = one_by_one.algo(cg, [(g.nodes['c'], 1)])
+    assert out['activation_history'] == [(0, 1.0, 'c'), (1, 0.4, 'b'), (1, 0.4, 'd'), (2, 0.16000000000000003, 'a'), (3, 0.08000000000000002, 'e')]
+
+
+def test_links_of():
+    (g, schema) = make_outward_graph()
+    cg = compile_graph(g, schema)
+    (link_ids, owners) = cg.links_of([3, 2, 0])
+    assert link_ids.tolist() == [3, 1, 2]
+    assert owners.tolist() == [0, 1, 1]
+
+
+def test_batched_family_by_family_matches_algo():
+    (g, schema) = make_outward_graph()
+    cg = compile_graph(g, schema)
+    expected = family_by_family.algo(cg, [('c', 1)])
+    out = family_by_family.batched_algo(cg, [('c', 1)])
+    assert out == expected
+
+
+def test_batched_family_by_family_gap_and_repeats():
+    # b and d both reach c at step 2, so c appears twice in that family
+    g = make_graph(['a', 'b', 'c'], [('a', 'b', {'weight': 1}), ('a', 'd', {'weight': 1}), ('b', 'c', {'weight': 1}), ('d', 'c', {'weight': 1})])
+    g.add_node('d', name='d', weight=0, type='b')
+    cg = compile_graph(g, ['a', 'b', 'c'])
+    out = family_by_family.batched_algo(cg, [('a', 1)])
+    assert out[2] == (2, [(0.16000000000000003, 'c'), (0.16000000000000003, 'c')])
+    assert out == family_by_family.algo(cg, [('a', 1)])
+    # the link from b to c takes two steps, so nothing activates at step 2
+    g = make_graph(['a', 'b', 'c'], [('a', 'b', {'weight': 1}), ('b', 'c', {'weight': 2})])
+    cg = compile_graph(g, ['a', 'b', 'c'])
+    out = family_by_family.batched_algo(cg, [('a', 1)])
+    assert out == [(0, [(1.0, 'a')]), (1, [(0.4, 'b')]), (2, []), (3, [(0.08000000000000002, 'c')])]
+    with pytest.raises(ValueError):
+        family_by_family.batched_algo(compile_graph(make_graph(['b', 'c'], [('b', 'c', {'weight': 0})]), ['b', 'c']), [('b', 1)])
+
+
+def test_one_by_one_merges_simultaneous_activations():
+    # b and d both reach c at time 2, so c is queued once, with the stronger of the two activations
+    g = make_graph(['a', 'b', 'c'], [('a', 'b', {'weight': 1}), ('a', 'd', {'weight': 1}), ('b', 'c', {'weight': 1}), ('d', 'c', {'weight': 1})])
+    g.add_node('d', name='d', weight=0.5, type='b')
+    cg = compile_graph(g, ['a', 'b', 'c'])
+    out = one_by_one.algo(cg, [('a', 1)])
+    assert [(t, name) for (t, _, name) in out['activation_history']] == [(0, 'a'), (1, 'b'), (1, 'd'), (2, 'c')]
+    assert out['activation_history'][-1][1] == 0.16000000000000003
+
+
+def test_save_and_load(tmp_path):
+    (g, schema) = make_outward_graph()
+    cg = compile_graph(g, schema)
+    path = tmp_path / 'graph'
+    cg.save(path)
+    loaded = CompiledGraph.load(path)
+    assert isinstance(loaded.indices, np.memmap)
+    assert (loaded.schema, list(loaded.names), loaded.rejected_links) == (schema, list(cg.names), cg.rejected_links)
+    assert loaded.names[2] == 'c' and loaded.node_id('c') == 2
+    for (name, array) in cg.arrays().items():
+        assert np.array_equal(loaded.arrays()[name], array)
+    expected = family_by_family.algo(cg, [('c', 1)])
+    assert family_by_family.algo(loaded, [('c', 1)]) == expected
+    assert family_by_family.algo(CompiledGraph.load(path, mmap_mode=None), [('c', 1)]) == expected
+    # integer names come back as integers
+    int_graph = nx.relabel_nodes(g, {name: i for (i, name) in enumerate(schema)})
+    compile_graph(int_graph, schema).save(path)
+    assert CompiledGraph.load(path).names[3] == 3
+    # names that don't survive the round trip are refused, and so are files of another format
+    with pytest.raises(ValueError):
+        compile_graph(nx.relabel_nodes(g, {'a': 1}), schema).save(path)
+    np.savez(tmp_path / 'other.npz', indices=np.arange(3))
+    with pytest.raises(ValueError):
+        CompiledGraph.load(tmp_path / 'other.npz')
+
+
+def test_change_links():
+    (g, schema) = make_outward_graph()
+    cg = compile_graph(g, schema)
+    cg.as_lists()
+    version = cg.version
+    cg.set_link_weights([cg.node_id('c')], [cg.node_id('d')], [2.5])
+    g.add_edge('c', 'd', weight=2.5)
+    assert cg.version != version
+    assert cg.as_lists()['transfer_steps'] == compile_graph(g, schema).as_lists()['transfer_steps']
+    # the a -> c link skips a type in the schema
+    cg.add_links([cg.node_id('c'), cg.node_id('a'), cg.node_id('e')], [cg.node_id('b'), cg.node_id('c'), cg.node_id('d')], [3, 1, 1])
+    g.add_edge('a', 'c', weight=1)
+    g.add_edge('e', 'd', weight=1)
+    expected = compile_graph(g, schema)
+    # a second c -> b link follows the existing links of c (a NetworkX graph can't hold it, so it is checked by hand)
+    assert cg.indices.tolist() == [0, 1, 3, 1, 4, 3]
+    assert cg.link_weight.tolist() == [1, 1, 2.5, 3, 2, 1]
+    assert cg.rejected_links == expected.rejected_links
+    assert family_by_family.algo(cg, [('c', 1)])[:2] == family_by_family.algo(expected, [('c', 1)])[:2]
@@ -0,0 +1,88 @@
+# Here we compute the strongest activation of every node as a shortest path problem, in log space.
+#
+# Every strength is 1/2^weight, so the input strength reaching a node along a path is
+#   start strength × 2^-(sum of the node and link weights on the way) × ACTIVATION_DECAY^hops
+# and its cost -log2(strength) is a sum: -log2(start strength), plus the weights, plus -log2(ACTIVATION_DECAY) per
+# link. The THRESHOLD test "input strength > THRESHOLD" becomes "input cost < -log2(THRESHOLD)", a bound on the
+# length of the path. Costs are never negative (weights are nonnegative and ACTIVATION_DECAY is at most 1), so
+# the strongest activation of each node is its shortest path, and a Dijkstra search that never queues a path at or
+# past the bound finds all of them in O((V + E) log V), however many times the time-ordered algos would reach them.
+#
+# Adding costs never underflows the way multiplying strengths does, and no powers are computed along the way. The
+# strengths 2^-cost agree with the other algos up to rounding, so an activation right at THRESHOLD may differ.
+# Nodes come out strongest first, so asking for only the k strongest stops the search after k nodes.
+
+
+# imports
+import heapq
+import math
+from itertools import count
+
+import numpy as np
+
+from .family_by_family import ACTIVATION_DECAY, THRESHOLD
+
+
+def get_cost(strength):
+    """ -log2(strength), the cost of a strength. 0 and less cost infinitely much. """
+    return -math.log2(strength) if strength > 0 else math.inf
+
+
+def strongest_costs(cgraph, start_state, activation_decay=ACTIVATION_DECAY, threshold=THRESHOLD, k=None):
+    """ The cost (-log2 of the output activation strength) of the strongest activation of every node that gets activated.
+    start_state is a list of (node, input_activation_strength) as for the other algos. With k, only the k strongest nodes are found.
+    Returns (node_ids, costs) as arrays, strongest (cheapest) first.
+    """
+    if cgraph.num_links and cgraph.link_weight.min() < 0 or cgraph.num_nodes and cgraph.node_weight.min() < 0:
+        raise ValueError('Weights must be nonnegative to propagate in log space.')
+    if not 0 < activation_decay <= 1:
+        raise ValueError('activation_decay must be in (0, 1] to propagate in log space.')
+    bound = get_cost(threshold)
+    decay_cost = get_cost(activation_decay)
+    arrays = cgraph.as_lists()
+    indptr = arrays['indptr']
+    indices = arrays['indices']
+    node_weight = cgraph.node_weight.tolist()
+    # the cost of going through a link, without the weight of the node at its end
+    link_cost = (cgraph.link_weight + decay_cost).tolist()
+    # best known output cost of each node, and whether it is final
+    best = {}
+    settled = set()
+    tq = []
+    counter = count()
+    for (start_node, start_input_activation_strength) in start_state:
+        input_cost = get_cost(start_input_activation_strength)
+        if input_cost < bound:
+            start_id = cgraph.node_id(start_node)
+            output_cost = input_cost + node_weight[start_id]
+            if output_cost < best.get(start_id, math.inf):
+                best[start_id] = output_cost
+                heapq.heappush(tq, (output_cost, next(counter), start_id))
+    node_ids = []
+    costs = []
+    while tq and (k is None or len(node_ids) < k):
+        (current_cost, _, current_node_id) = heapq.heappop(tq)
+        if current_node_id in settled:
+            continue
+        settled.add(current_node_id)
+        node_ids.append(current_node_id)
+        costs.append(current_cost)
+        for link_id in range(indptr[current_node_id], indptr[current_node_id + 1]):
+            input_cost = current_cost + link_cost[link_id]
+            # the THRESHOLD test
+            if input_cost < bound:
+                child_id = indices[link_id]
+                output_cost = input_cost + node_weight[child_id]
+                if output_cost < best.get(child_id, math.inf):
+                    best[child_id] = output_cost
+                    heapq.heappush(tq, (output_cost, next(counter), child_id))
+    return (np.array(node_ids, dtype=np.int32), np.array(costs, dtype=np.float64))
+
+
+def strongest(cgraph, start_state, activation_decay=ACTIVATION_DECAY, threshold=THRESHOLD, k=None):
+    """ The strongest activation of every node that gets activated, as a list of (output_activation_strength, node_name), strongest first. With k, only the k strongest nodes.
+    This is the strongest activation the node gets in any of the algos (up to rounding), found without running them.
+    """
+    (node_ids, costs) = strongest_costs(cgraph, start_state, activation_decay, threshold, k)
+    names = cgraph.names
+    return list(zip(np.exp2(-costs).tolist(), [names[node_id] for node_id in node_ids.tolist()]))
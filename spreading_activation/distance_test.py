@@ -0,0 +1,35 @@
+import pytest
+
+from spreading_activation.compiled_graph import compile_graph
+from spreading_activation.compiled_graph_test import make_outward_graph
+from spreading_activation.generators import GRAPHS
+from spreading_activation import distance, lockstep, one_by_one
+
+
+def test_strongest_outward():
+    (g, schema) = make_outward_graph()
+    cg = compile_graph(g, schema)
+    result = distance.strongest(cg, [('c', 1)])
+    assert [name for (_, name) in result] == ['c', 'b', 'd', 'a', 'e']
+    assert [strength for (strength, _) in result] == pytest.approx([1.0, 0.4, 0.4, 0.16, 0.08])
+    assert [name for (_, name) in distance.strongest(cg, [('c', 1)], k=2)] == ['c', 'b']
+    # a start strength at THRESHOLD doesn't activate anything
+    assert distance.strongest(cg, [('c', 0.05)], threshold=0.05) == []
+    g.add_edge('d', 'e', weight=-1)
+    with pytest.raises(ValueError):
+        distance.strongest(compile_graph(g, schema), [('c', 1)])
+
+
+def test_strongest_matches_full_history():
+    for (kind, link_weights) in (('scale_free', 'integer:1:3'), ('layered', 'uniform:0.5:3')):
+        cg = GRAPHS[kind](20000, link_weights, 4)
+        start_state = [(node_id, 100.0 / (1 + node_id)) for node_id in range(0, 100, 7)]
+        strongest = {}
+        for (_, family) in lockstep.algo(cg, start_state):
+            for (strength, name) in family:
+                strongest[name] = max(strength, strongest.get(name, 0))
+        result = distance.strongest(cg, start_state)
+        assert len(result) == len(strongest)
+        assert all(strength == pytest.approx(strongest[name], rel=1e-12) for (strength, name) in result)
+        assert [strength for (strength, _) in result] == sorted((strength for (strength, _) in result), reverse=True)
+        assert [name for (_, name) in result[:10]] == [name for (_, name) in one_by_one.top_k(cg, start_state, 10)]
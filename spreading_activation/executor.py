@@ -0,0 +1,129 @@
+# Here we run many independent queries in parallel, in a pool of worker processes that share one compiled graph.
+#
+# The arrays of the CompiledGraph are copied once into a single block of shared memory
+# (multiprocessing.shared_memory). Each worker attaches to that block when it starts and wraps NumPy views around
+# it, so no worker pickles, copies or rebuilds the graph. Queries are handed out through the pool's task queue
+# and the workers run the batched family-by-family algo on node ids only. Results come back as three flat arrays
+# (times, strengths, node ids) and are turned into node names in the parent process, only when asked for.
+#
+#   with QueryExecutor(cgraph, processes=8) as executor:
+#       for result in executor.imap(start_states):
+#           history = result.as_history(cgraph.names)
+
+
+# imports
+import multiprocessing
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .compiled_graph import CompiledGraph
+from .family_by_family import ACTIVATION_DECAY, THRESHOLD, batched_families
+from .history import ActivationHistory, collect_families
+
+
+class QueryResult (namedtuple('QueryResult', ['times', 'strengths', 'node_ids'])):
+    """ The compact result of a query: one entry per activation, in the order of the activation history. """
+
+    def as_history(self, names):
+        """ The result in the format of family_by_family.algo(): a list of (time, [(output_activation_strength, node_name), ...]). """
+        activation_history = []
+        if not len(self.times):
+            return activation_history
+        for (current_time, strength, node_id) in zip(self.times.tolist(), self.strengths.tolist(), self.node_ids.tolist()):
+            # steps where nothing was activated still get an (empty) family
+            while len(activation_history) <= current_time:
+                activation_history.append((len(activation_history), []))
+            activation_history[current_time][1].append((strength, names[node_id]))
+        return activation_history
+
+    def as_columnar(self, names):
+        """ The result as an ActivationHistory, without copying the arrays. """
+        return ActivationHistory(self.times, self.strengths, self.node_ids, names)
+
+
+def publish(cgraph):
+    """ Copy the arrays of a CompiledGraph into a new shared memory block. Returns (shm, layout) where layout describes where each array lives in the block. The caller must close and unlink shm when done. """
+    arrays = cgraph.arrays()
+    layout = {}
+    offset = 0
+    for (name, array) in arrays.items():
+        # keep every array 8-byte aligned
+        offset = (offset + 7) // 8 * 8
+        layout[name] = (array.dtype.str, array.shape, offset)
+        offset += array.nbytes
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for (name, array) in arrays.items():
+        (dtype, shape, offset) = layout[name]
+        np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)[...] = array
+    return (shm, layout)
+
+
+def attach(shm_name, layout, num_nodes, schema):
+    """ Attach to a block made by publish(). Returns (shm, cgraph) where cgraph's arrays are views into the block (no copies). Node names are not shared, so cgraph.names is range(num_nodes). """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    arrays = {name: np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset) for (name, (dtype, shape, offset)) in layout.items()}
+    return (shm, CompiledGraph.from_arrays(range(num_nodes), schema, arrays))
+
+
+# the graph of the current worker process, set by init_worker
+worker_state = {}
+
+
+def init_worker(shm_name, layout, num_nodes, schema, activation_decay, threshold):
+    (shm, cgraph) = attach(shm_name, layout, num_nodes, schema)
+    # keep the block referenced for as long as the worker lives
+    worker_state.update(shm=shm, cgraph=cgraph, activation_decay=activation_decay, threshold=threshold)
+
+
+def run_query(start_ids_and_strengths):
+    """ Run one query in a worker. The query is a list of (node_id, input_activation_strength). """
+    cgraph = worker_state['cgraph']
+    start_ids = [node_id for (node_id, _) in start_ids_and_strengths]
+    start_strengths = [strength for (_, strength) in start_ids_and_strengths]
+    families = batched_families(cgraph, start_ids, start_strengths, worker_state['activation_decay'], worker_state['threshold'])
+    return QueryResult(*collect_families(families))
+
+
+class QueryExecutor:
+    """ A pool of worker processes running family-by-family queries against one CompiledGraph in shared memory.
+    processes defaults to the number of CPUs. Use it as a context manager (or call close()) so the shared memory is freed.
+    """
+
+    def __init__(self, cgraph, processes=None, activation_decay=ACTIVATION_DECAY, threshold=THRESHOLD):
+        self.cgraph = cgraph
+        (self._shm, layout) = publish(cgraph)
+        self._pool = multiprocessing.Pool(processes, initializer=init_worker, initargs=(self._shm.name, layout, cgraph.num_nodes, cgraph.schema, activation_decay, threshold))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """ Stop the workers and free the shared memory. """
+        if self._pool is None:
+            return
+        self._pool.terminate()
+        self._pool.join()
+        self._pool = None
+        self._shm.close()
+        self._shm.unlink()
+
+    def imap(self, start_states, chunksize=16, ordered=True):
+        """ Run the queries, yielding a QueryResult for each start state as it finishes. With ordered=False results come back in completion order as (index, QueryResult). """
+        queries = ([(self.cgraph.node_id(node), strength) for (node, strength) in start_state] for start_state in start_states)
+        if ordered:
+            return self._pool.imap(run_query, queries, chunksize)
+        return self._pool.imap_unordered(run_indexed_query, enumerate(queries), chunksize)
+
+    def map(self, start_states, chunksize=16):
+        """ Run the queries and return their activation histories (with node names), in order. """
+        return [result.as_history(self.cgraph.names) for result in self.imap(start_states, chunksize)]
+
+
+def run_indexed_query(index_and_query):
+    (index, query) = index_and_query
+    return (index, run_query(query))
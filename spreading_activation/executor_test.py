@@ -0,0 +1,30 @@
+from spreading_activation.compiled_graph import compile_graph
+from spreading_activation.compiled_graph_test import make_outward_graph
+from spreading_activation.executor import QueryExecutor, attach, publish
+from spreading_activation.multi_query_test import make_random_graph
+from spreading_activation import family_by_family
+
+
+def test_publish_and_attach():
+    (g, schema) = make_outward_graph()
+    cg = compile_graph(g, schema)
+    (shm, layout) = publish(cg)
+    try:
+        (attached_shm, attached) = attach(shm.name, layout, cg.num_nodes, schema)
+        assert family_by_family.batched_algo(attached, [(2, 1)]) == [(t, [(s, cg.node_id(name)) for (s, name) in family]) for (t, family) in family_by_family.algo(cg, [('c', 1)])]
+        del attached
+        attached_shm.close()
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def test_query_executor():
+    (g, schema) = make_random_graph(60, 600, seed=1)
+    cg = compile_graph(g, schema)
+    start_states = [[(i, 3.0), (i + 1, 0.5)] for i in range(0, 20, 2)] + [[(0, 0.01)]]
+    with QueryExecutor(cg, processes=2) as executor:
+        histories = executor.map(start_states, chunksize=2)
+        unordered = dict(executor.imap(start_states, ordered=False))
+    assert histories == [family_by_family.algo(cg, start_state) for start_state in start_states]
+    assert [unordered[i].as_history(cg.names) for i in range(len(start_states))] == histories
@@ -0,0 +1,318 @@
+# Here we house the STEPWISE FAMILY spreading activation algorithm, running on a CompiledGraph.
+#
+# It is the same algorithm as family-by-family/family-by-family.py and produces the same activation history,
+# but it only works with integer node ids and the precomputed arrays of the compiled graph. Node names are
+# looked up only when writing the activation history.
+#
+# batched_algo is a vectorized variant. A family is a batch of simultaneous activations, so it handles the whole
+# family as NumPy arrays: all outgoing links are gathered at once, the input strengths are one array
+# multiplication, THRESHOLD is a mask, and the surviving activations are scattered into a ring buffer of future
+# steps indexed by the link transfer time. Activations are kept in the same order as algo() keeps them, so the two
+# produce identical activation histories.
+#
+# iter_families and batched_families are the streaming versions: generators that hand out each family as soon as
+# it is popped and take the stop conditions of streaming.py. columnar_algo collects batched_families into an
+# ActivationHistory (see history.py) instead of a list of tuples.
+#
+# With refractory=period (see refractory.py) a node that fired does not fire again within period steps. The
+# repeated activations of a node in a family are then merged into the strongest one (where the node first
+# appears), since the node can only fire once.
+#
+# top_k returns only the k most strongly activated nodes, pruning what can't reach them (see top_k.py).
+
+
+# imports
+from collections import deque
+
+import numpy as np
+
+from .history import ActivationHistory, collect_families
+from .refractory import Refractory
+from .streaming import StopConditions
+from .top_k import TopK
+
+
+# define constants
+ACTIVATION_DECAY = 0.8
+THRESHOLD = 0.05
+
+
+class TimeQueue (deque):
+
+    def add_node(self, i, output_activation_strength, node_id):
+        """ Add a new node to the family that activates i steps from now, creating empty families as needed. """
+        while i >= len(self):
+            new_empty_family = []
+            self.append(new_empty_family)
+        self[i].append((output_activation_strength, node_id))
+
+    def pop_family(self):
+        """ Get the next family to be activated. """
+        return self.popleft()
+
+    def as_ordered_list(self):
+        """ The queued nodes as a list of (steps_until_activation, output_activation_strength, node_id). NOTE that this walks the entire queue. """
+        return [(i + 1, strength, node_id) for (i, family) in enumerate(self) for (strength, node_id) in family]
+
+    def size(self):
+        """ The number of queued nodes (not families). NOTE that this walks every family. """
+        return sum(len(family) for family in self)
+
+
+def merge_family(family):
+    """ Collapse the repeated nodes of a family of (output_activation_strength, node_id) to their strongest activation, in the order the nodes first appear. """
+    strongest = {}
+    for (strength, node_id) in family:
+        if node_id not in strongest or strength > strongest[node_id]:
+            strongest[node_id] = strength
+    return [(strength, node_id) for (node_id, strength) in strongest.items()]
+
+
+def merge_family_arrays(family_ids, family_strengths):
+    """ merge_family for a family given as arrays. Returns (node_ids, output_activation_strengths). """
+    if not len(family_ids):
+        return (family_ids, family_strengths)
+    order = np.argsort(family_ids, kind='stable')
+    sorted_ids = family_ids[order]
+    starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+    strongest = np.maximum.reduceat(family_strengths[order], starts)
+    # put the merged nodes back in the order of their first appearance
+    first_appearance = np.argsort(order[starts], kind='stable')
+    return (sorted_ids[starts][first_appearance], strongest[first_appearance])
+
+
+def algo(cgraph, start_state, activation_decay=ACTIVATION_DECAY, threshold=THRESHOLD, tracer=None, refractory=None, **stop_conditions):
+    """ The STEPWISE FAMILY spreading activation algorithm on a CompiledGraph.
+    start_state is a list of (node, input_activation_strength) where node is a node name or NetworkX attribute dict.
+    Returns the activation history as a list of (time, [(output_activation_strength, node_name), ...]).
+    tracer is an optional Tracer (see tracing.py). The schema was applied when compiling, so it never sees rejected links.
+    refractory is None or the refractory period in steps (math.inf to activate every node at most once).
+    stop_conditions are the keyword arguments of streaming.StopConditions.
+    """
+    return list(iter_families(cgraph, start_state, activation_decay, threshold, tracer, refractory, **stop_conditions))
+
+
+def iter_families(cgraph, start_state, activation_decay=ACTIVATION_DECAY, threshold=THRESHOLD, tracer=None, refractory=None, **stop_conditions):
+    """ algo() as a generator, yielding each (time, [(output_activation_strength, node_name), ...]) as soon as it is popped. """
+    stop = StopConditions(**stop_conditions)
+    arrays = cgraph.as_lists()
+    indptr = arrays['indptr']
+    indices = arrays['indices']
+    node_strength = arrays['node_strength']
+    link_strength = arrays['link_strength']
+    transfer_steps = arrays['transfer_steps']
+    names = cgraph.names
+    resting = None if refractory is None else Refractory(cgraph.num_nodes, refractory)
+    tq = TimeQueue()
+    # Put the starting nodes in the time queue. They will be the first to activate.
+    for (start_node, start_input_activation_strength) in start_state:
+        if start_input_activation_strength > threshold:
+            start_id = cgraph.node_id(start_node)
+            tq.add_node(0, start_input_activation_strength * node_strength[start_id], start_id)
+        elif tracer is not None:
+            tracer.prune()
+    if tracer is not None:
+        tracer.queue_size(tq.size())
+    current_time = 0
+    try:
+        while tq:
+            if tracer is not None:
+                tracer.phase('pop')
+            family = tq.pop_family()
+            if tracer is not None:
+                tracer.pop_family(current_time, len(family), lambda: [(steps, strength, names[node_id]) for (steps, strength, node_id) in tq.as_ordered_list()])
+            if resting is not None:
+                # the nodes may have fired since these activations were queued
+                awake = [(strength, node_id) for (strength, node_id) in merge_family(family) if not resting.resting(node_id, current_time)]
+                if tracer is not None:
+                    tracer.prune(len(family) - len(awake))
+                family = awake
+                for (_, node_id) in family:
+                    resting.fire(node_id, current_time)
+            if stop.stopped(current_time):
+                break
+            count = stop.take([node_id for (_, node_id) in family])
+            family = family[:count]
+            yield (current_time, [(strength, names[node_id]) for (strength, node_id) in family])
+            if stop.done:
+                break
+            if tracer is not None:
+                tracer.phase('expand')
+            current_time += 1
+            for (current_node_activation_strength, current_node_id) in family:
+                if tracer is not None:
+                    tracer.scan(indptr[current_node_id + 1] - indptr[current_node_id])
+                # the links of a compiled graph are already filtered by the schema
+                for link_id in range(indptr[current_node_id], indptr[current_node_id + 1]):
+                    steps_until_activation = transfer_steps[link_id]
+                    if steps_until_activation <= 0:
+                        raise ValueError('Link weight must be positive in stepwise algo (use a positive weight).')
+                    input_activation_strength = current_node_activation_strength * link_strength[link_id] * activation_decay
+                    if input_activation_strength > threshold:
+                        child_id = indices[link_id]
+                        # (current_time was already moved on to the next step)
+                        if resting is None or not resting.resting(child_id, current_time - 1 + steps_until_activation):
+                            tq.add_node(steps_until_activation - 1, input_activation_strength * node_strength[child_id], child_id)
+                        elif tracer is not None:
+                            tracer.prune()
+                    elif tracer is not None:
+                        tracer.prune()
+            if tracer is not None:
+                tracer.queue_size(tq.size())
+    finally:
+        if tracer is not None:
+            tracer.finish()
+
+
+def batched_algo(cgraph, start_state, activation_decay=ACTIVATION_DECAY, threshold=THRESHOLD, tracer=None, refractory=None, **stop_conditions):
+    """ The STEPWISE FAMILY spreading activation algorithm, processing each family as NumPy arrays.
+    Same inputs and output as algo().
+    """
+    names = cgraph.names
+    start_ids = [cgraph.node_id(node) for (node, _) in start_state]
+    start_strengths = [strength for (_, strength) in start_state]
+    activation_history = []
+    for (current_time, family_ids, family_strengths) in batched_families(cgraph, start_ids, start_strengths, activation_decay, threshold, tracer, refractory, **stop_conditions):
+        activation_history.append((current_time, list(zip(family_strengths.tolist(), [names[node_id] for node_id in family_ids.tolist()]))))
+    return activation_history
+
+
+def columnar_algo(cgraph, start_state, activation_decay=ACTIVATION_DECAY, threshold=THRESHOLD, tracer=None, refractory=None, **stop_conditions):
+    """ batched_algo, returning the activation history as an ActivationHistory. Its as_families() is the output of algo(). """
+    start_ids = [cgraph.node_id(node) for (node, _) in start_state]
+    start_strengths = [strength for (_, strength) in start_state]
+    families = batched_families(cgraph, start_ids, start_strengths, activation_decay, threshold, tracer, refractory, **stop_conditions)
+    return ActivationHistory(*collect_families(families), cgraph.names)
+
+
+def batched_families(cgraph, start_ids, start_strengths, activation_decay=ACTIVATION_DECAY, threshold=THRESHOLD, tracer=None, refractory=None, **stop_conditions):
+    """ The loop of batched_algo, working only with node ids. Yields (time, node_ids, output_activation_strengths) for every family, as arrays. """
+    stop = StopConditions(**stop_conditions)
+    resting = None if refractory is None else Refractory(cgraph.num_nodes, refractory)
+    # The ring buffer has one slot per step up to the longest transfer time. A slot holds the chunks of
+    # (node_ids, output_activation_strengths) that will activate at that step, in the order they were added.
+    ring_size = max(int(cgraph.transfer_steps.max(initial=1)), 1)
+    ring = [[] for _ in range(ring_size)]
+    pending_slots = 0
+    # Put the starting nodes in the ring buffer. They will be the first to activate.
+    start_ids = np.asarray(start_ids, dtype=np.int64)
+    start_strengths = np.asarray(start_strengths, dtype=np.float64)
+    will_activate = start_strengths > threshold
+    if will_activate.any():
+        start_ids = start_ids[will_activate]
+        ring[0].append((start_ids, start_strengths[will_activate] * cgraph.node_strength[start_ids]))
+        pending_slots += 1
+    if tracer is not None:
+        tracer.prune(int((~will_activate).sum()))
+        tracer.queue_size(sum(len(ids) for slot in ring for (ids, _) in slot))
+    current_time = 0
+    try:
+        while pending_slots:
+            if tracer is not None:
+                tracer.phase('pop')
+            slot = current_time % ring_size
+            chunks = ring[slot]
+            ring[slot] = []
+            if chunks:
+                pending_slots -= 1
+                family_ids = np.concatenate([ids for (ids, _) in chunks])
+                family_strengths = np.concatenate([strengths for (_, strengths) in chunks])
+            else:
+                family_ids = np.empty(0, dtype=np.int64)
+                family_strengths = np.empty(0, dtype=np.float64)
+            if tracer is not None:
+                tracer.pop_family(current_time, len(family_ids), lambda: [(steps, float(strength), cgraph.names[node_id]) for steps in range(1, ring_size + 1) for (ids, strengths) in ring[(current_time + steps) % ring_size] for (node_id, strength) in zip(ids.tolist(), strengths)])
+            if resting is not None:
+                # the nodes may have fired since these activations were queued
+                popped = len(family_ids)
+                (family_ids, family_strengths) = merge_family_arrays(family_ids, family_strengths)
+                awake = ~resting.resting_all(family_ids, current_time)
+                family_ids = family_ids[awake]
+                family_strengths = family_strengths[awake]
+                if tracer is not None:
+                    tracer.prune(popped - len(family_ids))
+                resting.fire_all(family_ids, current_time)
+            if stop.stopped(current_time):
+                break
+            count = stop.take(family_ids)
+            family_ids = family_ids[:count]
+            family_strengths = family_strengths[:count]
+            yield (current_time, family_ids, family_strengths)
+            if stop.done:
+                break
+            if tracer is not None:
+                tracer.phase('expand')
+            # gather every outgoing link of the family at once (links are already filtered by the schema)
+            (link_ids, owners) = cgraph.links_of(family_ids)
+            steps_until_activation = cgraph.transfer_steps[link_ids]
+            if (steps_until_activation <= 0).any():
+                raise ValueError('Link weight must be positive in stepwise algo (use a positive weight).')
+            input_activation_strengths = family_strengths[owners] * cgraph.link_strength[link_ids] * activation_decay
+            will_activate = input_activation_strengths > threshold
+            if tracer is not None:
+                tracer.scan(len(link_ids))
+                tracer.prune(len(link_ids) - int(will_activate.sum()))
+            link_ids = link_ids[will_activate]
+            steps_until_activation = steps_until_activation[will_activate]
+            child_ids = cgraph.indices[link_ids].astype(np.int64)
+            output_activation_strengths = input_activation_strengths[will_activate] * cgraph.node_strength[child_ids]
+            if resting is not None:
+                awake = ~resting.resting_all(child_ids, current_time + steps_until_activation)
+                if tracer is not None:
+                    tracer.prune(len(child_ids) - int(awake.sum()))
+                steps_until_activation = steps_until_activation[awake]
+                child_ids = child_ids[awake]
+                output_activation_strengths = output_activation_strengths[awake]
+            # scatter the activations into the ring buffer, one chunk per distinct transfer time
+            for steps in np.unique(steps_until_activation).tolist():
+                arriving = steps_until_activation == steps
+                target = ring[(current_time + steps) % ring_size]
+                if not target:
+                    pending_slots += 1
+                target.append((child_ids[arriving], output_activation_strengths[arriving]))
+            if tracer is not None:
+                tracer.queue_size(sum(len(ids) for slot in ring for (ids, _) in slot))
+            current_time += 1
+    finally:
+        if tracer is not None:
+            tracer.finish()
+
+
+def top_k(cgraph, start_state, k, activation_decay=ACTIVATION_DECAY, threshold=THRESHOLD):
+    """ The k most strongly activated nodes, as a list of (output_activation_strength, node_name), strongest first. A node's strength is its strongest activation. Ties for the k-th place are broken arbitrarily.
+    Activations that can't reach the top k are not queued or not expanded (see top_k.py), so this ends much earlier than algo().
+    """
+    arrays = cgraph.as_lists()
+    indptr = arrays['indptr']
+    indices = arrays['indices']
+    node_strength = arrays['node_strength']
+    link_strength = arrays['link_strength']
+    transfer_steps = arrays['transfer_steps']
+    best = TopK(k)
+    tq = TimeQueue()
+    for (start_node, start_input_activation_strength) in start_state:
+        if start_input_activation_strength > threshold:
+            start_id = cgraph.node_id(start_node)
+            output_activation_strength = start_input_activation_strength * node_strength[start_id]
+            if output_activation_strength > best.bound():
+                best.add(output_activation_strength, start_id)
+                tq.add_node(0, output_activation_strength, start_id)
+    while tq:
+        # only the strongest of a node's repeated activations in a family can matter
+        for (current_node_activation_strength, current_node_id) in merge_family(tq.pop_family()):
+            # nothing this node reaches can beat the k-th best
+            if current_node_activation_strength * activation_decay <= best.bound():
+                continue
+            for link_id in range(indptr[current_node_id], indptr[current_node_id + 1]):
+                steps_until_activation = transfer_steps[link_id]
+                if steps_until_activation <= 0:
+                    raise ValueError('Link weight must be positive in stepwise algo (use a positive weight).')
+                input_activation_strength = current_node_activation_strength * link_strength[link_id] * activation_decay
+                if input_activation_strength > threshold:
+                    child_id = indices[link_id]
+                    output_activation_strength = input_activation_strength * node_strength[child_id]
+                    if output_activation_strength > best.bound():
+                        best.add(output_activation_strength, child_id)
+                        tq.add_node(steps_until_activation - 1, output_activation_strength, child_id)
+    names = cgraph.names
+    return [(strength, names[node_id]) for (strength, node_id) in best.as_list()]
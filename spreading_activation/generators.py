@@ -0,0 +1,135 @@
+# Here we generate large synthetic graphs to run the algos on, straight into CompiledGraphs.
+#
+# Going through NetworkX is fine for a few thousand links but not for millions, so the generators draw flat arrays
+# of links with NumPy and hand them to compile_edges. Node types are chosen so that (almost) every link joins
+# neighbouring types of the schema, otherwise the schema would throw most of the graph away.
+#
+# Link weights come from a weight distribution given as a string:
+#   'constant:W'         every weight is W
+#   'integer:LOW:HIGH'   integers from LOW to HIGH (inclusive), the default, so every engine gives the same times
+#   'uniform:LOW:HIGH'   real numbers from LOW to HIGH
+#   'exponential:SCALE'  real numbers, exponentially distributed (with mean SCALE)
+
+
+# imports
+import numpy as np
+
+from .compiled_graph import CompiledGraph
+
+
+# define constants
+SCHEMA = ['a', 'b', 'c']
+LINK_WEIGHTS = 'integer:1:2'
+NODE_WEIGHTS = 'constant:0'
+
+
+def make_weights(spec, rng, size):
+    """ Draw size weights from the weight distribution spec (see the top of this file). """
+    (kind, *params) = spec.split(':')
+    params = [float(param) for param in params]
+    if kind == 'constant':
+        return np.full(size, params[0])
+    if kind == 'integer':
+        return rng.integers(int(params[0]), int(params[1]) + 1, size).astype(np.float64)
+    if kind == 'uniform':
+        return rng.uniform(params[0], params[1], size)
+    if kind == 'exponential':
+        return rng.exponential(params[0], size)
+    raise ValueError(f'Unknown weight distribution: {spec}')
+
+
+def compile_edges(schema, type_ids, node_weight, sources, targets, link_weight, names=None):
+    """ Compile flat arrays of links into a CompiledGraph, like compile_graph does for a NetworkX graph. Node i has type schema[type_ids[i]] (-1 for a type outside the schema) and the links of each node keep their order in the arrays. Parallel links are kept. names defaults to the node ids. """
+    type_ids = np.asarray(type_ids, dtype=np.int32)
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    link_weight = np.asarray(link_weight, dtype=np.float64)
+    num_nodes = len(type_ids)
+    # the schema only lets activation spread to the type just before or just after
+    source_types = type_ids[sources]
+    valid = (source_types >= 0) & (np.abs(type_ids[targets] - source_types) == 1)
+    order = np.argsort(sources[valid], kind='stable')
+    sources = sources[valid][order]
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=num_nodes), out=indptr[1:])
+    names = range(num_nodes) if names is None else names
+    return CompiledGraph(names, schema, type_ids, node_weight, indptr, targets[valid][order], link_weight[valid][order], rejected_links=int((~valid).sum()))
+
+
+def zigzag_types(layers, schema_length):
+    """ The type id of each layer, going up and down the schema (0, 1, 2, 1, 0, 1, ...) so that neighbouring layers always have neighbouring types. """
+    if schema_length < 2:
+        raise ValueError('The schema needs at least 2 types for activation to spread.')
+    period = 2 * (schema_length - 1)
+    position = np.arange(layers) % period
+    return np.where(position < schema_length, position, period - position).astype(np.int32)
+
+
+def scale_free_graph(num_nodes, num_links, exponent=2.5, schema=SCHEMA, link_weights=LINK_WEIGHTS, node_weights=NODE_WEIGHTS, seed=0):
+    """ A graph whose in and out degrees follow a power law with the given exponent (a Chung-Lu style random graph). Node types alternate between the first two types of the schema and every link goes to a node of the other type. """
+    rng = np.random.default_rng(seed)
+    # node i is picked with probability proportional to (i + 1) ** (-1 / (exponent - 1))
+    popularity = np.arange(1, num_nodes + 1, dtype=np.float64) ** (-1 / (exponent - 1))
+    popularity /= popularity.sum()
+    sources = rng.choice(num_nodes, num_links, p=popularity)
+    targets = rng.choice(num_nodes, num_links, p=popularity)
+    # move each target to the neighbouring node of the other type
+    same_type = (sources % 2) == (targets % 2)
+    targets[same_type] ^= 1
+    targets[targets >= num_nodes] -= 2
+    type_ids = np.arange(num_nodes, dtype=np.int32) % 2
+    return compile_edges(schema, type_ids, make_weights(node_weights, rng, num_nodes), sources, targets, make_weights(link_weights, rng, num_links))
+
+
+def layered_graph(num_layers, layer_size, num_links, backward_fraction=0.2, schema=SCHEMA, link_weights=LINK_WEIGHTS, node_weights=NODE_WEIGHTS, seed=0):
+    """ A graph of num_layers layers of layer_size nodes, where layer l has a type of the schema next to the types of layers l - 1 and l + 1. Links join random nodes of neighbouring layers; backward_fraction of them point back a layer. """
+    rng = np.random.default_rng(seed)
+    num_nodes = num_layers * layer_size
+    type_ids = np.repeat(zigzag_types(num_layers, len(schema)), layer_size)
+    source_layers = rng.integers(0, num_layers, num_links)
+    backward = rng.random(num_links) < backward_fraction
+    target_layers = np.where(backward, source_layers - 1, source_layers + 1)
+    # links that would leave the graph go the other way
+    target_layers[target_layers < 0] = 1
+    target_layers[target_layers >= num_layers] = num_layers - 2
+    sources = source_layers * layer_size + rng.integers(0, layer_size, num_links)
+    targets = target_layers * layer_size + rng.integers(0, layer_size, num_links)
+    return compile_edges(schema, type_ids, make_weights(node_weights, rng, num_nodes), sources, targets, make_weights(link_weights, rng, num_links))
+
+
+def grid_graph(rows, columns, schema=SCHEMA, link_weights=LINK_WEIGHTS, node_weights=NODE_WEIGHTS, seed=0):
+    """ A rows x columns grid where every node links to its (up to 4) neighbours. Types follow a checkerboard of the first two types of the schema, so every link is allowed. """
+    rng = np.random.default_rng(seed)
+    num_nodes = rows * columns
+    node_ids = np.arange(num_nodes).reshape(rows, columns)
+    type_ids = ((np.arange(rows)[:, None] + np.arange(columns)[None, :]) % 2).astype(np.int32).ravel()
+    pairs = [
+        (node_ids[:, :-1], node_ids[:, 1:]),
+        (node_ids[:, 1:], node_ids[:, :-1]),
+        (node_ids[:-1, :], node_ids[1:, :]),
+        (node_ids[1:, :], node_ids[:-1, :]),
+    ]
+    sources = np.concatenate([source.ravel() for (source, _) in pairs])
+    targets = np.concatenate([target.ravel() for (_, target) in pairs])
+    return compile_edges(schema, type_ids, make_weights(node_weights, rng, num_nodes), sources, targets, make_weights(link_weights, rng, len(sources)))
+
+
+def random_dag(num_nodes, num_links, max_span=100, schema=SCHEMA, link_weights=LINK_WEIGHTS, node_weights=NODE_WEIGHTS, seed=0):
+    """ A random directed acyclic graph: every link goes from a node to a later node, at most max_span ids further. Node types alternate between the first two types of the schema and links skip an odd number of nodes, so they join different types. """
+    rng = np.random.default_rng(seed)
+    sources = rng.integers(0, max(num_nodes - 1, 1), num_links)
+    targets = sources + 2 * rng.integers(0, max(max_span // 2, 1), num_links) + 1
+    # links past the last node go to the last nodes instead (keeping the type alternation)
+    overflow = targets >= num_nodes
+    targets[overflow] = num_nodes - 1 - ((num_nodes - 1 - sources[overflow]) % 2 == 0)
+    type_ids = np.arange(num_nodes, dtype=np.int32) % 2
+    return compile_edges(schema, type_ids, make_weights(node_weights, rng, num_nodes), sources, targets, make_weights(link_weights, rng, num_links))
+
+
+# graph kind -> function of (num_links, link_weights, seed) making a graph of about num_links links
+GRAPHS = {
+    'scale_free': lambda num_links, link_weights, seed: scale_free_graph(max(num_links // 4, 2), num_links, link_weights=link_weights, seed=seed),
+    'layered': lambda num_links, link_weights, seed: layered_graph(20, max(num_links // 80, 1), num_links, link_weights=link_weights, seed=seed),
+    'grid': lambda num_links, link_weights, seed: grid_graph(max(int((num_links / 4) ** 0.5), 2), max(int((num_links / 4) ** 0.5), 2), link_weights=link_weights, seed=seed),
+    'random_dag': lambda num_links, link_weights, seed: random_dag(max(num_links // 4, 2), num_links, link_weights=link_weights, seed=seed),
+}
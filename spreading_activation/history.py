@@ -0,0 +1,168 @@
+# Here we keep activation histories as columns of typed arrays instead of lists of tuples.
+#
+# An ActivationHistory has one entry per activation, in the order of the activation history: its time, its output
+# activation strength and the id of the node, plus the table of node names the ids point into. A run with millions
+# of activations is then a few flat arrays instead of millions of tuples. Both engines hand out activations in time
+# order, so the times are sorted and filtering by time is a binary search that returns views.
+#
+# A history saves to an uncompressed .npz file. load() memory-maps the arrays straight out of that file, so
+# opening a large history copies nothing. as_families() and as_activations() give the familiar tuple formats.
+
+
+# imports
+import zipfile
+
+import numpy as np
+
+
+def collect_families(families):
+    """ Concatenate the (time, node_ids, output_activation_strengths) families yielded by batched_families into (times, strengths, node_ids) arrays. """
+    times = []
+    strengths = []
+    node_ids = []
+    for (current_time, family_ids, family_strengths) in families:
+        times.append(np.full(len(family_ids), current_time, dtype=np.int32))
+        strengths.append(family_strengths)
+        node_ids.append(family_ids.astype(np.int32))
+    if not times:
+        return (np.empty(0, dtype=np.int32), np.empty(0), np.empty(0, dtype=np.int32))
+    return (np.concatenate(times), np.concatenate(strengths), np.concatenate(node_ids))
+
+
+def collect_activations(activations):
+    """ Turn the (activation_time, output_activation_strength, node_id) activations of the one-by-one algo into (times, strengths, node_ids) arrays. """
+    times = []
+    strengths = []
+    node_ids = []
+    for (current_time, strength, node_id) in activations:
+        times.append(current_time)
+        strengths.append(strength)
+        node_ids.append(node_id)
+    times = np.array(times)
+    # transfer times are link weights, so they are integers unless some weight is not
+    times = times.astype(np.int32 if times.dtype.kind in 'iub' else np.float64)
+    return (times, np.array(strengths, dtype=np.float64), np.array(node_ids, dtype=np.int32))
+
+
+class ActivationHistory:
+    """ An activation history as three aligned arrays (times, strengths, node_ids) and a table of node names.
+    times is int32 for the family-by-family algo and float64 when activation times are real-valued.
+    """
+
+    def __init__(self, times, strengths, node_ids, names):
+        if not len(times) == len(strengths) == len(node_ids):
+            raise ValueError('times, strengths and node_ids must have the same length.')
+        self.times = times
+        self.strengths = strengths
+        self.node_ids = node_ids
+        self.names = names
+        # node name -> node id, built the first time a node is looked up by name
+        self._index = None
+
+    def __repr__(self):
+        return 'ActivationHistory({} activations, {} nodes)'.format(len(self), len(self.names))
+
+    def __len__(self):
+        return len(self.times)
+
+    def __iter__(self):
+        """ Iterate over (activation_time, output_activation_strength, node_name), the format of the one-by-one algo. """
+        names = self.names
+        for (current_time, strength, node_id) in zip(self.times.tolist(), self.strengths.tolist(), self.node_ids.tolist()):
+            yield (current_time, strength, names[node_id])
+
+    def take(self, selection):
+        """ The activations picked by selection (a slice, a boolean mask or an array of positions), as a new ActivationHistory. Slices are views. """
+        return ActivationHistory(self.times[selection], self.strengths[selection], self.node_ids[selection], self.names)
+
+    def between(self, start_time=None, stop_time=None):
+        """ The activations with start_time <= time < stop_time. None means unbounded. """
+        start = 0 if start_time is None else int(np.searchsorted(self.times, start_time, side='left'))
+        stop = len(self.times) if stop_time is None else int(np.searchsorted(self.times, stop_time, side='left'))
+        return self.take(slice(start, max(start, stop)))
+
+    def at_time(self, current_time):
+        """ The activations at exactly current_time (for the family-by-family algo, that family). """
+        start = int(np.searchsorted(self.times, current_time, side='left'))
+        stop = int(np.searchsorted(self.times, current_time, side='right'))
+        return self.take(slice(start, stop))
+
+    def node_id(self, node):
+        """ The id of a node, given its name. """
+        if self._index is None:
+            self._index = {name: node_id for (node_id, name) in enumerate(self.names)}
+        return self._index[node]
+
+    def of_nodes(self, nodes):
+        """ The activations of the given nodes (names), in history order. """
+        node_ids = np.array([self.node_id(node) for node in nodes], dtype=self.node_ids.dtype)
+        return self.take(np.isin(self.node_ids, node_ids))
+
+    def of_node(self, node):
+        return self.of_nodes([node])
+
+    def as_activations(self):
+        """ The history in the format of the one-by-one algo: a list of (activation_time, output_activation_strength, node_name). """
+        return list(self)
+
+    def as_families(self):
+        """ The history in the format of the family-by-family algo: a list of (time, [(output_activation_strength, node_name), ...]).
+        Steps with no activations between the first and the last one get an empty family, like the algo gives them.
+        """
+        activation_history = []
+        if not len(self.times):
+            return activation_history
+        first_time = int(self.times[0])
+        names = self.names
+        for (current_time, strength, node_id) in zip(self.times.tolist(), self.strengths.tolist(), self.node_ids.tolist()):
+            while first_time + len(activation_history) <= current_time:
+                activation_history.append((first_time + len(activation_history), []))
+            activation_history[-1][1].append((strength, names[node_id]))
+        return activation_history
+
+    def save(self, path):
+        """ Save the history to an uncompressed .npz file, which load() can memory-map. """
+        # np.savez would add .npz to a path without it, so hand it an open file
+        with open(path, 'wb') as f:
+            np.savez(f, times=self.times, strengths=self.strengths, node_ids=self.node_ids, names=np.asarray(list(self.names)))
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """ Load a history saved by save(). With mmap_mode (as for numpy.load) the arrays are memory-mapped from the file instead of read into memory. """
+        if mmap_mode is None:
+            with np.load(path, allow_pickle=False) as arrays:
+                columns = {name: arrays[name] for name in arrays.files}
+        else:
+            columns = load_npz_mmap(path, mmap_mode)
+        # the name table is small, and names are compared with python objects, so it is read into a list
+        return cls(columns['times'], columns['strengths'], columns['node_ids'], np.asarray(columns['names']).tolist())
+
+
+def load_npz_mmap(path, mmap_mode='r'):
+    """ Memory-map every array of an uncompressed .npz file. Returns {name: array}.
+    An .npz file is a zip of .npy files, so each stored (uncompressed) member is an .npy file at some offset of the zip.
+    """
+    arrays = {}
+    with open(path, 'rb') as f, zipfile.ZipFile(f) as archive:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError('Can only memory-map an uncompressed .npz file (use ActivationHistory.save or numpy.savez).')
+            # skip the local file header: 30 fixed bytes, then the file name and the extra field
+            f.seek(info.header_offset + 26)
+            name_length = int.from_bytes(f.read(2), 'little')
+            extra_length = int.from_bytes(f.read(2), 'little')
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                (shape, fortran_order, dtype) = np.lib.format.read_array_header_1_0(f)
+            else:
+                (shape, fortran_order, dtype) = np.lib.format.read_array_header_2_0(f)
+            name = info.filename[:-len('.npy')] if info.filename.endswith('.npy') else info.filename
+            if shape == ():
+                # a scalar can't be memory-mapped, so read it
+                arrays[name] = np.frombuffer(f.read(dtype.itemsize), dtype=dtype).reshape(()).copy()
+            elif 0 in shape:
+                arrays[name] = np.zeros(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(f.name, dtype=dtype, mode=mmap_mode, offset=f.tell(), shape=shape, order='F' if fortran_order else 'C')
+    return arrays
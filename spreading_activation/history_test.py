@@ -0,0 +1,46 @@
+import numpy as np
+
+from spreading_activation.compiled_graph import compile_graph
+from spreading_activation.compiled_graph_test import make_graph, make_outward_graph
+from spreading_activation.history import ActivationHistory
+from spreading_activation import family_by_family, one_by_one
+
+
+def test_columnar_family_by_family():
+    (g, schema) = make_outward_graph()
+    cg = compile_graph(g, schema)
+    history = family_by_family.columnar_algo(cg, [('c', 1)])
+    assert history.times.dtype == np.int32
+    assert history.node_ids.dtype == np.int32
+    assert history.as_families() == family_by_family.algo(cg, [('c', 1)])
+    assert history.at_time(1).as_activations() == [(1, 0.4, 'b'), (1, 0.4, 'd')]
+    assert history.between(2, 3).as_families() == [(2, [(0.16000000000000003, 'a')])]
+    assert [t for (t, _, _) in history.of_node('e')] == [3]
+    # steps with nothing activated are empty families
+    g = make_graph(['b', 'c'], [('b', 'c', {'weight': 3})])
+    cg = compile_graph(g, ['b', 'c'])
+    assert family_by_family.columnar_algo(cg, [('b', 1)]).as_families() == family_by_family.algo(cg, [('b', 1)])
+
+
+def test_columnar_one_by_one():
+    g = make_graph(['b', 'c'], [('b', 'c', {'weight': 0.5})])
+    cg = compile_graph(g, ['b', 'c'])
+    history = one_by_one.columnar_algo(cg, [('b', 1)])
+    assert history.times.dtype == np.float64
+    assert history.as_activations() == one_by_one.algo(cg, [('b', 1)])['activation_history']
+    assert len(history.of_nodes(['b', 'c'])) == 2
+
+
+def test_save_and_load(tmp_path):
+    (g, schema) = make_outward_graph()
+    cg = compile_graph(g, schema)
+    history = family_by_family.columnar_algo(cg, [('c', 1)])
+    path = tmp_path / 'history'
+    history.save(path)
+    loaded = ActivationHistory.load(path)
+    assert isinstance(loaded.times, np.memmap)
+    assert loaded.as_families() == history.as_families()
+    assert ActivationHistory.load(path, mmap_mode=None).as_activations() == history.as_activations()
+    empty = ActivationHistory(np.empty(0, dtype=np.int32), np.empty(0), np.empty(0, dtype=np.int32), [])
+    empty.save(path)
+    assert ActivationHistory.load(path).as_families() == []
@@ -0,0 +1,141 @@
+# Here we keep the result of a LOCKSTEP query up to date while the links of the graph change.
+#
+# In the lockstep history the activation of node v at step t is the strongest of what reaches it at t: the start
+# strength if t = 0, and, for every activation (t', u) and link u -> v taking t - t' steps, the strength it brings if
+# its input strength is above THRESHOLD. A MaintainedQuery remembers that dependency information: for every
+# activation, what each parent activation brought to it (its contributions) and which activations it brought
+# something to (its targets). That is one entry per link that carried activation above THRESHOLD, the same order
+# of size as the work of the query itself.
+#
+# After links change (CompiledGraph.set_link_weights or add_links), update() re-expands the activations of their
+# source nodes along the current links. Every contribution that appears, changes or disappears marks its target
+# activation dirty, and dirty activations are recomputed in time order (every link takes at least one step, so
+# all the contributions to (t, v) are final by then). Only an activation whose strength actually changes is
+# expanded further, so the cost follows the part of the cascade that changes, not the size of the graph.
+#
+#   query = MaintainedQuery(cgraph, start_state)
+#   diff = query.update(cgraph.set_link_weights(sources, targets, weights))
+#   query.history() == lockstep.algo(cgraph, start_state)
+
+
+# imports
+import heapq
+
+from .family_by_family import ACTIVATION_DECAY, THRESHOLD
+
+
+class MaintainedQuery:
+    """ A LOCKSTEP query (see lockstep.algo) whose activation history is kept up to date as the links of the graph change. """
+
+    def __init__(self, cgraph, start_state, activation_decay=ACTIVATION_DECAY, threshold=THRESHOLD):
+        self.cgraph = cgraph
+        self.activation_decay = activation_decay
+        self.threshold = threshold
+        # start node id -> output activation strength at step 0 (the strongest start of the node)
+        self.starts = {}
+        for (start_node, start_input_activation_strength) in start_state:
+            if start_input_activation_strength > threshold:
+                start_id = cgraph.node_id(start_node)
+                strength = start_input_activation_strength * cgraph.node_strength[start_id]
+                self.starts[start_id] = max(strength, self.starts.get(start_id, 0))
+        # node id -> {time: output_activation_strength}
+        self.activations = {}
+        # (time, node_id) -> {(parent_time, parent_id): output_activation_strength it brings}
+        self.contributions = {}
+        # (parent_time, parent_id) -> set of the (time, node_id) it brings something to
+        self.targets = {}
+        # the first run is an update from nothing
+        self.propagate([(0, start_id) for start_id in self.starts], set())
+
+    def __repr__(self):
+        return f'MaintainedQuery with {sum(len(times) for times in self.activations.values())} activations'
+
+    def strength(self, activation_time, node_id):
+        """ The output activation strength of the node at that time, or None when it isn't activated then. """
+        return self.activations.get(node_id, {}).get(activation_time)
+
+    def history(self):
+        """ The activation history, as lockstep.algo returns it: a list of (time, [(output_activation_strength, node_name), ...]) ordered by node id in each family. """
+        families = {}
+        for (node_id, times) in self.activations.items():
+            for (activation_time, strength) in times.items():
+                families.setdefault(activation_time, []).append((node_id, strength))
+        names = self.cgraph.names
+        return [(t, [(strength, names[node_id]) for (node_id, strength) in sorted(families.get(t, []))]) for t in range(max(families, default=-1) + 1)]
+
+    def update(self, source_ids):
+        """ Bring the history up to date after the links leaving the nodes source_ids (node ids, as returned by CompiledGraph.set_link_weights and add_links) changed.
+        Returns the diff as a list of (time, node_name, old_output_activation_strength, new_output_activation_strength) ordered by time and node id, where a strength is None when the node isn't activated at that time.
+        """
+        seeds = {(activation_time, node_id) for node_id in {int(source_id) for source_id in source_ids} for activation_time in self.activations.get(node_id, ())}
+        return self.propagate(list(seeds), seeds)
+
+    def propagate(self, dirty, expand):
+        """ Recompute the dirty (time, node_id) activations and everything downstream of them, re-expanding the ones in expand even if their strength doesn't change. Returns the diff (see update). """
+        arrays = self.cgraph.as_lists()
+        indptr = arrays['indptr']
+        indices = arrays['indices']
+        node_strength = arrays['node_strength']
+        link_strength = arrays['link_strength']
+        transfer_steps = arrays['transfer_steps']
+        activation_decay = self.activation_decay
+        threshold = self.threshold
+        contributions = self.contributions
+        queued = set(dirty)
+        heapq.heapify(dirty)
+        # (time, node_id) -> strength before the update, for the activations that changed
+        old_strengths = {}
+        while dirty:
+            key = heapq.heappop(dirty)
+            queued.discard(key)
+            (current_time, node_id) = key
+            brought = contributions.get(key)
+            strength = max(brought.values()) if brought else None
+            if current_time == 0 and node_id in self.starts:
+                strength = max(strength or 0, self.starts[node_id])
+            times = self.activations.setdefault(node_id, {})
+            old_strength = times.get(current_time)
+            if strength != old_strength:
+                old_strengths.setdefault(key, old_strength)
+                if strength is None:
+                    del times[current_time]
+                else:
+                    times[current_time] = strength
+            elif key not in expand:
+                continue
+            if not times:
+                del self.activations[node_id]
+            # expand along the current links
+            new_targets = {}
+            if strength is not None:
+                for link_id in range(indptr[node_id], indptr[node_id + 1]):
+                    steps_until_activation = transfer_steps[link_id]
+                    if steps_until_activation <= 0:
+                        raise ValueError('Link weight must be positive in stepwise algo (use a positive weight).')
+                    input_activation_strength = strength * link_strength[link_id] * activation_decay
+                    if input_activation_strength > threshold:
+                        child_id = indices[link_id]
+                        target = (current_time + steps_until_activation, child_id)
+                        output_activation_strength = input_activation_strength * node_strength[child_id]
+                        if output_activation_strength > new_targets.get(target, 0):
+                            new_targets[target] = output_activation_strength
+            changed_targets = []
+            for target in self.targets.pop(key, ()):
+                if target not in new_targets:
+                    del contributions[target][key]
+                    if not contributions[target]:
+                        del contributions[target]
+                    changed_targets.append(target)
+            for (target, output_activation_strength) in new_targets.items():
+                target_contributions = contributions.setdefault(target, {})
+                if target_contributions.get(key) != output_activation_strength:
+                    target_contributions[key] = output_activation_strength
+                    changed_targets.append(target)
+            if new_targets:
+                self.targets[key] = set(new_targets)
+            for target in changed_targets:
+                if target not in queued:
+                    queued.add(target)
+                    heapq.heappush(dirty, target)
+        names = self.cgraph.names
+        return [(t, names[node_id], old_strength, self.strength(t, node_id)) for ((t, node_id), old_strength) in sorted(old_strengths.items()) if old_strength != self.strength(t, node_id)]
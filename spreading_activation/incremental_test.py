@@ -0,0 +1,52 @@
+import numpy as np
+
+from spreading_activation.compiled_graph import compile_graph
+from spreading_activation.compiled_graph_test import make_outward_graph
+from spreading_activation.generators import GRAPHS
+from spreading_activation.incremental import MaintainedQuery
+from spreading_activation import lockstep
+
+
+def as_strengths(history):
+    return {(t, name): strength for (t, family) in history for (strength, name) in family}
+
+
+def check_diff(diff, old_history, new_history):
+    (old, new) = (as_strengths(old_history), as_strengths(new_history))
+    assert {(t, name): (old_strength, new_strength) for (t, name, old_strength, new_strength) in diff} == {key: (old.get(key), new.get(key)) for key in old.keys() | new.keys() if old.get(key) != new.get(key)}
+
+
+def test_maintained_query_outward():
+    (g, schema) = make_outward_graph()
+    cg = compile_graph(g, schema)
+    query = MaintainedQuery(cg, [('c', 1)])
+    assert query.history() == lockstep.algo(cg, [('c', 1)])
+    # d -> e gets faster and stronger
+    diff = query.update(cg.set_link_weights([cg.node_id('d')], [cg.node_id('e')], [1]))
+    assert diff == [(2, 'e', None, 0.16000000000000003), (3, 'e', 0.08000000000000002, None)]
+    assert query.history() == lockstep.algo(cg, [('c', 1)])
+    # a new link from e back to d
+    diff = query.update(cg.add_links([cg.node_id('e')], [cg.node_id('d')], [1]))
+    assert [(t, name, old_strength) for (t, name, old_strength, _) in diff] == [(3, 'd', None)]
+    assert query.history() == lockstep.algo(cg, [('c', 1)])
+
+
+def test_maintained_query_matches_rerun():
+    rng = np.random.default_rng(5)
+    cg = GRAPHS['layered'](3000, 'integer:1:3', 2)
+    start_state = [(node_id, 20.0) for node_id in range(0, 40, 3)]
+    query = MaintainedQuery(cg, start_state)
+    history = lockstep.algo(cg, start_state)
+    assert query.history() == history
+    for _ in range(10):
+        link_ids = rng.integers(0, cg.num_links, 5)
+        (_, owners) = cg.links_of(np.arange(cg.num_nodes))
+        sources = owners[link_ids]
+        if rng.random() < 0.5:
+            changed = cg.set_link_weights(sources, cg.indices[link_ids], rng.integers(1, 4, 5).astype(float))
+        else:
+            changed = cg.add_links(sources, rng.integers(0, cg.num_nodes, 5), rng.integers(1, 4, 5).astype(float))
+        diff = query.update(changed)
+        (old_history, history) = (history, lockstep.algo(cg, start_state))
+        assert query.history() == history
+        check_diff(diff, old_history, history)
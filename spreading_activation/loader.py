@@ -0,0 +1,115 @@
+# Here we load a graph from node and edge list files straight into a CompiledGraph, without NetworkX.
+#
+# The node file has one row per node: name, type, weight. The edge file has one row per link: source name, target
+# name, weight. Files are CSV, or TSV when the name has .tsv in it, and may be compressed (.gz, .bz2, .xz). By
+# default the first row of each file is a header and is skipped.
+#
+# Both files are read in chunks of chunk_size rows. Node names and types are interned into ids as the node file is
+# read (nodes get ids in file order, like graph.nodes for compile_graph). Every edge chunk becomes three small
+# arrays (source id, target id, weight) and the links the schema doesn't allow are dropped right away. Then each
+# chunk is scattered into the final CSR arrays and freed, so links of a node keep their order in the file and
+# peak memory is the final arrays plus the chunks (16 bytes a link), not a Python object per link.
+
+
+# imports
+import bz2
+import csv
+import gzip
+import lzma
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+
+from .compiled_graph import CompiledGraph
+
+
+# define constants
+CHUNK_SIZE = 2 ** 16
+OPENERS = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}
+
+
+def open_rows(path, header=True):
+    """ Open a node or edge file and return (file, rows) where rows is a csv reader over it. """
+    suffixes = Path(path).suffixes
+    opener = OPENERS.get(suffixes[-1], open) if suffixes else open
+    f = opener(path, 'rt', newline='')
+    rows = csv.reader(f, delimiter='\t' if '.tsv' in suffixes else ',')
+    if header:
+        next(rows, None)
+    return (f, rows)
+
+
+def iter_chunks(path, num_columns, header=True, chunk_size=CHUNK_SIZE):
+    """ Read a file in chunks of chunk_size rows. Yields a tuple of num_columns columns (tuples of strings) per chunk. """
+    (f, rows) = open_rows(path, header)
+    with f:
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            columns = tuple(zip(*chunk))
+            if len(columns) < num_columns or any(len(row) < num_columns for row in chunk):
+                raise ValueError(f'{path}: every row needs {num_columns} columns.')
+            yield columns[:num_columns]
+
+
+def as_weights(column):
+    return np.fromiter(map(float, column), dtype=np.float64, count=len(column))
+
+
+def load_edge_lists(nodes_path, edges_path, schema, header=True, chunk_size=CHUNK_SIZE):
+    """ Load a graph from a node file and an edge file (see the top of this file) into a CompiledGraph for the given schema. """
+    # node name -> node id
+    index = {}
+    schema_index = {node_type: i for (i, node_type) in enumerate(schema)}
+    type_ids = []
+    node_weight = []
+    for (names, types, weights) in iter_chunks(nodes_path, 3, header, chunk_size):
+        for name in names:
+            if name in index:
+                raise ValueError(f'{nodes_path}: node {name!r} appears twice.')
+            index[name] = len(index)
+        # a node whose type is not in the schema gets type id -1 and no outgoing links
+        type_ids.append(np.array([schema_index.get(node_type, -1) for node_type in types], dtype=np.int32))
+        node_weight.append(as_weights(weights))
+    num_nodes = len(index)
+    type_ids = np.concatenate(type_ids) if type_ids else np.empty(0, dtype=np.int32)
+    node_weight = np.concatenate(node_weight) if node_weight else np.empty(0)
+    # read the links, keeping the ones the schema allows, and count the links of each node
+    chunks = []
+    counts = np.zeros(num_nodes, dtype=np.int64)
+    rejected_links = 0
+    for (source_names, target_names, weights) in iter_chunks(edges_path, 3, header, chunk_size):
+        try:
+            sources = np.fromiter(map(index.__getitem__, source_names), dtype=np.int32, count=len(source_names))
+            targets = np.fromiter(map(index.__getitem__, target_names), dtype=np.int32, count=len(target_names))
+        except KeyError as error:
+            raise ValueError(f'{edges_path}: node {error.args[0]!r} is not in {nodes_path}.') from None
+        source_types = type_ids[sources]
+        valid = (source_types >= 0) & (np.abs(type_ids[targets] - source_types) == 1)
+        rejected_links += int(len(valid) - valid.sum())
+        chunks.append((sources[valid], targets[valid], as_weights(weights)[valid]))
+        counts += np.bincount(sources[valid], minlength=num_nodes)
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    # scatter the chunks into place, in file order
+    indices = np.empty(indptr[-1], dtype=np.int32)
+    link_weight = np.empty(indptr[-1], dtype=np.float64)
+    next_free = indptr[:-1].copy()
+    chunks.reverse()
+    while chunks:
+        (sources, targets, weights) = chunks.pop()
+        if not len(sources):
+            continue
+        order = np.argsort(sources, kind='stable')
+        sources = sources[order]
+        # the position of each link among the links of its source node in this chunk
+        starts = np.flatnonzero(np.r_[True, sources[1:] != sources[:-1]])
+        run_lengths = np.diff(np.r_[starts, len(sources)])
+        run_offsets = np.arange(len(sources)) - np.repeat(starts, run_lengths)
+        positions = next_free[sources] + run_offsets
+        indices[positions] = targets[order]
+        link_weight[positions] = weights[order]
+        next_free[sources[starts]] += run_lengths
+    return CompiledGraph(list(index), schema, type_ids, node_weight, indptr, indices, link_weight, rejected_links=rejected_links)
@@ -0,0 +1,48 @@
+import gzip
+
+import numpy as np
+import pytest
+
+from spreading_activation.compiled_graph import compile_graph
+from spreading_activation.compiled_graph_test import make_outward_graph
+from spreading_activation.generators import GRAPHS
+from spreading_activation.loader import load_edge_lists
+
+
+def write_rows(path, header, rows, delimiter=','):
+    opener = gzip.open if str(path).endswith('.gz') else open
+    with opener(path, 'wt') as f:
+        for row in [header] + rows:
+            f.write(delimiter.join(str(value) for value in row) + '\n')
+
+
+def test_load_outward(tmp_path):
+    (g, schema) = make_outward_graph()
+    # this link skips a type in the schema, so it should be dropped
+    g.add_edge('a', 'c', weight=1)
+    write_rows(tmp_path / 'nodes.tsv', ['name', 'type', 'weight'], [[name, node['type'], node['weight']] for (name, node) in g.nodes.items()], '\t')
+    write_rows(tmp_path / 'edges.tsv.gz', ['source', 'target', 'weight'], [[source, target, link['weight']] for (source, target, link) in g.edges(data=True)], '\t')
+    cg = load_edge_lists(tmp_path / 'nodes.tsv', tmp_path / 'edges.tsv.gz', schema, chunk_size=2)
+    expected = compile_graph(g, schema)
+    assert (cg.names, cg.rejected_links) == (expected.names, expected.rejected_links)
+    for (name, array) in expected.arrays().items():
+        assert np.array_equal(cg.arrays()[name], array)
+    write_rows(tmp_path / 'edges.csv', ['source', 'target', 'weight'], [['c', 'f', 1]])
+    write_rows(tmp_path / 'nodes.csv', ['name', 'type', 'weight'], [['c', 'c', 0]])
+    with pytest.raises(ValueError):
+        load_edge_lists(tmp_path / 'nodes.csv', tmp_path / 'edges.csv', schema)
+
+
+def test_load_matches_generated_graph(tmp_path):
+    generated = GRAPHS['layered'](5000, 'uniform:0.5:3', 1)
+    write_rows(tmp_path / 'nodes.csv', ['name', 'type', 'weight'], [[f'n{i}', generated.schema[type_id], weight] for (i, (type_id, weight)) in enumerate(zip(generated.type_ids.tolist(), generated.node_weight.tolist()))])
+    # list the links in a shuffled order, keeping the order of each node's links
+    (link_ids, owners) = generated.links_of(np.arange(generated.num_nodes))
+    order = np.lexsort((link_ids, np.random.default_rng(0).permutation(generated.num_nodes)[owners]))
+    (sources, targets, weights) = (owners[order].tolist(), generated.indices[link_ids[order]].tolist(), generated.link_weight[link_ids[order]].tolist())
+    rows = [[f'n{source}', f'n{target}', repr(weight)] for (source, target, weight) in zip(sources, targets, weights)]
+    write_rows(tmp_path / 'edges.csv', ['source', 'target', 'weight'], rows)
+    cg = load_edge_lists(tmp_path / 'nodes.csv', tmp_path / 'edges.csv', generated.schema, chunk_size=1000)
+    assert cg.names[:2] == ['n0', 'n1']
+    for (name, array) in generated.arrays().items():
+        assert np.array_equal(cg.arrays()[name], array)
@@ -0,0 +1,267 @@
+# Here we house the LOCKSTEP spreading activation algorithm, running on a CompiledGraph.
+#
+# It follows the same step-by-step schedule as the family-by-family algo, but a node activated several times in the
+# same step is merged into one activation (the strongest one wins, as in the one-by-one TimeQueue), so every node
+# appears at most once per family and is expanded at most once per step. On dense graphs, where many parents
+# reach the same child in the same step, this is much less work than expanding every repeated activation.
+#
+# The time queue is a fixed-size circular buffer with one slot per step up to the longest link transfer time.
+# Slot (t mod size) holds the family that will activate at step t, already merged, so the queue holds at most
+# size × (number of distinct nodes) activations however many times they are reached.
+#
+# algo is the scalar version on plain lists, where each slot is a dict of node_id -> strength. batched_algo handles
+# each family as NumPy arrays, where each slot is a pair of (node_ids, output_activation_strengths) sorted by node id.
+# Both produce the same activation history: families ordered by node id. It is the single-query case of
+# multi_query.multi_algo, and the family-by-family history with repeated activations collapsed to the strongest one.
+#
+# With refractory=period (see refractory.py) a node that fired does not fire again within period steps.
+
+
+# imports
+import numpy as np
+
+from .family_by_family import ACTIVATION_DECAY, THRESHOLD
+from .multi_query import merge_rows
+from .refractory import Refractory
+from .streaming import StopConditions
+
+
+class TimeQueue:
+    """ A circular buffer of families. A family is a dict of node_id -> output_activation_strength. """
+
+    def __init__(self, size):
+        self.families = [{} for _ in range(size)]
+        # the slot of the next family to pop
+        self.position = 0
+        # the number of nonempty families
+        self.pending = 0
+
+    def __bool__(self):
+        return self.pending > 0
+
+    def add_node(self, i, output_activation_strength, node_id):
+        """ Add a node to the family activating i steps after the next family to pop. A node already in that family keeps its strongest activation. """
+        family = self.families[(self.position + i) % len(self.families)]
+        if not family:
+            self.pending += 1
+        if node_id not in family or output_activation_strength > family[node_id]:
+            family[node_id] = output_activation_strength
+
+    def pop_family(self):
+        """ Get the next family to be activated, as a list of (output_activation_strength, node_id) ordered by node id. """
+        family = self.families[self.position]
+        if family:
+            self.pending -= 1
+            self.families[self.position] = {}
+        self.position = (self.position + 1) % len(self.families)
+        return [(family[node_id], node_id) for node_id in sorted(family)]
+
+    def as_ordered_list(self):
+        """ The queued nodes as a list of (steps_until_activation, output_activation_strength, node_id). NOTE that this walks the entire queue. """
+        size = len(self.families)
+        return [(steps, strength, node_id) for steps in range(1, size + 1) for (node_id, strength) in sorted(self.families[(self.position + steps - 1) % size].items())]
+
+    def size(self):
+        """ The number of queued nodes (not families). """
+        return sum(len(family) for family in self.families)
+
+
+def get_ring_size(cgraph):
+    """ The number of slots of the circular buffer: the longest transfer time, in steps. """
+    return max(int(cgraph.transfer_steps.max(initial=1)), 1)
+
+
+def algo(cgraph, start_state, activation_decay=ACTIVATION_DECAY, threshold=THRESHOLD, tracer=None, refractory=None, **stop_conditions):
+    """ The LOCKSTEP spreading activation algorithm on a CompiledGraph.
+    start_state is a list of (node, input_activation_strength) where node is a node name or NetworkX attribute dict.
+    Returns the activation history as a list of (time, [(output_activation_strength, node_name), ...]) where each node appears at most once per family, ordered by node id.
+    tracer is an optional Tracer (see tracing.py) and stop_conditions are the keyword arguments of streaming.StopConditions.
+    refractory is None or the refractory period in steps (math.inf to activate every node at most once).
+    """
+    return list(iter_families(cgraph, start_state, activation_decay, threshold, tracer, refractory, **stop_conditions))
+
+
+def iter_families(cgraph, start_state, activation_decay=ACTIVATION_DECAY, threshold=THRESHOLD, tracer=None, refractory=None, **stop_conditions):
+    """ algo() as a generator, yielding each (time, [(output_activation_strength, node_name), ...]) as soon as it is popped. """
+    stop = StopConditions(**stop_conditions)
+    arrays = cgraph.as_lists()
+    indptr = arrays['indptr']
+    indices = arrays['indices']
+    node_strength = arrays['node_strength']
+    link_strength = arrays['link_strength']
+    transfer_steps = arrays['transfer_steps']
+    names = cgraph.names
+    resting = None if refractory is None else Refractory(cgraph.num_nodes, refractory)
+    tq = TimeQueue(get_ring_size(cgraph))
+    # Put the starting nodes in the time queue. They will be the first to activate.
+    for (start_node, start_input_activation_strength) in start_state:
+        if start_input_activation_strength > threshold:
+            start_id = cgraph.node_id(start_node)
+            tq.add_node(0, start_input_activation_strength * node_strength[start_id], start_id)
+        elif tracer is not None:
+            tracer.prune()
+    if tracer is not None:
+        tracer.queue_size(tq.size())
+    current_time = 0
+    try:
+        while tq:
+            if tracer is not None:
+                tracer.phase('pop')
+            family = tq.pop_family()
+            if tracer is not None:
+                tracer.pop_family(current_time, len(family), lambda: [(steps, strength, names[node_id]) for (steps, strength, node_id) in tq.as_ordered_list()])
+            if resting is not None:
+                # the nodes may have fired since these activations were queued
+                awake = [(strength, node_id) for (strength, node_id) in family if not resting.resting(node_id, current_time)]
+                if tracer is not None:
+                    tracer.prune(len(family) - len(awake))
+                family = awake
+                for (_, node_id) in family:
+                    resting.fire(node_id, current_time)
+            if stop.stopped(current_time):
+                break
+            count = stop.take([node_id for (_, node_id) in family])
+            family = family[:count]
+            yield (current_time, [(strength, names[node_id]) for (strength, node_id) in family])
+            if stop.done:
+                break
+            if tracer is not None:
+                tracer.phase('expand')
+            current_time += 1
+            for (current_node_activation_strength, current_node_id) in family:
+                if tracer is not None:
+                    tracer.scan(indptr[current_node_id + 1] - indptr[current_node_id])
+                # the links of a compiled graph are already filtered by the schema
+                for link_id in range(indptr[current_node_id], indptr[current_node_id + 1]):
+                    steps_until_activation = transfer_steps[link_id]
+                    if steps_until_activation <= 0:
+                        raise ValueError('Link weight must be positive in stepwise algo (use a positive weight).')
+                    input_activation_strength = current_node_activation_strength * link_strength[link_id] * activation_decay
+                    if input_activation_strength > threshold:
+                        child_id = indices[link_id]
+                        # (current_time was already moved on to the next step)
+                        if resting is None or not resting.resting(child_id, current_time - 1 + steps_until_activation):
+                            # the family just popped is gone, so the family activating in s steps is s - 1 ahead
+                            tq.add_node(steps_until_activation - 1, input_activation_strength * node_strength[child_id], child_id)
+                        elif tracer is not None:
+                            tracer.prune()
+                    elif tracer is not None:
+                        tracer.prune()
+            if tracer is not None:
+                tracer.queue_size(tq.size())
+    finally:
+        if tracer is not None:
+            tracer.finish()
+
+
+def batched_algo(cgraph, start_state, activation_decay=ACTIVATION_DECAY, threshold=THRESHOLD, tracer=None, refractory=None, **stop_conditions):
+    """ The LOCKSTEP spreading activation algorithm, processing each family as NumPy arrays.
+    Same inputs and output as algo().
+    """
+    names = cgraph.names
+    start_ids = [cgraph.node_id(node) for (node, _) in start_state]
+    start_strengths = [strength for (_, strength) in start_state]
+    activation_history = []
+    for (current_time, family_ids, family_strengths) in batched_families(cgraph, start_ids, start_strengths, activation_decay, threshold, tracer, refractory, **stop_conditions):
+        activation_history.append((current_time, list(zip(family_strengths.tolist(), [names[node_id] for node_id in family_ids.tolist()]))))
+    return activation_history
+
+
+def batched_families(cgraph, start_ids, start_strengths, activation_decay=ACTIVATION_DECAY, threshold=THRESHOLD, tracer=None, refractory=None, **stop_conditions):
+    """ The loop of batched_algo, working only with node ids. Yields (time, node_ids, output_activation_strengths) for every family, as arrays sorted by node id. """
+    stop = StopConditions(**stop_conditions)
+    resting = None if refractory is None else Refractory(cgraph.num_nodes, refractory)
+    # Slot (t mod ring_size) holds the merged (node_ids, output_activation_strengths) activating at step t, or None.
+    ring_size = get_ring_size(cgraph)
+    ring = [None] * ring_size
+    pending_slots = 0
+
+    def add_nodes(slot, node_ids, strengths):
+        nonlocal pending_slots
+        if ring[slot] is None:
+            pending_slots += 1
+        else:
+            node_ids = np.concatenate([ring[slot][0], node_ids])
+            strengths = np.concatenate([ring[slot][1], strengths])
+        ring[slot] = merge_rows(node_ids, strengths)
+
+    # Put the starting nodes in the ring buffer. They will be the first to activate.
+    start_ids = np.asarray(start_ids, dtype=np.int64)
+    start_strengths = np.asarray(start_strengths, dtype=np.float64)
+    will_activate = start_strengths > threshold
+    if will_activate.any():
+        start_ids = start_ids[will_activate]
+        add_nodes(0, start_ids, start_strengths[will_activate] * cgraph.node_strength[start_ids])
+    if tracer is not None:
+        tracer.prune(int((~will_activate).sum()))
+        tracer.queue_size(sum(len(merged[0]) for merged in ring if merged is not None))
+    current_time = 0
+    try:
+        while pending_slots:
+            if tracer is not None:
+                tracer.phase('pop')
+            slot = current_time % ring_size
+            if ring[slot] is not None:
+                pending_slots -= 1
+                (family_ids, family_strengths) = ring[slot]
+                ring[slot] = None
+            else:
+                family_ids = np.empty(0, dtype=np.int64)
+                family_strengths = np.empty(0, dtype=np.float64)
+            if tracer is not None:
+                tracer.pop_family(current_time, len(family_ids), lambda: [(steps, float(strength), cgraph.names[node_id]) for steps in range(1, ring_size + 1) if ring[(current_time + steps) % ring_size] is not None for (node_id, strength) in zip(*(array.tolist() for array in ring[(current_time + steps) % ring_size]))])
+            if resting is not None:
+                # the nodes may have fired since these activations were queued
+                awake = ~resting.resting_all(family_ids, current_time)
+                if tracer is not None:
+                    tracer.prune(len(family_ids) - int(awake.sum()))
+                family_ids = family_ids[awake]
+                family_strengths = family_strengths[awake]
+                resting.fire_all(family_ids, current_time)
+            if stop.stopped(current_time):
+                break
+            count = stop.take(family_ids)
+            family_ids = family_ids[:count]
+            family_strengths = family_strengths[:count]
+            yield (current_time, family_ids, family_strengths)
+            if stop.done:
+                break
+            if tracer is not None:
+                tracer.phase('expand')
+            (steps_until_activation, child_ids, output_activation_strengths) = expand_family(cgraph, current_time, family_ids, family_strengths, activation_decay, threshold, tracer, resting)
+            # merge the activations into the ring buffer, one slot per distinct transfer time
+            for steps in np.unique(steps_until_activation).tolist():
+                arriving = steps_until_activation == steps
+                add_nodes((current_time + steps) % ring_size, child_ids[arriving], output_activation_strengths[arriving])
+            if tracer is not None:
+                tracer.queue_size(sum(len(merged[0]) for merged in ring if merged is not None))
+            current_time += 1
+    finally:
+        if tracer is not None:
+            tracer.finish()
+
+
+def expand_family(cgraph, current_time, family_ids, family_strengths, activation_decay, threshold, tracer=None, resting=None):
+    """ Spread the activation of a family along every outgoing link at once. Returns (steps_until_activation, child_ids, output_activation_strengths) of the activations that pass THRESHOLD (and the refractory state, if any). """
+    # gather every outgoing link of the family at once (links are already filtered by the schema)
+    (link_ids, owners) = cgraph.links_of(family_ids)
+    steps_until_activation = cgraph.transfer_steps[link_ids]
+    if (steps_until_activation <= 0).any():
+        raise ValueError('Link weight must be positive in stepwise algo (use a positive weight).')
+    input_activation_strengths = family_strengths[owners] * cgraph.link_strength[link_ids] * activation_decay
+    will_activate = input_activation_strengths > threshold
+    if tracer is not None:
+        tracer.scan(len(link_ids))
+        tracer.prune(len(link_ids) - int(will_activate.sum()))
+    link_ids = link_ids[will_activate]
+    steps_until_activation = steps_until_activation[will_activate]
+    child_ids = cgraph.indices[link_ids].astype(np.int64)
+    output_activation_strengths = input_activation_strengths[will_activate] * cgraph.node_strength[child_ids]
+    if resting is not None:
+        awake = ~resting.resting_all(child_ids, current_time + steps_until_activation)
+        if tracer is not None:
+            tracer.prune(len(child_ids) - int(awake.sum()))
+        steps_until_activation = steps_until_activation[awake]
+        child_ids = child_ids[awake]
+        output_activation_strengths = output_activation_strengths[awake]
+    return (steps_until_activation, child_ids, output_activation_strengths)
@@ -0,0 +1,47 @@
+import pytest
+
+from spreading_activation.compiled_graph import compile_graph
+from spreading_activation.compiled_graph_test import make_graph, make_outward_graph
+from spreading_activation.multi_query import multi_algo
+from spreading_activation.multi_query_test import make_random_graph, strongest_per_family
+from spreading_activation import family_by_family, lockstep
+
+
+def test_lockstep_outward():
+    (g, schema) = make_outward_graph()
+    cg = compile_graph(g, schema)
+    for run in (lockstep.algo, lockstep.batched_algo):
+        assert run(cg, [('c', 1)]) == family_by_family.algo(cg, [('c', 1)])
+        assert run(cg, [('c', 1)], max_events=2) == [(0, [(1.0, 'c')]), (1, [(0.4, 'b')])]
+
+
+def test_lockstep_merges_repeated_activations():
+    # b is reached from both a and c at step 1, and again from c at step 2 (a gap of one step for d)
+    schema = ['a', 'b', 'c', 'd']
+    edges = [('a', 'b', {'weight': 1}), ('c', 'b', {'weight': 2}), ('c', 'd', {'weight': 3})]
+    g = make_graph(schema, edges)
+    g.add_edge('a2', 'b', weight=1)
+    g.nodes['a2'].update(name='a2', weight=0, type='a')
+    cg = compile_graph(g, schema)
+    start_state = [('a', 1), ('a2', 0.5), ('c', 1)]
+    expected = [(0, [(1.0, 'a'), (1.0, 'c'), (0.5, 'a2')]), (1, [(0.4, 'b')]), (2, [(0.2, 'b')]), (3, [(0.1, 'd')])]
+    assert lockstep.algo(cg, start_state) == lockstep.batched_algo(cg, start_state) == expected
+    assert lockstep.algo(cg, start_state) == strongest_per_family(cg, family_by_family.algo(cg, start_state))
+
+
+def test_lockstep_matches_multi_algo():
+    (g, schema) = make_random_graph(60, 600, seed=1)
+    cg = compile_graph(g, schema)
+    for i in range(0, 20, 2):
+        start_state = [(i, 3.0), (i + 1, 0.5)]
+        history = lockstep.algo(cg, start_state)
+        assert history == lockstep.batched_algo(cg, start_state) == multi_algo(cg, [start_state])[0]
+        assert history == strongest_per_family(cg, family_by_family.algo(cg, start_state))
+
+
+def test_lockstep_rejects_zero_weight():
+    g = make_graph(['b', 'c'], [('b', 'c', {'weight': 0})])
+    cg = compile_graph(g, ['b', 'c'])
+    for run in (lockstep.algo, lockstep.batched_algo):
+        with pytest.raises(ValueError):
+            run(cg, [('b', 1)])
@@ -0,0 +1,107 @@
+# Here we run many STEPWISE FAMILY queries (start states) over the same CompiledGraph in one pass.
+#
+# Each query is one column of a dense block, and each row is a node that is active in at least one of the queries.
+# A step of the family-by-family schedule is then one sparse matrix × dense block product: the links of the active
+# nodes are gathered once for all the queries, and every column is multiplied by the link strengths together.
+# THRESHOLD is applied to each column separately, so each query is pruned exactly as it would be on its own.
+#
+# The product uses the (max, ×) semiring rather than (+, ×): a node reached several times in the same step keeps its
+# strongest activation, as in the one-by-one TimeQueue. Summing would let the total strength grow step after step on
+# dense cyclic graphs. With the max, each query's history is the single-query family-by-family history with the
+# repeated activations of a node in a family collapsed to the strongest one.
+
+
+# imports
+import numpy as np
+
+from .family_by_family import ACTIVATION_DECAY, THRESHOLD
+
+
+def merge_rows(node_ids, block):
+    """ Collapse repeated node ids, keeping the column-wise maximum of their rows. Returns (node_ids, block) sorted by node id. """
+    order = np.argsort(node_ids, kind='stable')
+    node_ids = node_ids[order]
+    block = block[order]
+    starts = np.flatnonzero(np.r_[True, node_ids[1:] != node_ids[:-1]])
+    return (node_ids[starts], np.maximum.reduceat(block, starts, axis=0))
+
+
+def multi_algo(cgraph, start_states, activation_decay=ACTIVATION_DECAY, threshold=THRESHOLD, block_size=64):
+    """ The STEPWISE FAMILY spreading activation algorithm for many start states at once.
+    start_states is a list of start states, each a list of (node, input_activation_strength) as for family_by_family.algo().
+    block_size is the number of queries propagated together (memory per step is about links touched × block_size floats).
+    Returns one activation history per start state, as a list of (time, [(output_activation_strength, node_name), ...])
+    where each node appears at most once per family (with its strongest activation), ordered by node id.
+    """
+    histories = []
+    for first in range(0, len(start_states), block_size):
+        histories.extend(run_block(cgraph, start_states[first:first + block_size], activation_decay, threshold))
+    return histories
+
+
+def run_block(cgraph, start_states, activation_decay, threshold):
+    """ Propagate one block of queries together. See multi_algo. """
+    query_count = len(start_states)
+    names = cgraph.names
+    histories = [[] for _ in range(query_count)]
+    # The ring buffer has one slot per step up to the longest transfer time. A slot holds the chunks of
+    # (node_ids, block) that will activate at that step, where block[i, q] is the strength of node_ids[i] in query q.
+    ring_size = max(int(cgraph.transfer_steps.max(initial=1)), 1)
+    ring = [[] for _ in range(ring_size)]
+    pending_slots = 0
+    # Put the starting nodes in the ring buffer. They will be the first to activate.
+    start_ids = []
+    start_queries = []
+    start_strengths = []
+    for (query, start_state) in enumerate(start_states):
+        for (start_node, start_input_activation_strength) in start_state:
+            if start_input_activation_strength > threshold:
+                start_id = cgraph.node_id(start_node)
+                start_ids.append(start_id)
+                start_queries.append(query)
+                start_strengths.append(start_input_activation_strength * cgraph.node_strength[start_id])
+    if start_ids:
+        block = np.zeros((len(start_ids), query_count))
+        block[np.arange(len(start_ids)), start_queries] = start_strengths
+        ring[0].append(merge_rows(np.array(start_ids, dtype=np.int64), block))
+        pending_slots += 1
+    current_time = 0
+    while pending_slots:
+        slot = current_time % ring_size
+        chunks = ring[slot]
+        ring[slot] = []
+        if not chunks:
+            current_time += 1
+            continue
+        pending_slots -= 1
+        (family_ids, family_block) = merge_rows(np.concatenate([ids for (ids, _) in chunks]), np.concatenate([block for (_, block) in chunks]))
+        # write each query's family, padding its history with empty families for the steps where nothing happened
+        (queries, rows) = np.nonzero(family_block.T)
+        for query in np.unique(queries).tolist():
+            in_query = queries == query
+            family = list(zip(family_block[rows[in_query], query].tolist(), [names[node_id] for node_id in family_ids[rows[in_query]].tolist()]))
+            history = histories[query]
+            history.extend((t, []) for t in range(len(history), current_time))
+            history.append((current_time, family))
+        # the sparse × dense product: gather the family's links once and multiply them into every query column
+        (link_ids, owners) = cgraph.links_of(family_ids)
+        steps_until_activation = cgraph.transfer_steps[link_ids]
+        if (steps_until_activation <= 0).any():
+            raise ValueError('Link weight must be positive in stepwise algo (use a positive weight).')
+        input_block = family_block[owners] * cgraph.link_strength[link_ids][:, None] * activation_decay
+        # THRESHOLD per column (inactive entries are 0 and are dropped here as well)
+        input_block[input_block <= threshold] = 0
+        reaching = input_block.any(axis=1)
+        link_ids = link_ids[reaching]
+        steps_until_activation = steps_until_activation[reaching]
+        child_ids = cgraph.indices[link_ids].astype(np.int64)
+        output_block = input_block[reaching] * cgraph.node_strength[child_ids][:, None]
+        # scatter the rows into the ring buffer, one chunk per distinct transfer time
+        for steps in np.unique(steps_until_activation).tolist():
+            arriving = steps_until_activation == steps
+            target = ring[(current_time + steps) % ring_size]
+            if not target:
+                pending_slots += 1
+            target.append((child_ids[arriving], output_block[arriving]))
+        current_time += 1
+    return histories
@@ -0,0 +1,51 @@
+import random
+
+import networkx as nx
+
+from spreading_activation.compiled_graph import compile_graph
+from spreading_activation.compiled_graph_test import make_outward_graph
+from spreading_activation import family_by_family
+from spreading_activation.multi_query import multi_algo
+
+
+def strongest_per_family(cgraph, history):
+    """ Collapse repeated nodes in each family of a family_by_family history to their strongest activation, ordered by node id. """
+    collapsed = []
+    for (t, family) in history:
+        strongest = {}
+        for (strength, name) in family:
+            strongest[name] = max(strength, strongest.get(name, 0))
+        collapsed.append((t, [(strongest[name], name) for name in sorted(strongest, key=cgraph.node_id)]))
+    return collapsed
+
+
+def make_random_graph(node_count, link_count, seed):
+    rng = random.Random(seed)
+    schema = ['a', 'b']
+    g = nx.DiGraph()
+    for i in range(node_count):
+        g.add_node(i, name=i, weight=rng.choice([0, 0.1, 0.5]), type=schema[i % 2])
+    for _ in range(link_count):
+        g.add_edge(rng.randrange(node_count), rng.randrange(node_count), weight=rng.choice([0.3, 1, 1.5, 2]))
+    return (g, schema)
+
+
+def test_multi_algo_outward():
+    (g, schema) = make_outward_graph()
+    cg = compile_graph(g, schema)
+    (from_c, from_d, nothing) = multi_algo(cg, [[('c', 1)], [('d', 1)], [('a', 0.01)]])
+    assert from_c == strongest_per_family(cg, family_by_family.algo(cg, [('c', 1)]))
+    assert from_d == [(0, [(1.0, 'd')]), (1, []), (2, [(0.2, 'e')])]
+    assert nothing == []
+
+
+def test_multi_algo_matches_single_queries():
+    # dense enough that nodes are often reached several times in the same step
+    (g, schema) = make_random_graph(60, 600, seed=1)
+    cg = compile_graph(g, schema)
+    start_states = [[(i, 3.0), (i + 1, 0.5)] for i in range(0, 20, 2)]
+    # block_size=3 also checks that a partial last block works
+    histories = multi_algo(cg, start_states, block_size=3)
+    assert len(histories) == len(start_states)
+    for (start_state, history) in zip(start_states, histories):
+        assert history == strongest_per_family(cg, family_by_family.algo(cg, start_state))
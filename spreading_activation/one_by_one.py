@@ -0,0 +1,183 @@
+# Here we house the ONE-BY-ONE spreading activation algorithm, running on a CompiledGraph.
+#
+# It is the same algorithm as one_by_one/one_by_one.py, but it only works with integer node ids and the
+# precomputed arrays of the compiled graph. Node names are looked up only when writing the activation history.
+# Like the NetworkX version, a node activated again at a time it is already queued for is merged into the pending
+# entry (the stronger activation wins), so both produce the same activation history.
+#
+# iter_activations is the streaming version: a generator that hands out each activation as soon as it is popped
+# and takes the stop conditions of streaming.py. columnar_algo collects it into an ActivationHistory (see history.py)
+# instead of a list of tuples.
+#
+# With refractory=period (see refractory.py) a node that fired does not fire again within period time units.
+#
+# top_k returns only the k most strongly activated nodes, pruning what can't reach them (see top_k.py).
+
+
+# imports
+import time
+import heapq
+from itertools import count
+
+from .history import ActivationHistory, collect_activations
+from .refractory import Refractory
+from .streaming import StopConditions
+from .top_k import TopK
+
+
+# define constants
+ACTIVATION_DECAY = 0.8
+THRESHOLD = 0.05
+
+
+def algo(cgraph, start_state, activation_decay=ACTIVATION_DECAY, threshold=THRESHOLD, tracer=None, refractory=None, **stop_conditions):
+    """ The ONE-BY-ONE spreading activation algorithm on a CompiledGraph.
+    start_state is a list of (node, input_activation_strength) where node is a node name or NetworkX attribute dict.
+    Returns {'elapsed_time': ..., 'activation_history': [(activation_time, output_activation_strength, node_name), ...]}.
+    tracer is an optional Tracer (see tracing.py). The schema was applied when compiling, so it never sees rejected links.
+    refractory is None or the refractory period (math.inf to activate every node at most once).
+    stop_conditions are the keyword arguments of streaming.StopConditions.
+    """
+    start_time = time.time()
+    activation_history = list(iter_activations(cgraph, start_state, activation_decay, threshold, tracer, refractory, **stop_conditions))
+    end_time = time.time()
+    elapsed_time = end_time - start_time
+    return {'elapsed_time': elapsed_time, 'activation_history': activation_history}
+
+
+def columnar_algo(cgraph, start_state, activation_decay=ACTIVATION_DECAY, threshold=THRESHOLD, tracer=None, refractory=None, **stop_conditions):
+    """ algo(), returning the activation history as an ActivationHistory. Its as_activations() is the activation history of algo(). """
+    activations = iter_activation_ids(cgraph, start_state, activation_decay, threshold, tracer, refractory, **stop_conditions)
+    return ActivationHistory(*collect_activations(activations), cgraph.names)
+
+
+def iter_activations(cgraph, start_state, activation_decay=ACTIVATION_DECAY, threshold=THRESHOLD, tracer=None, refractory=None, **stop_conditions):
+    """ algo() as a generator, yielding each (activation_time, output_activation_strength, node_name) as soon as it is popped. """
+    names = cgraph.names
+    for (current_time, strength, node_id) in iter_activation_ids(cgraph, start_state, activation_decay, threshold, tracer, refractory, **stop_conditions):
+        yield (current_time, strength, names[node_id])
+
+
+def iter_activation_ids(cgraph, start_state, activation_decay=ACTIVATION_DECAY, threshold=THRESHOLD, tracer=None, refractory=None, **stop_conditions):
+    """ The loop of iter_activations, yielding node ids instead of node names. """
+    stop = StopConditions(**stop_conditions)
+    arrays = cgraph.as_lists()
+    indptr = arrays['indptr']
+    indices = arrays['indices']
+    node_strength = arrays['node_strength']
+    link_strength = arrays['link_strength']
+    transfer_time = arrays['transfer_time']
+    names = cgraph.names
+    resting = None if refractory is None else Refractory(cgraph.num_nodes, refractory)
+    # The time queue is a heap of (activation_time, insertion_number, node_id) plus the strength of each pending
+    # (activation_time, node_id). The same indexed heap as one_by_one/one_by_one.py, inlined.
+    tq = []
+    pending = {}
+    counter = count()
+
+    def add_node(activation_time, output_activation_strength, node_id):
+        key = (activation_time, node_id)
+        if key in pending:
+            if output_activation_strength > pending[key]:
+                pending[key] = output_activation_strength
+            return
+        pending[key] = output_activation_strength
+        heapq.heappush(tq, (activation_time, next(counter), node_id))
+
+    for (start_node, start_input_activation_strength) in start_state:
+        if start_input_activation_strength > threshold:
+            start_id = cgraph.node_id(start_node)
+            add_node(0, start_input_activation_strength * node_strength[start_id], start_id)
+        elif tracer is not None:
+            tracer.prune()
+    if tracer is not None:
+        tracer.queue_size(len(tq))
+    try:
+        while tq:
+            if tracer is not None:
+                tracer.phase('pop')
+            (current_time, _, current_node_id) = heapq.heappop(tq)
+            current_node_activation_strength = pending.pop((current_time, current_node_id))
+            if tracer is not None:
+                tracer.pop_event(current_time, lambda: [(t, pending[(t, node_id)], names[node_id]) for (t, _, node_id) in sorted(tq)])
+            if resting is not None:
+                # the node may have fired since this activation was queued
+                if resting.resting(current_node_id, current_time):
+                    if tracer is not None:
+                        tracer.prune()
+                    continue
+                resting.fire(current_node_id, current_time)
+            if stop.stopped(current_time) or not stop.take([current_node_id]):
+                break
+            yield (current_time, current_node_activation_strength, current_node_id)
+            if stop.done:
+                break
+            if tracer is not None:
+                tracer.phase('expand')
+                tracer.scan(indptr[current_node_id + 1] - indptr[current_node_id])
+            # the links of a compiled graph are already filtered by the schema
+            for link_id in range(indptr[current_node_id], indptr[current_node_id + 1]):
+                input_activation_strength = current_node_activation_strength * link_strength[link_id] * activation_decay
+                if input_activation_strength > threshold:
+                    child_id = indices[link_id]
+                    activation_time = current_time + transfer_time[link_id]
+                    if resting is None or not resting.resting(child_id, activation_time):
+                        add_node(activation_time, input_activation_strength * node_strength[child_id], child_id)
+                    elif tracer is not None:
+                        tracer.prune()
+                elif tracer is not None:
+                    tracer.prune()
+            if tracer is not None:
+                tracer.queue_size(len(tq))
+    finally:
+        if tracer is not None:
+            tracer.finish()
+
+
+def top_k(cgraph, start_state, k, activation_decay=ACTIVATION_DECAY, threshold=THRESHOLD):
+    """ The k most strongly activated nodes, as a list of (output_activation_strength, node_name), strongest first. A node's strength is its strongest activation. Ties for the k-th place are broken arbitrarily.
+    Activations that can't reach the top k are not queued or not expanded (see top_k.py), so this ends much earlier than algo().
+    """
+    arrays = cgraph.as_lists()
+    indptr = arrays['indptr']
+    indices = arrays['indices']
+    node_strength = arrays['node_strength']
+    link_strength = arrays['link_strength']
+    transfer_time = arrays['transfer_time']
+    best = TopK(k)
+    # the same indexed heap as algo()
+    tq = []
+    pending = {}
+    counter = count()
+
+    def add_node(activation_time, output_activation_strength, node_id):
+        best.add(output_activation_strength, node_id)
+        key = (activation_time, node_id)
+        if key in pending:
+            if output_activation_strength > pending[key]:
+                pending[key] = output_activation_strength
+            return
+        pending[key] = output_activation_strength
+        heapq.heappush(tq, (activation_time, next(counter), node_id))
+
+    for (start_node, start_input_activation_strength) in start_state:
+        if start_input_activation_strength > threshold:
+            start_id = cgraph.node_id(start_node)
+            output_activation_strength = start_input_activation_strength * node_strength[start_id]
+            if output_activation_strength > best.bound():
+                add_node(0, output_activation_strength, start_id)
+    while tq:
+        (current_time, _, current_node_id) = heapq.heappop(tq)
+        current_node_activation_strength = pending.pop((current_time, current_node_id))
+        # nothing this node reaches can beat the k-th best
+        if current_node_activation_strength * activation_decay <= best.bound():
+            continue
+        for link_id in range(indptr[current_node_id], indptr[current_node_id + 1]):
+            input_activation_strength = current_node_activation_strength * link_strength[link_id] * activation_decay
+            if input_activation_strength > threshold:
+                child_id = indices[link_id]
+                output_activation_strength = input_activation_strength * node_strength[child_id]
+                if output_activation_strength > best.bound():
+                    add_node(current_time + transfer_time[link_id], output_activation_strength, child_id)
+    names = cgraph.names
+    return [(strength, names[node_id]) for (strength, node_id) in best.as_list()]
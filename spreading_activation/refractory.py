@@ -0,0 +1,53 @@
+# Here we remember which nodes have fired, for the refractory mode of the algos.
+#
+# Without it a node in a cycle (a -> b -> a is allowed by any schema with a next to b) is queued and expanded again
+# and again until its strength decays below THRESHOLD, and the work grows exponentially with the density of the
+# graph. In refractory mode a node that fired at time t does not fire again before t + period: activations that
+# would arrive sooner are dropped before they are even queued. With period = math.inf every node fires at most
+# once, so a run expands each node once and scans each link once, O(V + E) work.
+#
+# The state is one array over node ids: a boolean "has fired" flag when the period is infinite, otherwise the
+# time each node last fired.
+
+
+# imports
+import math
+
+import numpy as np
+
+
+class Refractory:
+    """ The refractory state of every node of a graph. """
+
+    def __init__(self, num_nodes, period):
+        if not period >= 0:
+            raise ValueError('The refractory period must be a nonnegative number (or math.inf).')
+        self.period = period
+        self.once = math.isinf(period)
+        if self.once:
+            self.fired = np.zeros(num_nodes, dtype=bool)
+        else:
+            self.last_fired = np.full(num_nodes, -np.inf)
+
+    def resting(self, node_id, activation_time):
+        """ Whether the node may not fire at activation_time. """
+        if self.once:
+            return self.fired[node_id]
+        return activation_time < self.last_fired[node_id] + self.period
+
+    def fire(self, node_id, activation_time):
+        """ Record that the node fired at activation_time. """
+        self.fire_all(node_id, activation_time)
+
+    def resting_all(self, node_ids, activation_times):
+        """ resting() for an array of node ids. activation_times is one time or an array of times. """
+        if self.once:
+            return self.fired[node_ids]
+        return activation_times < self.last_fired[node_ids] + self.period
+
+    def fire_all(self, node_ids, activation_time):
+        """ Record that the nodes (one id or an array of ids) fired at activation_time. """
+        if self.once:
+            self.fired[node_ids] = True
+        else:
+            self.last_fired[node_ids] = activation_time
@@ -0,0 +1,52 @@
+import math
+
+import pytest
+
+from spreading_activation.benchmark import as_activations, strongest_activations
+from spreading_activation.compiled_graph import compile_graph
+from spreading_activation.compiled_graph_test import make_graph
+from spreading_activation.generators import GRAPHS
+from spreading_activation.tracing import Tracer
+from spreading_activation import family_by_family, lockstep, one_by_one
+
+
+def make_cycle():
+    # b <--> c, both links of weight 1 (strength 0.5, so 0.4 per hop)
+    g = make_graph(['b', 'c'], [('b', 'c', {'weight': 1}), ('c', 'b', {'weight': 1})])
+    return compile_graph(g, ['b', 'c'])
+
+
+def test_refractory_period():
+    cg = make_cycle()
+    start_state = [('b', 100)]
+    full = lockstep.algo(cg, start_state)
+    assert [family for (_, family) in full][:3] == [[(100.0, 'b')], [(40.0, 'c')], [(16.0, 'b')]]
+    for run in (family_by_family.algo, family_by_family.batched_algo, lockstep.algo, lockstep.batched_algo):
+        # a period of 1 step only merges repeats within a step
+        assert run(cg, start_state, refractory=1) == full
+        assert run(cg, start_state, refractory=2) == full
+        # b can't fire again at step 2, so c is never reached again either
+        assert run(cg, start_state, refractory=3) == full[:2]
+        assert run(cg, start_state, refractory=math.inf) == full[:2]
+    assert one_by_one.algo(cg, start_state, refractory=3)['activation_history'] == [(0, 100.0, 'b'), (1, 40.0, 'c')]
+    with pytest.raises(ValueError):
+        lockstep.algo(cg, start_state, refractory=-1)
+
+
+def test_activate_at_most_once():
+    # dense and full of cycles: without the refractory mode this is exponential work
+    cg = GRAPHS['layered'](20000, 'integer:1:3', 3)
+    start_state = [(node_id, 1000.0) for node_id in range(0, 200, 7)]
+    expected = None
+    for run in (one_by_one.columnar_algo, family_by_family.algo, family_by_family.columnar_algo, lockstep.algo, lockstep.batched_algo):
+        tracer = Tracer()
+        activations = as_activations(cg, run(cg, start_state, tracer=tracer, refractory=math.inf))
+        node_ids = [node_id for (_, _, node_id) in activations]
+        assert len(node_ids) == len(set(node_ids))
+        # each node is expanded once, so each link is scanned at most once
+        assert tracer.edges_scanned <= cg.num_links
+        # every engine fires each node at the first step it is reached, with its strongest activation at that step
+        if expected is None:
+            expected = strongest_activations(activations)
+        assert strongest_activations(activations) == expected
+    assert family_by_family.batched_algo(cg, start_state, refractory=math.inf) == family_by_family.algo(cg, start_state, refractory=math.inf)
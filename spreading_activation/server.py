@@ -0,0 +1,161 @@
+# Here we serve queries from an asyncio event loop, gathering the ones that arrive close together into micro-batches.
+#
+# QueryServer.query() puts a request on a bounded queue and waits for its result. A single batcher task takes the
+# first waiting request, waits batch_window seconds for more to arrive, and hands up to max_batch of them to
+# multi_query.multi_algo in an executor, so the event loop never runs a propagation itself. While a batch runs new
+# requests pile up and make the next batch bigger, and multi_algo gathers the links of each step once for the
+# whole batch, so the busier the server the more each batch amortizes.
+#
+# Backpressure: when max_pending requests are queued, query() waits for room, but no longer than its deadline.
+# Every request has a deadline (timeout seconds after it is made). query() raises TimeoutError once it passes, and
+# a request whose deadline passed while it was queued is dropped before its batch runs.
+#
+# serve_tcp() and serve_unix() put a front end on a local socket. Each line in is a JSON query
+#   {"id": 7, "start_state": [["c", 1.0]], "timeout": 0.5}
+# and each line out is {"id": 7, "history": [[time, [[strength, node], ...]], ...]} or {"id": 7, "error": "..."}.
+# The queries of one connection run concurrently, so their answers come back in completion order.
+
+
+# imports
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from .family_by_family import ACTIVATION_DECAY, THRESHOLD
+from .multi_query import multi_algo
+
+
+class QueryServer:
+    """ Runs STEPWISE FAMILY queries (see multi_query.multi_algo) on one CompiledGraph for many concurrent clients.
+    Use it as an async context manager (or call start() and close()). executor defaults to a thread of its own.
+    """
+
+    def __init__(self, cgraph, activation_decay=ACTIVATION_DECAY, threshold=THRESHOLD, batch_window=0.002, max_batch=64, max_pending=1024, timeout=1.0, executor=None):
+        self.cgraph = cgraph
+        self.activation_decay = activation_decay
+        self.threshold = threshold
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.executor = executor
+        self._own_executor = executor is None
+        self._queue = None
+        self._batcher = None
+        self.batches = 0
+        self.queries = 0
+        self.expired = 0
+
+    def __repr__(self):
+        return f'QueryServer({self.queries} queries in {self.batches} batches, {self.expired} expired)'
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def start(self):
+        if self._own_executor:
+            self.executor = ThreadPoolExecutor(1)
+        self._queue = asyncio.Queue(self.max_pending)
+        self._batcher = asyncio.create_task(self.run_batches())
+
+    async def close(self):
+        """ Stop the batcher. Queries still queued or running fail with RuntimeError. """
+        if self._batcher is None:
+            return
+        self._batcher.cancel()
+        try:
+            await self._batcher
+        except asyncio.CancelledError:
+            pass
+        self._batcher = None
+        while not self._queue.empty():
+            (_, _, future) = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError('The query server was closed.'))
+        if self._own_executor:
+            self.executor.shutdown()
+
+    async def query(self, start_state, timeout=None):
+        """ Run one query and return its activation history, as multi_algo does. Raises TimeoutError when it takes more than timeout seconds (the server's timeout by default). """
+        loop = asyncio.get_running_loop()
+        timeout = self.timeout if timeout is None else timeout
+        deadline = loop.time() + timeout
+        # look the nodes up now, so that a bad query fails on its own rather than failing its whole batch
+        for (start_node, _) in start_state:
+            self.cgraph.node_id(start_node)
+        future = loop.create_future()
+        await asyncio.wait_for(self._queue.put((deadline, start_state, future)), timeout)
+        return await asyncio.wait_for(future, deadline - loop.time())
+
+    async def run_batches(self):
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            if self.batch_window > 0 and queue.qsize() < self.max_batch - 1:
+                await asyncio.sleep(self.batch_window)
+            while len(batch) < self.max_batch and not queue.empty():
+                batch.append(queue.get_nowait())
+            now = loop.time()
+            # skip the requests whose clients have stopped waiting
+            live = [(start_state, future) for (deadline, start_state, future) in batch if deadline > now and not future.done()]
+            self.expired += len(batch) - len(live)
+            if not live:
+                continue
+            try:
+                histories = await loop.run_in_executor(self.executor, multi_algo, self.cgraph, [start_state for (start_state, _) in live], self.activation_decay, self.threshold, self.max_batch)
+            except asyncio.CancelledError:
+                # the server was closed while the batch ran
+                for (_, future) in live:
+                    if not future.done():
+                        future.set_exception(RuntimeError('The query server was closed.'))
+                raise
+            except Exception as error:
+                for (_, future) in live:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            self.batches += 1
+            self.queries += len(live)
+            for ((_, future), history) in zip(live, histories):
+                if not future.done():
+                    future.set_result(history)
+
+    async def serve_tcp(self, host='127.0.0.1', port=0):
+        """ Start the JSON lines front end (see the top of this file) on a TCP port. Returns the asyncio Server (server.sockets[0].getsockname() has the port). """
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def serve_unix(self, path):
+        """ Start the JSON lines front end on a Unix socket. Returns the asyncio Server. """
+        return await asyncio.start_unix_server(self.handle_connection, path)
+
+    async def handle_connection(self, reader, writer):
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(self.answer(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+    async def answer(self, line, writer):
+        """ Answer one line of the front end. """
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            history = await self.query([tuple(pair) for pair in request['start_state']], request.get('timeout'))
+            response = {'id': request_id, 'history': history}
+        except TimeoutError:
+            response = {'id': request_id, 'error': 'TimeoutError: the deadline passed'}
+        except Exception as error:
+            response = {'id': request_id, 'error': f'{type(error).__name__}: {error}'}
+        writer.write((json.dumps(response) + '\n').encode())
+        await writer.drain()
@@ -0,0 +1,59 @@
+import asyncio
+import json
+
+import pytest
+
+from spreading_activation.compiled_graph import compile_graph
+from spreading_activation.multi_query import multi_algo
+from spreading_activation.multi_query_test import make_random_graph
+from spreading_activation.server import QueryServer
+
+
+def as_json(value):
+    return json.loads(json.dumps(value))
+
+
+def test_concurrent_queries_are_batched():
+    (g, schema) = make_random_graph(60, 600, seed=2)
+    cg = compile_graph(g, schema)
+    start_states = [[(i, 3.0), (i + 1, 0.5)] for i in range(0, 40, 2)]
+
+    async def run():
+        async with QueryServer(cg, batch_window=0.01) as server:
+            histories = await asyncio.gather(*(server.query(start_state) for start_state in start_states))
+            with pytest.raises(KeyError):
+                await server.query([('nowhere', 1.0)])
+            with pytest.raises(TimeoutError):
+                await server.query(start_states[0], timeout=0)
+        return (server, histories)
+
+    (server, histories) = asyncio.run(run())
+    assert histories == [multi_algo(cg, [start_state])[0] for start_state in start_states]
+    assert server.queries == len(start_states)
+    assert server.batches < len(start_states)
+
+
+def test_socket_front_end(tmp_path):
+    (g, schema) = make_random_graph(30, 200, seed=3)
+    cg = compile_graph(g, schema)
+
+    async def run():
+        async with QueryServer(cg) as server:
+            responses = []
+            for serve in (server.serve_tcp(), server.serve_unix(str(tmp_path / 'socket'))):
+                socket_server = await serve
+                if socket_server.sockets[0].family.name == 'AF_UNIX':
+                    (reader, writer) = await asyncio.open_unix_connection(str(tmp_path / 'socket'))
+                else:
+                    (reader, writer) = await asyncio.open_connection(*socket_server.sockets[0].getsockname()[:2])
+                writer.write(b'{"id": 1, "start_state": [[0, 2.0]]}\n{"id": 2, "start_state": [[-1, 2.0]]}\n')
+                await writer.drain()
+                responses.append(sorted([json.loads(await reader.readline()) for _ in range(2)], key=lambda response: response['id']))
+                writer.close()
+                socket_server.close()
+                await socket_server.wait_closed()
+        return responses
+
+    for (answer, error) in asyncio.run(run()):
+        assert answer == {'id': 1, 'history': as_json(multi_algo(cg, [[(0, 2.0)]])[0])}
+        assert error['id'] == 2 and error['error'].startswith('KeyError')
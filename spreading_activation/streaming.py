@@ -0,0 +1,57 @@
+# Here we implement the stop conditions shared by the streaming (generator) versions of the compiled algos.
+#
+# The generators yield activations as they are produced, so a caller can simply stop iterating once it has
+# enough. These conditions let the algo stop by itself, which also means it stops expanding nodes right away.
+
+
+# imports
+import time
+
+
+class StopConditions:
+    """ When a streaming algo should stop. None means no limit.
+    max_time: stop before the first activation after this simulated time.
+    max_events: stop once this many activations have been handed out.
+    max_nodes: stop once this many distinct nodes have been activated. This keeps a set of the activated node ids.
+    time_budget: stop before the next activation (or family) once this many seconds of wall-clock time have passed.
+    """
+
+    def __init__(self, max_time=None, max_events=None, max_nodes=None, time_budget=None):
+        self.max_time = max_time
+        self.max_events = max_events
+        self.max_nodes = max_nodes
+        self.deadline = None if time_budget is None else time.perf_counter() + time_budget
+        self.events = 0
+        self.activated_nodes = None if max_nodes is None else set()
+        # set once a limit has been reached
+        self.done = False
+
+    def stopped(self, current_time):
+        """ Whether to stop before handing out activations at current_time. """
+        if self.done:
+            return True
+        if self.max_time is not None and current_time > self.max_time:
+            self.done = True
+        elif self.deadline is not None and time.perf_counter() >= self.deadline:
+            self.done = True
+        elif self.max_events is not None and self.events >= self.max_events:
+            self.done = True
+        elif self.activated_nodes is not None and len(self.activated_nodes) >= self.max_nodes:
+            self.done = True
+        return self.done
+
+    def take(self, node_ids):
+        """ Count a batch of activations (one event or a whole family). Returns how many of them to hand out; if that is fewer than all of them, or a limit is reached, done is set. """
+        count = len(node_ids)
+        if self.max_events is not None and self.events + count >= self.max_events:
+            count = self.max_events - self.events
+            self.done = True
+        if self.activated_nodes is not None:
+            for (i, node_id) in enumerate(node_ids[:count]):
+                self.activated_nodes.add(node_id)
+                if len(self.activated_nodes) >= self.max_nodes:
+                    count = i + 1
+                    self.done = True
+                    break
+        self.events += count
+        return count
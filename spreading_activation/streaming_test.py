@@ -0,0 +1,37 @@
+from spreading_activation.compiled_graph import compile_graph
+from spreading_activation.compiled_graph_test import make_outward_graph
+from spreading_activation import family_by_family, one_by_one
+
+
+def test_iter_families_stop_conditions():
+    (g, schema) = make_outward_graph()
+    cg = compile_graph(g, schema)
+    start_state = [('c', 1)]
+    assert family_by_family.algo(cg, start_state, max_events=2) == [(0, [(1.0, 'c')]), (1, [(0.4, 'b')])]
+    assert family_by_family.algo(cg, start_state, max_time=1) == [(0, [(1.0, 'c')]), (1, [(0.4, 'b'), (0.4, 'd')])]
+    assert family_by_family.algo(cg, start_state, max_nodes=3) == family_by_family.algo(cg, start_state, max_time=1)
+    assert family_by_family.algo(cg, start_state, time_budget=0) == []
+    # the generator can also just be abandoned
+    families = family_by_family.iter_families(cg, start_state)
+    assert next(families) == (0, [(1.0, 'c')])
+    families.close()
+
+
+def test_batched_families_stop_conditions():
+    (g, schema) = make_outward_graph()
+    cg = compile_graph(g, schema)
+    start_state = [('c', 1)]
+    for stop_conditions in [{}, {'max_events': 2}, {'max_time': 2}, {'max_nodes': 4}]:
+        assert family_by_family.batched_algo(cg, start_state, **stop_conditions) == family_by_family.algo(cg, start_state, **stop_conditions)
+
+
+def test_iter_activations_stop_conditions():
+    (g, schema) = make_outward_graph()
+    cg = compile_graph(g, schema)
+    start_state = [('c', 1)]
+    full = one_by_one.algo(cg, start_state)['activation_history']
+    assert list(one_by_one.iter_activations(cg, start_state)) == full
+    assert one_by_one.algo(cg, start_state, max_events=2)['activation_history'] == full[:2]
+    assert one_by_one.algo(cg, start_state, max_time=1)['activation_history'] == full[:3]
+    assert one_by_one.algo(cg, start_state, max_nodes=4)['activation_history'] == full[:4]
+    assert one_by_one.algo(cg, start_state, time_budget=0)['activation_history'] == []
@@ -0,0 +1,57 @@
+# Here we keep track of the k most strongly activated nodes, for the top-k mode of the algos.
+#
+# Strength only goes down along a path: node strengths and link strengths are at most 1 (weights are nonnegative)
+# and ACTIVATION_DECAY is below 1. So an activation that is not stronger than the current k-th best can't lead to
+# one that is, and an activation whose strength times ACTIVATION_DECAY is not stronger can't either. The top-k
+# algos drop the first kind before queueing them and don't expand the second kind, so a query ends as soon as
+# nothing left in the queue can reach the top k, rather than when everything has decayed below THRESHOLD.
+
+
+# imports
+import heapq
+from itertools import count
+
+
+class TopK:
+    """ The k strongest activated nodes so far (each with its strongest activation), and the strength an activation has to beat to get among them. """
+
+    def __init__(self, k):
+        self.k = k
+        # node -> strength of the nodes currently in the top k
+        self.top = {}
+        # a min-heap of (strength, insertion_number, node). Entries whose strength is no longer the node's are skipped.
+        self.heap = []
+        self.counter = count()
+
+    def __len__(self):
+        return len(self.top)
+
+    def bound(self):
+        """ The strength an activation has to beat to change the top k: the k-th best strength, or -inf while there are fewer than k nodes (inf when k is 0). """
+        if self.k <= 0:
+            return float('inf')
+        if len(self.top) < self.k:
+            return float('-inf')
+        heap = self.heap
+        while self.top.get(heap[0][2]) != heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0][0]
+
+    def add(self, strength, node):
+        """ Record an activation. """
+        top = self.top
+        if node in top:
+            if strength <= top[node]:
+                return
+        elif len(top) >= self.k:
+            if strength <= self.bound():
+                return
+            # make room by dropping the current k-th best
+            (_, _, weakest) = heapq.heappop(self.heap)
+            del top[weakest]
+        top[node] = strength
+        heapq.heappush(self.heap, (strength, next(self.counter), node))
+
+    def as_list(self):
+        """ The top k as a list of (output_activation_strength, node), strongest first. """
+        return sorted(((strength, node) for (node, strength) in self.top.items()), key=lambda pair: -pair[0])
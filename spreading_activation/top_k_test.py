@@ -0,0 +1,44 @@
+from spreading_activation.compiled_graph import compile_graph
+from spreading_activation.compiled_graph_test import make_outward_graph
+from spreading_activation.generators import GRAPHS
+from spreading_activation.top_k import TopK
+from spreading_activation import family_by_family, one_by_one
+
+
+def test_top_k_tracker():
+    best = TopK(2)
+    assert best.bound() == float('-inf')
+    best.add(0.5, 'a')
+    best.add(0.3, 'b')
+    assert best.bound() == 0.3
+    # improving a node in the top k, then pushing another one out
+    best.add(0.9, 'b')
+    assert best.bound() == 0.5
+    best.add(0.7, 'c')
+    best.add(0.6, 'd')
+    assert best.as_list() == [(0.9, 'b'), (0.7, 'c')]
+    assert TopK(0).bound() == float('inf')
+
+
+def test_top_k_outward():
+    (g, schema) = make_outward_graph()
+    cg = compile_graph(g, schema)
+    for top_k in (one_by_one.top_k, family_by_family.top_k):
+        assert top_k(cg, [('c', 1)], 2) == [(1.0, 'c'), (0.4, 'b')]
+        assert len(top_k(cg, [('c', 1)], 10)) == 5
+        assert top_k(cg, [('c', 1)], 0) == []
+
+
+def test_top_k_matches_full_history():
+    for kind in ('scale_free', 'layered'):
+        cg = GRAPHS[kind](20000, 'integer:1:3', 4)
+        start_state = [(node_id, 100.0 / (1 + node_id)) for node_id in range(0, 100, 7)]
+        strongest = {}
+        for (_, strength, name) in one_by_one.algo(cg, start_state)['activation_history']:
+            strongest[name] = max(strength, strongest.get(name, 0))
+        expected = sorted(strongest.values(), reverse=True)
+        for k in (1, 10, 100, len(expected) + 1):
+            for top_k in (one_by_one.top_k, family_by_family.top_k):
+                result = top_k(cg, start_state, k)
+                assert [strength for (strength, _) in result] == expected[:k]
+                assert all(strongest[name] == strength for (strength, name) in result)
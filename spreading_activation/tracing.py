@@ -0,0 +1,101 @@
+# Here we implement the Tracer, which counts what an algo does while it runs.
+#
+# Every algo takes a tracer argument. With tracer=None (the default) the algos skip all of the bookkeeping, so tracing
+# costs nothing when it is off. To trace a run, pass a Tracer (or any object with the same methods):
+#
+#   tracer = Tracer(snapshot_every=1000, timing=True)
+#   algo(graph, start_state, schema, tracer=tracer)
+#   print(tracer.summary())
+
+
+# imports
+import time
+
+
+class Tracer:
+    """ Collects counters, sampled queue snapshots and a per-phase timing breakdown from an algo run.
+    snapshot_every: take a copy of the time queue every this many popped events (0 means never). NOTE that snapshots walk the whole queue.
+    timing: measure how long the algo spends in each phase.
+    """
+
+    def __init__(self, snapshot_every=0, timing=False):
+        self.snapshot_every = snapshot_every
+        self.timing = timing
+        # counters
+        self.events_popped = 0
+        self.edges_scanned = 0
+        self.edges_rejected = 0
+        self.activations_pruned = 0
+        self.queue_high_water = 0
+        # number of nodes in each family popped by a stepwise algo
+        self.family_sizes = []
+        # (events_popped, current_time, queue contents) every snapshot_every popped events
+        self.snapshots = []
+        # phase name -> seconds
+        self.phase_times = {}
+        self._phase = None
+        self._phase_start = None
+        self._next_snapshot = snapshot_every
+
+    def __repr__(self):
+        return f'Tracer({self.summary()})'
+
+    def pop_event(self, current_time, queue):
+        """ Called by the one-by-one algos for every popped event. queue is the time queue, or a function returning its contents. """
+        self.events_popped += 1
+        self._maybe_snapshot(current_time, queue)
+
+    def pop_family(self, current_time, family_size, queue):
+        """ Called by the stepwise algos for every popped family. """
+        self.events_popped += family_size
+        self.family_sizes.append(family_size)
+        self._maybe_snapshot(current_time, queue)
+
+    def scan(self, edges_scanned, edges_rejected=0):
+        """ Called when a node (or a whole family) has had its links looked at. edges_rejected counts the links to children whose type the schema doesn't allow. """
+        self.edges_scanned += edges_scanned
+        self.edges_rejected += edges_rejected
+
+    def prune(self, count=1):
+        """ Called when activations are dropped because their strength is not above THRESHOLD. """
+        self.activations_pruned += count
+
+    def queue_size(self, size):
+        """ Called with the number of pending activations in the time queue. """
+        if size > self.queue_high_water:
+            self.queue_high_water = size
+
+    def phase(self, name):
+        """ Mark the start of a phase of the algo (the previous phase ends here). Only measured when timing is on. """
+        if not self.timing:
+            return
+        now = time.perf_counter()
+        if self._phase is not None:
+            self.phase_times[self._phase] = self.phase_times.get(self._phase, 0) + (now - self._phase_start)
+        self._phase = name
+        self._phase_start = now
+
+    def finish(self):
+        """ Called by the algos when they are done, to close the last phase. """
+        self.phase(None)
+
+    def summary(self):
+        """ The counters as a dict. """
+        return {
+            'events_popped': self.events_popped,
+            'edges_scanned': self.edges_scanned,
+            'edges_rejected': self.edges_rejected,
+            'activations_pruned': self.activations_pruned,
+            'queue_high_water': self.queue_high_water,
+            'steps': len(self.family_sizes),
+            'max_family_size': max(self.family_sizes, default=0),
+            'snapshots': len(self.snapshots),
+            'phase_times': dict(self.phase_times),
+        }
+
+    def _maybe_snapshot(self, current_time, queue):
+        if not self.snapshot_every or self.events_popped < self._next_snapshot:
+            return
+        self._next_snapshot = self.events_popped + self.snapshot_every
+        contents = queue() if callable(queue) else queue.as_ordered_list()
+        self.snapshots.append((self.events_popped, current_time, contents))
@@ -0,0 +1,42 @@
+from spreading_activation.compiled_graph import compile_graph
+from spreading_activation.compiled_graph_test import make_graph, make_outward_graph
+from spreading_activation.tracing import Tracer
+from spreading_activation import family_by_family, one_by_one
+
+
+def test_family_by_family_counters():
+    (g, schema) = make_outward_graph()
+    cg = compile_graph(g, schema)
+    for run in (family_by_family.algo, family_by_family.batched_algo):
+        tracer = Tracer()
+        run(cg, [('c', 1)], tracer=tracer)
+        assert tracer.events_popped == 5
+        assert tracer.edges_scanned == 4
+        assert tracer.activations_pruned == 0
+        assert tracer.family_sizes == [1, 2, 1, 1]
+        assert tracer.queue_high_water == 2
+        assert tracer.snapshots == []
+        assert tracer.phase_times == {}
+
+
+def test_one_by_one_counters_snapshots_and_timing():
+    # the link from b to c is too weak for c to activate
+    g = make_graph(['b', 'c'], [('b', 'c', {'weight': 5})])
+    cg = compile_graph(g, ['b', 'c'])
+    tracer = Tracer(snapshot_every=1, timing=True)
+    one_by_one.algo(cg, [('b', 1), ('c', 0.01)], tracer=tracer)
+    assert tracer.events_popped == 1
+    assert tracer.edges_scanned == 1
+    assert tracer.activations_pruned == 2
+    assert tracer.snapshots == [(1, 0, [])]
+    assert set(tracer.phase_times) == {'pop', 'expand'}
+    assert tracer.summary()['events_popped'] == 1
+
+
+def test_snapshot_sampling():
+    (g, schema) = make_outward_graph()
+    cg = compile_graph(g, schema)
+    tracer = Tracer(snapshot_every=2)
+    one_by_one.algo(cg, [('c', 1)], tracer=tracer)
+    assert [(popped, t) for (popped, t, _) in tracer.snapshots] == [(2, 1), (4, 2)]
+    assert tracer.snapshots[0][2] == [(1, 0.4, 'd')]